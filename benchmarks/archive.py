@@ -0,0 +1,141 @@
+"""
+Archival benchmark: hot table index size and insert latency.
+
+Fills a throwaway test database with ``--polls`` long-closed polls of
+``--votes`` votes and as many views each, next to one open poll, and
+reports the size of every index on the vote and view tables and the
+latency of single vote inserts on the open poll. It then snapshots, rolls
+up and archives the closed polls (``polls.archive``) and measures again::
+
+    python benchmarks/archive.py --polls 200 --votes 5000
+
+Sizes come from ``dbstat`` on SQLite and ``pg_relation_size`` on
+Postgres, where deleted index entries are only reclaimed by VACUUM (run
+here) and fully compacted by ``REINDEX``.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from polls.archive import archive_polls  # noqa: E402
+from polls.models import Option, Poll, PollView, Vote, make_voter_key  # noqa: E402
+from polls.rollups import METRICS, rollup_metric  # noqa: E402
+from polls.snapshots import take_snapshots  # noqa: E402
+
+BATCH_SIZE = 5000
+TABLES = (Vote._meta.db_table, PollView._meta.db_table)
+
+
+def index_sizes():
+    """``{index name: bytes}`` for the indexes of the vote and view tables."""
+    if connection.vendor == 'postgresql':
+        names = 'SELECT indexname FROM pg_indexes WHERE tablename = %s'
+        size = 'SELECT pg_relation_size(%s::regclass)'
+    else:
+        names = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s"
+        size = 'SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name = %s'
+    sizes = {}
+    with connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(names, [table])
+            for (name,) in cursor.fetchall():
+                cursor.execute(size, [name])
+                sizes[name] = cursor.fetchone()[0]
+    return sizes
+
+
+def insert_latency(poll, option, count, offset):
+    """Milliseconds per single-row vote insert (p50, p99)."""
+    timings = []
+    for i in range(offset, offset + count):
+        started = time.perf_counter()
+        Vote.objects.create(poll=poll, selected_option=option, session_id=f'live-{i}', ip_address='10.1.0.1')
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99)]
+
+
+def report(label, sizes, latency):
+    print(f"{label}: vote and view indexes {sum(sizes.values()) / 2 ** 20:.1f} MiB; "
+          f"insert p50 {latency[0]:.3f} ms, p99 {latency[1]:.3f} ms")
+    for name, size in sorted(sizes.items()):
+        print(f"  {name:<44} {size / 2 ** 20:8.2f} MiB")
+
+
+def run(polls, votes, inserts):
+    owner = get_user_model().objects.create_user(username='bench-owner')
+    closed = Poll.objects.bulk_create(Poll(question=f'Old {i}?', created_by=owner) for i in range(polls))
+    options = Option.objects.bulk_create(
+        Option(poll=poll, option_text=text) for poll in closed for text in ('Yes', 'No'))
+    started = time.perf_counter()
+    for poll_index, poll in enumerate(closed):
+        choices = options[2 * poll_index:2 * poll_index + 2]
+        for first in range(0, votes, BATCH_SIZE):
+            rows = range(first, min(first + BATCH_SIZE, votes))
+            Vote.objects.bulk_create(
+                Vote(poll=poll, selected_option=choices[i % 2], session_id=f's{i}', ip_address='10.0.0.1',
+                     voter_key=make_voter_key(None, f's{i}', '10.0.0.1')) for i in rows)
+            PollView.objects.bulk_create(
+                PollView(poll=poll, session_id=f's{i}', ip_address='10.0.0.1') for i in rows)
+    print(f"wrote {polls * votes} votes and views in {time.perf_counter() - started:.1f}s")
+
+    live = Poll.objects.create(question='Live?', created_by=owner)
+    option = Option.objects.create(poll=live, option_text='Yes')
+    report('before', index_sizes(), insert_latency(live, option, inserts, 0))
+
+    long_ago = timezone.now() - timedelta(days=400)
+    Poll.objects.filter(pk__in=[poll.pk for poll in closed]).update(is_active=False, updated_at=long_ago)
+    started = time.perf_counter()
+    while take_snapshots(batch_size=100):
+        pass
+    for metric in METRICS:
+        rollup_metric(metric, settle_seconds=0)
+    print(f"snapshots and rollups in {time.perf_counter() - started:.1f}s")
+    started = time.perf_counter()
+    archived, skipped, moved = archive_polls(timedelta(days=365))
+    elapsed = time.perf_counter() - started
+    print(f"archived {archived} polls ({skipped} skipped) in {elapsed:.1f}s: "
+          f"{moved['votes']} votes, {moved['views']} views ({(moved['votes'] + moved['views']) / elapsed:.0f} rows/s)")
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            for table in TABLES:
+                cursor.execute(f'VACUUM {connection.ops.quote_name(table)}')
+    report('after', index_sizes(), insert_latency(live, option, inserts, inserts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--polls', type=int, default=200)
+    parser.add_argument('--votes', type=int, default=5000, help="Votes (and views) per closed poll.")
+    parser.add_argument('--inserts', type=int, default=2000, help="Single-row inserts timed per phase.")
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        with tempfile.TemporaryDirectory() as directory, override_settings(POLL_SNAPSHOTS={'DIR': directory}):
+            run(args.polls, args.votes, args.inserts)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Database connection reuse benchmark.
+
+Serves the app from an in-process WSGI server against a throwaway test
+database and times ``--requests`` poll detail requests once per
+connection mode:
+
+* ``fresh`` - ``CONN_MAX_AGE = 0``: a new connection for every request;
+* ``persistent`` - ``CONN_MAX_AGE = 600``: the thread keeps its connection;
+* ``pool`` - ``OPTIONS['pool']`` (Postgres with ``psycopg[pool]`` only).
+
+and reports latency percentiles and how many database connections were
+opened::
+
+    python benchmarks/connections.py --requests 2000
+
+The difference between ``fresh`` and the other modes is the connection
+setup cost that pooling removes from every request. It is only
+meaningful on Postgres; SQLite connections cost next to nothing.
+"""
+import argparse
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.handlers.wsgi import WSGIHandler  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment  # noqa: E402
+
+from polls.models import Option, Poll  # noqa: E402
+
+MODES = {
+    'fresh': {'CONN_MAX_AGE': 0},
+    'persistent': {'CONN_MAX_AGE': 600},
+    'pool': {'CONN_MAX_AGE': 0, 'OPTIONS': {'pool': {'min_size': 1, 'max_size': 4}}},
+}
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def measure(mode, path, requests):
+    settings_dict = connections.settings['default']
+    saved = {key: settings_dict.get(key) for key in ('CONN_MAX_AGE', 'OPTIONS')}
+    settings_dict.update(MODES[mode])
+    opened = []
+
+    def count(sender, connection, **kwargs):
+        opened.append(connection.alias)
+
+    connection_created.connect(count)
+    server = make_server('127.0.0.1', 0, WSGIHandler(), handler_class=QuietHandler)
+    # One server thread, so persistent connections are reused across requests.
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    latencies = []
+    try:
+        for _ in range(requests):
+            client = http.client.HTTPConnection('127.0.0.1', server.server_port)
+            started = time.perf_counter()
+            client.request('GET', path)
+            response = client.getresponse()
+            response.read()
+            latencies.append((time.perf_counter() - started) * 1000)
+            client.close()
+            assert response.status == 200, response.status
+    finally:
+        server.shutdown()
+        server.server_close()
+        connection_created.disconnect(count)
+        pool = getattr(connection, 'pool', None) if mode == 'pool' else None
+        physical = pool.get_stats().get('connections_num', 0) if pool is not None else len(opened)
+        if pool is not None:
+            connection.close_pool()
+        settings_dict.update(saved)
+
+    latencies.sort()
+    print(f"{mode:<11} p50 {latencies[len(latencies) // 2]:7.3f} ms  "
+          f"p95 {latencies[int(len(latencies) * 0.95)]:7.3f} ms  "
+          f"p99 {latencies[int(len(latencies) * 0.99)]:7.3f} ms  "
+          f"{physical} connection(s) opened for {requests} requests")
+
+
+def run(requests, modes):
+    owner = get_user_model().objects.create_user(username='bench-owner')
+    poll = Poll.objects.create(question='Pooled?', created_by=owner)
+    Option.objects.bulk_create(Option(poll=poll, option_text=text) for text in ('Yes', 'No'))
+    connection.close()
+    for mode in modes:
+        measure(mode, f'/api/polls/{poll.id}/', requests)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--mode', action='append', choices=sorted(MODES), dest='modes',
+                        help="Only run this mode (may be given several times).")
+    args = parser.parse_args()
+    modes = args.modes or [mode for mode in MODES if mode != 'pool' or connection.vendor == 'postgresql']
+
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as directory:
+        if connection.vendor == 'sqlite':
+            # The default in-memory test database is never closed, so nothing would reconnect.
+            connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'bench.sqlite3')
+        old_name = connection.creation.create_test_db(verbosity=0)
+        try:
+            with override_settings(POLL_VIEW_TRACKING={'ENABLED': False}, ALLOWED_HOSTS=['*']):
+                run(args.requests, modes)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
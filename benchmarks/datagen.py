@@ -0,0 +1,113 @@
+"""
+Synthetic data generator for benchmarks: N polls with M options each, K
+votes and V views.
+
+Votes are split evenly between authenticated users and guests, and
+``--hot-share`` of them land on the first poll so vote-storm and results
+scenarios have a realistically busy target. Everything is written with
+bulk inserts and the option counters are rebuilt at the end::
+
+    python benchmarks/datagen.py --polls 1000 --options 4 --votes 100000 --views 100000
+
+Writes into the database configured by ``DJANGO_SETTINGS_MODULE``;
+``benchmarks/suite.py`` calls :func:`generate` on a throwaway test database
+instead.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+BATCH_SIZE = 5000
+
+
+def _setup():
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+
+
+def generate(polls=100, options=4, votes=10000, views=10000, hot_share=0.2, seed=0):
+    """Populate the current database; returns a summary including the hot poll id."""
+    from django.contrib.auth import get_user_model
+    from django.utils import timezone
+
+    from polls.counters import rebuild_vote_counts
+    from polls.models import Option, Poll, PollView, Vote, make_voter_key
+
+    rng = random.Random(seed)
+    User = get_user_model()
+    now = timezone.now()
+    owner = User.objects.create_user(username=f'bench-owner-{seed}')
+    users = User.objects.bulk_create(
+        (User(username=f'bench-{seed}-{i}', password='!') for i in range(max(votes // 2, 1))),
+        batch_size=BATCH_SIZE)
+    poll_rows = Poll.objects.bulk_create(
+        (Poll(question=f'Benchmark question {i}?', created_by=owner) for i in range(polls)),
+        batch_size=BATCH_SIZE)
+    Option.objects.bulk_create(
+        (Option(poll=poll, option_text=f'Option {j}') for poll in poll_rows for j in range(options)),
+        batch_size=BATCH_SIZE)
+    option_ids = {}
+    for option_id, poll_id in Option.objects.filter(poll__in=poll_rows).values_list('id', 'poll_id'):
+        option_ids.setdefault(poll_id, []).append(option_id)
+    poll_ids = [poll.id for poll in poll_rows]
+    hot = poll_ids[0]
+
+    def pick_poll():
+        return hot if rng.random() < hot_share else rng.choice(poll_ids)
+
+    def vote_rows():
+        # Every vote has its own voter, so (poll, voter_key) never collides.
+        for i in range(votes):
+            poll_id = pick_poll()
+            if i % 2 == 0:
+                user_id, session_id, ip_address = users[i // 2].id, None, None
+            else:
+                user_id, session_id = None, f'bench-session-{seed}-{i}'
+                ip_address = f'10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}'
+            yield Vote(poll_id=poll_id, selected_option_id=rng.choice(option_ids[poll_id]),
+                       user_id=user_id, session_id=session_id, ip_address=ip_address,
+                       voter_key=make_voter_key(user_id, session_id, ip_address))
+
+    def view_rows():
+        # Roughly three views per distinct viewer, spread over the last week.
+        for _ in range(views):
+            viewer = rng.randrange(views // 3 + 1)
+            yield PollView(poll_id=pick_poll(), session_id=f'bench-viewer-{seed}-{viewer}',
+                           ip_address='10.0.0.1',
+                           viewed_at=now - timedelta(seconds=rng.randrange(7 * 86400)))
+
+    Vote.objects.bulk_create(vote_rows(), batch_size=BATCH_SIZE)
+    PollView.objects.bulk_create(view_rows(), batch_size=BATCH_SIZE)
+    rebuild_vote_counts(poll_ids)
+    return {
+        'polls': polls, 'options': options, 'votes': votes, 'views': views,
+        'hot_share': hot_share, 'seed': seed, 'hot_poll': hot,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--polls', type=int, default=100)
+    parser.add_argument('--options', type=int, default=4)
+    parser.add_argument('--votes', type=int, default=10000)
+    parser.add_argument('--views', type=int, default=10000)
+    parser.add_argument('--hot-share', type=float, default=0.2,
+                        help='Fraction of votes and views that go to the first poll.')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed; also namespaces usernames so runs can be repeated.')
+    args = parser.parse_args()
+
+    _setup()
+    started = time.perf_counter()
+    summary = generate(args.polls, args.options, args.votes, args.views, args.hot_share, args.seed)
+    print(f"generated {summary} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Poll expiry benchmark: many polls expiring at the same instant.
+
+Creates ``--due`` polls that all expire at one moment next to ``--open``
+polls that never do, then times ``polls.expiry.expire_due_polls`` closing
+the due ones and an idle pass once the queue is empty::
+
+    python benchmarks/expiry.py --due 100000 --open 100000 --batch-size 1000
+
+Runs against a throwaway test database created from the configured one.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from polls.expiry import expire_due_polls  # noqa: E402
+from polls.models import Poll  # noqa: E402
+
+BATCH_SIZE = 5000
+
+
+def run(due, open_polls, batch_size):
+    owner = get_user_model().objects.create_user(username='bench-owner')
+    now = timezone.now()
+    deadline = now - timedelta(seconds=1)
+    started = time.perf_counter()
+    Poll.objects.bulk_create(
+        (Poll(question=f'Due {i}?', created_by=owner, expires_at=deadline) for i in range(due)),
+        batch_size=BATCH_SIZE)
+    Poll.objects.bulk_create(
+        (Poll(question=f'Open {i}?', created_by=owner) for i in range(open_polls)),
+        batch_size=BATCH_SIZE)
+    print(f"created {due + open_polls} polls in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    closed, lag = expire_due_polls(now, batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    print(f"closed {closed} polls in {elapsed:.2f}s ({closed / elapsed:.0f} polls/s), lag {lag:.1f}s")
+
+    started = time.perf_counter()
+    expire_due_polls(now, batch_size=batch_size)
+    print(f"idle pass: {(time.perf_counter() - started) * 1000:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--due', type=int, default=100000)
+    parser.add_argument('--open', type=int, default=100000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        run(args.due, args.open, args.batch_size)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Hot poll concurrency benchmark: many threads voting on one poll.
+
+Every thread casts new guest votes through ``polls.voting.cast_vote`` on
+the same two-option poll, once with the counters on ``Option.vote_count``
+(0 shards) and once per requested shard count::
+
+    python benchmarks/hot_poll.py --threads 32 --votes 200 --shards 0,4,16
+
+Reports votes/sec and p50/p99 latency for each shard count, and checks
+that the results still add up to the number of votes. Runs against a
+throwaway test database created from the configured one; it is meant for
+Postgres, where unsharded votes queue on the option row locks. SQLite
+serialises all writers on one database lock, so shard counts make no
+difference there.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.test.utils import (  # noqa: E402
+    override_settings, setup_test_environment, teardown_test_environment)
+
+from polls.counters import compact_counter_shards, promote_polls  # noqa: E402
+from polls.models import Option, Poll, Vote  # noqa: E402
+from polls.voting import cast_vote, compute_results  # noqa: E402
+
+
+def percentile(latencies, fraction):
+    ordered = sorted(latencies)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] if ordered else 0.0
+
+
+def hammer(poll_id, option_ids, threads, votes, tag):
+    latencies, errors = [], []
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(t):
+        own = []
+        barrier.wait()
+        try:
+            for i in range(votes):
+                begun = time.perf_counter()
+                try:
+                    cast_vote(poll_id, option_ids[i % len(option_ids)],
+                              session_id=f'hot-{tag}-{t}-{i}', ip_address='10.0.0.1')
+                except Exception as exc:  # Keep hammering; report at the end.
+                    errors.append(exc)
+                    continue
+                own.append(time.perf_counter() - begun)
+        finally:
+            latencies.extend(own)
+            connections.close_all()
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return time.perf_counter() - started, latencies, errors
+
+
+def run(threads, votes, shard_counts):
+    owner = get_user_model().objects.create_user(username='bench-owner')
+    poll = Poll.objects.create(question='Hot poll benchmark', created_by=owner)
+    option_ids = [option.id for option in Option.objects.bulk_create(
+        Option(poll=poll, option_text=text) for text in ('Yes', 'No'))]
+
+    for shards in shard_counts:
+        compact_counter_shards([poll.id], demote=True)
+        if shards:
+            promote_polls([poll.id], shards)
+        elapsed, latencies, errors = hammer(poll.id, option_ids, threads, votes, shards)
+        counted = sum(row['votes'] for row in compute_results(poll)['results'])
+        cast = Vote.objects.filter(poll=poll).count()
+        print(f"shards={shards:<3} {len(latencies) / elapsed:>9.1f} votes/s  "
+              f"p50 {percentile(latencies, 0.50) * 1000:>7.2f}  "
+              f"p99 {percentile(latencies, 0.99) * 1000:>7.2f} ms  "
+              f"{len(errors)} errors  results {'ok' if counted == cast else f'{counted} != {cast}'}")
+        if errors:
+            print(f"  first error: {errors[0]!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--votes', type=int, default=200, help='Votes per thread per run.')
+    parser.add_argument('--shards', default='0,4,16',
+                        help='Comma-separated shard counts to compare; 0 is unsharded.')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        print(f"{connection.vendor}, {args.threads} threads x {args.votes} votes")
+        with override_settings(VOTE_COUNTER_SHARDS={'AUTO_PROMOTE': False}):
+            run(args.threads, args.votes, [int(n) for n in args.shards.split(',')])
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
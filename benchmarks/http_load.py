@@ -0,0 +1,147 @@
+"""
+Closed-loop HTTP load generator for comparing the WSGI and ASGI deployments.
+
+Each of ``--concurrency`` simulated clients keeps one keep-alive connection
+open and sends its next request as soon as the previous one is answered.
+For every concurrency level the script reports throughput and latency
+percentiles, so the two servers can be compared on how many concurrent
+connections they sustain before p99 latency degrades.
+
+Standard library only, so it runs anywhere the project does::
+
+    # sync stack: gunicorn config.wsgi:application -w 2 --bind :8001
+    # async stack: gunicorn config.asgi:application -w 2 -k uvicorn_worker.UvicornWorker --bind :8002
+    python benchmarks/http_load.py http://127.0.0.1:8001 --path /api/polls/1/results/ -c 10,50,200
+    python benchmarks/http_load.py http://127.0.0.1:8002 --path /api/async/polls/1/results/ -c 10,50,200
+"""
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+
+    def percentile(self, q):
+        if not self.latencies:
+            return float('nan')
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+
+
+async def _read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def _client(target, requests, deadline, stats):
+    reader = writer = None
+    i = 0
+    while time.perf_counter() < deadline:
+        request = requests[i % len(requests)]
+        i += 1
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(target.hostname, target.port or 80)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await _read_response(reader)
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            stats.errors += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        stats.latencies.append(time.perf_counter() - started)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        if status >= 500:
+            stats.errors += 1
+        if not keep_alive:
+            writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+def build_requests(target, paths, method, body, headers):
+    payload = body.encode() if body else b''
+    extra = ''.join(f'{header}\r\n' for header in headers)
+    if payload:
+        extra += f'Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n'
+    return [
+        (f'{method} {path} HTTP/1.1\r\nHost: {target.netloc}\r\n'
+         f'Connection: keep-alive\r\n{extra}\r\n').encode() + payload
+        for path in paths
+    ]
+
+
+async def run_level(target, requests, concurrency, duration):
+    stats = Stats()
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*(_client(target, requests, deadline, stats) for _ in range(concurrency)))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('base_url')
+    parser.add_argument('--path', action='append', dest='paths',
+                        help='Request path; repeat to rotate through several.')
+    parser.add_argument('-c', '--concurrency', default='10,50,200',
+                        help='Comma-separated concurrent connection counts to test.')
+    parser.add_argument('-d', '--duration', type=float, default=10.0,
+                        help='Seconds to run each concurrency level.')
+    parser.add_argument('-X', '--method', default='GET')
+    parser.add_argument('--body', help='JSON request body, e.g. \'{"option": 1}\'.')
+    parser.add_argument('-H', '--header', action='append', default=[],
+                        help="Extra header, e.g. 'Authorization: Bearer ...'.")
+    parser.add_argument('--json', action='store_true', help='Print one JSON object per level.')
+    args = parser.parse_args()
+
+    target = urlsplit(args.base_url)
+    requests = build_requests(target, args.paths or ['/api/polls/'], args.method, args.body, args.header)
+    if not args.json:
+        print(f"{'conns':>6} {'req/s':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    for concurrency in (int(level) for level in args.concurrency.split(',')):
+        stats = asyncio.run(run_level(target, requests, concurrency, args.duration))
+        result = {
+            'concurrency': concurrency,
+            'requests': len(stats.latencies),
+            'rps': round(len(stats.latencies) / args.duration, 1),
+            'p50_ms': round(stats.percentile(0.50), 2),
+            'p90_ms': round(stats.percentile(0.90), 2),
+            'p99_ms': round(stats.percentile(0.99), 2),
+            'max_ms': round(max(stats.latencies, default=0) * 1000, 2),
+            'errors': stats.errors,
+            'statuses': stats.statuses,
+        }
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(f"{concurrency:>6} {result['rps']:>9} {result['p50_ms']:>8} {result['p90_ms']:>8} "
+                  f"{result['p99_ms']:>8} {result['max_ms']:>8} {stats.errors:>7}")
+
+
+if __name__ == '__main__':
+    main()
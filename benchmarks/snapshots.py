@@ -0,0 +1,110 @@
+"""
+Closed poll snapshot benchmark.
+
+Fills one poll of a throwaway test database with ``--votes`` guest votes
+spread over a week, closes it and times the reads an archived poll gets -
+a full export, an hourly vote series and a distinct voter count - first
+from the vote table and then from the poll's snapshot, along with writing
+the snapshot itself::
+
+    python benchmarks/snapshots.py --votes 1000000
+
+The snapshot is written to a temporary directory.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Count  # noqa: E402
+from django.db.models.functions import TruncHour  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from polls.exports import iter_vote_rows  # noqa: E402
+from polls.models import Option, Poll, Vote, make_voter_key  # noqa: E402
+from polls.snapshots import snapshot_distinct_counts, snapshot_poll, snapshot_time_series  # noqa: E402
+
+BATCH_SIZE = 5000
+
+
+def timed(label, function):
+    started = time.perf_counter()
+    result = function()
+    print(f"{label:<32} {time.perf_counter() - started:8.3f}s")
+    return result
+
+
+def run(votes, options, seed):
+    owner = get_user_model().objects.create_user(username='bench-owner')
+    poll = Poll.objects.create(question='Archived?', created_by=owner)
+    option_ids = [option.id for option in Option.objects.bulk_create(
+        Option(poll=poll, option_text=f'Option {i}') for i in range(options))]
+
+    rng = np.random.default_rng(seed)
+    start = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=8)
+    end = start + timedelta(days=7)
+    choices = rng.choice(option_ids, size=votes).tolist()
+    started = time.perf_counter()
+    for first in range(0, votes, BATCH_SIZE):
+        Vote.objects.bulk_create(
+            Vote(poll=poll, selected_option_id=choices[i], session_id=f's{i}', ip_address='10.0.0.1',
+                 voter_key=make_voter_key(None, f's{i}', '10.0.0.1'))
+            for i in range(first, min(first + BATCH_SIZE, votes)))
+    # created_at is auto_now_add: spread the votes over the week an hour at a time.
+    vote_ids = list(Vote.objects.filter(poll=poll).order_by('id').values_list('id', flat=True))
+    hours = 7 * 24
+    for hour in range(hours):
+        chunk = vote_ids[hour * votes // hours:(hour + 1) * votes // hours]
+        if chunk:
+            Vote.objects.filter(id__range=(chunk[0], chunk[-1])).update(created_at=start + timedelta(hours=hour))
+    print(f"wrote {votes} votes in {time.perf_counter() - started:.1f}s")
+
+    Poll.objects.filter(pk=poll.pk).update(is_active=False, updated_at=end)
+    size = timed('write snapshot', lambda: snapshot_poll(poll.id, end))
+    print(f"  {size / 2 ** 20:.1f} MiB ({size / votes:.1f} bytes per vote)")
+
+    rows = Vote.objects.filter(poll=poll)
+    timed('export from table', lambda: sum(1 for _ in rows.order_by('created_at', 'id').values_list(
+        'id', 'user_id', 'session_id', 'ip_address', 'selected_option_id', 'created_at').iterator(2000)))
+    timed('export from snapshot', lambda: sum(1 for _ in iter_vote_rows(poll.id)))
+    timed('hourly votes from table', lambda: list(
+        rows.annotate(bucket=TruncHour('created_at')).values('bucket').annotate(n=Count('id'))))
+    timed('hourly votes from snapshot', lambda: snapshot_time_series([poll.id], 'votes', 'hour', start, end))
+    timed('distinct voters from table', lambda: rows.aggregate(n=Count('voter_key', distinct=True)))
+    timed('distinct voters from snapshot',
+          lambda: snapshot_distinct_counts([poll.id], 'voters', 'day', start, end))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--votes', type=int, default=1000000)
+    parser.add_argument('--options', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        with tempfile.TemporaryDirectory() as directory, override_settings(POLL_SNAPSHOTS={'DIR': directory}):
+            run(args.votes, args.options, args.seed)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,196 @@
+"""
+Reproducible API benchmark suite.
+
+Creates a throwaway test database from the configured one, fills it with
+:mod:`datagen`, then drives the API in-process through Django's test
+client, so it needs no running server or outside services. Works on
+Postgres or SQLite (``DB_ENGINE=django.db.backends.sqlite3``). Scenarios:
+
+* ``vote_storm``      - new guest votes on the hot poll
+* ``results_polling`` - repeated results reads of the hot poll
+* ``poll_detail``     - poll detail reads spread over all polls
+* ``list_pagination`` - walking the poll list through its cursor links
+
+Each reports req/s, p50/p95/p99 latency and queries per request; the whole
+run is saved as JSON together with the commit it ran on::
+
+    python benchmarks/suite.py --votes 50000 -o benchmarks/results/before.json
+    python benchmarks/suite.py --votes 50000 -o benchmarks/results/after.json
+    python benchmarks/suite.py --compare benchmarks/results/before.json benchmarks/results/after.json
+
+Requests run one at a time, so latency is service time without queueing;
+use ``http_load.py`` against a real server for concurrency behaviour.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from datagen import _setup, generate
+from http_load import Stats
+
+ROOT = Path(__file__).resolve().parent.parent
+SCENARIOS = ('vote_storm', 'results_polling', 'poll_detail', 'list_pagination')
+COMPARED = ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request')
+
+
+def vote_storm(client, data, n):
+    from polls.models import Option
+    url = f"/api/polls/{data['hot_poll']}/vote/"
+    option_ids = list(Option.objects.filter(poll_id=data['hot_poll']).values_list('id', flat=True))
+    for i in range(n):
+        client.cookies['sessionid'] = f'storm-{i}'
+        yield lambda i=i: client.post(url, {'option': option_ids[i % len(option_ids)]},
+                                      content_type='application/json',
+                                      REMOTE_ADDR=f'10.9.{i >> 8 & 255}.{i & 255}')
+
+
+def results_polling(client, data, n):
+    url = f"/api/polls/{data['hot_poll']}/results/"
+    for _ in range(n):
+        yield lambda: client.get(url)
+
+
+def poll_detail(client, data, n):
+    from polls.models import Poll
+    ids = list(Poll.objects.order_by('id').values_list('id', flat=True))
+    for i in range(n):
+        yield lambda i=i: client.get(f'/api/polls/{ids[i * 7919 % len(ids)]}/')
+
+
+def list_pagination(client, data, n):
+    first = '/api/polls/?page_size=20'
+    state = {'url': first}
+
+    def fetch():
+        response = client.get(state['url'])
+        state['url'] = response.json().get('next') or first
+        return response
+    for _ in range(n):
+        yield fetch
+
+
+def run_scenario(name, data, n):
+    from django.db import connection, reset_queries
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+
+    client = Client()
+    stats, queries = Stats(), []
+    started = time.perf_counter()
+    for request in globals()[name](client, data, n):
+        with CaptureQueriesContext(connection) as captured:
+            begun = time.perf_counter()
+            response = request()
+            stats.latencies.append(time.perf_counter() - begun)
+        queries.append(len(captured.captured_queries))
+        stats.statuses[response.status_code] = stats.statuses.get(response.status_code, 0) + 1
+        if response.status_code >= 400:
+            stats.errors += 1
+        reset_queries()
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': n,
+        'errors': stats.errors,
+        'statuses': {str(code): count for code, count in sorted(stats.statuses.items())},
+        'rps': round(n / elapsed, 1),
+        'mean_ms': round(sum(stats.latencies) / n * 1000, 3),
+        'p50_ms': round(stats.percentile(0.50), 3),
+        'p95_ms': round(stats.percentile(0.95), 3),
+        'p99_ms': round(stats.percentile(0.99), 3),
+        'queries_per_request': round(sum(queries) / n, 2),
+        'max_queries': max(queries),
+    }
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    _setup()
+    import django
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        started = time.perf_counter()
+        data = generate(args.polls, args.options, args.votes, args.views, args.hot_share, args.seed)
+        print(f"dataset: {data} ({time.perf_counter() - started:.1f}s)", file=sys.stderr)
+        report = {
+            'meta': {
+                'commit': _git('rev-parse', 'HEAD'),
+                'dirty': bool(_git('status', '--porcelain', '--untracked-files=no')),
+                'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'dataset': data,
+            },
+            'scenarios': {},
+        }
+        for name in args.scenarios or SCENARIOS:
+            report['scenarios'][name] = result = run_scenario(name, data, args.requests)
+            print(f"{name:<16} {result['rps']:>9.1f} req/s  p50 {result['p50_ms']:>7.2f}  "
+                  f"p95 {result['p95_ms']:>7.2f}  p99 {result['p99_ms']:>7.2f} ms  "
+                  f"{result['queries_per_request']:>5.1f} queries/req  {result['errors']} errors",
+                  file=sys.stderr)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+    return report
+
+
+def compare(before_path, after_path):
+    before, after = (json.loads(Path(path).read_text()) for path in (before_path, after_path))
+    print(f"before: {before['meta']['commit']}  after: {after['meta']['commit']}")
+    for name in after['scenarios']:
+        if name not in before['scenarios']:
+            continue
+        print(name)
+        for metric in COMPARED:
+            old, new = before['scenarios'][name][metric], after['scenarios'][name][metric]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else 'n/a'
+            print(f"  {metric:<20} {old:>10} -> {new:>10}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--polls', type=int, default=200)
+    parser.add_argument('--options', type=int, default=4)
+    parser.add_argument('--votes', type=int, default=20000)
+    parser.add_argument('--views', type=int, default=20000)
+    parser.add_argument('--hot-share', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-n', '--requests', type=int, default=500, help='Requests per scenario.')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, dest='scenarios',
+                        help='Run only this scenario (may be given several times).')
+    parser.add_argument('-o', '--output', help='Write the JSON report here (default: stdout).')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'),
+                        help='Compare two saved reports instead of running.')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    report = json.dumps(run(args), indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        Path(args.output).write_text(report + '\n')
+    else:
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""
+Ranked ballot tallying benchmark.
+
+Writes ``--ballots`` ranked ballots (a million by default) over
+``--options`` options into one poll of a throwaway test database, each
+ranking a random-length prefix of a skewed random order, then times the
+tallies: the whole ``compute_results`` path (reading the packed ballots and
+counting) for every method of a ranked poll, the vectorised instant runoff
+on its own and, for comparison, a per-ballot Python loop doing the same
+count::
+
+    python benchmarks/tallying.py --ballots 1000000 --options 10
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+
+from polls.models import Ballot, Option, Poll  # noqa: E402
+from polls.tallying import instant_runoff, load_ballots, pack_choices, unpack_choices  # noqa: E402
+from polls.voting import compute_results  # noqa: E402
+
+BATCH_SIZE = 5000
+
+
+def generate(ballots, options, seed):
+    """Random rankings (as option columns) and their lengths, favouring the first options."""
+    rng = np.random.default_rng(seed)
+    popularity = np.linspace(1.5, 0, options)
+    orders = np.argsort(-(popularity + rng.gumbel(size=(ballots, options))), axis=1)
+    lengths = rng.integers(1, options + 1, size=ballots)
+    return orders, lengths
+
+
+def python_runoff(rankings, options):
+    """Reference instant runoff: one Python pass over every ballot per round."""
+    standing = set(options)
+    while True:
+        counts = Counter({option: 0 for option in standing})
+        for ranking in rankings:
+            choice = next((option for option in ranking if option in standing), None)
+            if choice is not None:
+                counts[choice] += 1
+        leader, votes = max(counts.items(), key=lambda item: item[1])
+        if len(standing) == 1 or 2 * votes > sum(counts.values()):
+            return leader
+        standing.remove(min(counts.items(), key=lambda item: item[1])[0])
+
+
+def timed(label, function):
+    started = time.perf_counter()
+    result = function()
+    print(f"{label:<28} {time.perf_counter() - started:8.3f}s")
+    return result
+
+
+def run(ballots, options, seed):
+    owner = get_user_model().objects.create_user(username='bench-owner')
+    poll = Poll.objects.create(question='Ranked benchmark?', created_by=owner, voting_method='ranked')
+    option_ids = [option.id for option in Option.objects.bulk_create(
+        Option(poll=poll, option_text=f'Option {i}') for i in range(options))]
+
+    started = time.perf_counter()
+    orders, lengths = generate(ballots, options, seed)
+    ids = np.asarray(option_ids)[orders]
+    packed = [pack_choices(row[:length]) for row, length in zip(ids, lengths)]
+    for start in range(0, ballots, BATCH_SIZE):
+        Ballot.objects.bulk_create(
+            Ballot(poll=poll, voter_key=f'g:{i}', choices=packed[i])
+            for i in range(start, min(start + BATCH_SIZE, ballots)))
+    print(f"wrote {ballots} ballots x {options} options in {time.perf_counter() - started:.1f}s "
+          f"({sum(map(len, packed)) / ballots:.1f} bytes per ballot)")
+
+    irv = timed('compute_results irv', lambda: compute_results(poll, 'irv'))
+    print(f"  winner {irv['winner']} after {len(irv['rounds'])} rounds")
+    for method in ('borda', 'plurality'):
+        timed(f'compute_results {method}', lambda: compute_results(poll, method))
+
+    loaded = timed('load_ballots (in memory)', lambda: load_ballots(packed, option_ids))
+    winner, rounds = timed('instant_runoff (numpy)', lambda: instant_runoff(loaded))
+    rankings = [unpack_choices(data)[0] for data in packed]
+    expected = timed('instant_runoff (python loop)', lambda: python_runoff(rankings, option_ids))
+    assert option_ids[winner] == expected, (option_ids[winner], expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--ballots', type=int, default=1000000)
+    parser.add_argument('--options', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        run(args.ballots, args.options, args.seed)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Vote storage micro-benchmark: single-vote inserts and results aggregation.
+
+Runs against a throwaway test database created from the configured one
+(``DJANGO_SETTINGS_MODULE``), so it never touches real data::
+
+    python benchmarks/vote_storage.py --votes 20000 --polls 20
+
+Reports casts/sec through ``polls.voting.cast_vote`` (half user, half
+guest votes), the time to aggregate per-option tallies from the raw vote
+rows (``polls.counters.actual_vote_counts``) and the on-disk size of the
+vote tables where the database can tell.
+"""
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment, teardown_test_environment  # noqa: E402
+
+from polls.counters import actual_vote_counts  # noqa: E402
+from polls.models import Option, Poll  # noqa: E402
+from polls.voting import cast_vote  # noqa: E402
+
+
+def table_bytes(tables):
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT coalesce(sum(pg_total_relation_size(c.oid)), 0) FROM pg_class c "
+            "WHERE c.relname = ANY(%s)", [list(tables)])
+        return cursor.fetchone()[0]
+
+
+def run(votes, polls, repeat):
+    User = get_user_model()
+    owner = User.objects.create_user(username='bench-owner')
+    users = User.objects.bulk_create(User(username=f'bench-{i}') for i in range(votes // 2))
+    targets = []
+    for i in range(polls):
+        poll = Poll.objects.create(question=f'Benchmark {i}', created_by=owner)
+        options = Option.objects.bulk_create(
+            Option(poll=poll, option_text=f'Option {j}') for j in range(4))
+        targets.append((poll.id, [option.id for option in options]))
+
+    started = time.perf_counter()
+    for i in range(votes):
+        poll_id, option_ids = targets[i % polls]
+        if i % 2:
+            cast_vote(poll_id, option_ids[i % 4], session_id=f'session-{i}', ip_address='10.0.0.1')
+        else:
+            cast_vote(poll_id, option_ids[i % 4], user_id=users[i // 2].id)
+    insert_seconds = time.perf_counter() - started
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        actual_vote_counts([poll_id for poll_id, _ in targets])
+        timings.append(time.perf_counter() - started)
+
+    print(f"vendor:            {connection.vendor}")
+    print(f"votes cast:        {votes} ({votes / insert_seconds:,.0f}/s)")
+    print(f"aggregate tallies: best {min(timings) * 1000:.1f} ms of {repeat}")
+    size = table_bytes(['polls_vote', 'polls_guestvote'])
+    if size is not None:
+        print(f"vote tables:       {size / 1024:,.0f} KiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--votes', type=int, default=20000)
+    parser.add_argument('--polls', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        run(args.votes, args.polls, args.repeat)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
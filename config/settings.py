@@ -13,8 +13,9 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 from datetime import timedelta
-from decouple import config
+from decouple import Csv, config
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,10 +53,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack.
+    'polls.instrumentation.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    # Keeps clients that just wrote reading from the primary.
+    'polls.replicas.ReplicaPinningMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -85,17 +90,94 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DB_ENGINE=django.db.backends.sqlite3 (with DB_NAME a file path) runs
+# without a Postgres server, e.g. for benchmarks/suite.py.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': config('DB_ENGINE', default='django.db.backends.postgresql'),
         'NAME': config('DB_NAME', default='poll_db'),
         'USER': config('DB_USER', default='poll_user'),
         'PASSWORD': config('DB_PASSWORD', default='poll_pass'),
         'HOST': config('DB_HOST', default='localhost'),
         'PORT': config('DB_PORT', default='5432'),
+        'CONN_HEALTH_CHECKS': config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool),
     }
 }
 
+# Connection reuse. With DB_POOL (Postgres only, the default there; needs
+# psycopg[pool]) each worker process keeps a pool of DB_POOL_MIN_SIZE..
+# DB_POOL_MAX_SIZE connections, by default one per request thread plus one
+# for each background flush thread (polls/buffering.py). The request threads
+# are REQUEST_THREADS:
+# - wsgi: WEB_THREADS, the threads of a sync gunicorn worker (also read by
+#   gunicorn.conf.py), so a request never waits for a connection;
+# - asgi: ASGI_THREADS. Uvicorn workers ignore WEB_THREADS: every request
+#   to a sync view, and every sync_to_async database call of an async view,
+#   runs in its own thread (asgiref gives each request a thread), so there
+#   is no thread pool to match. ASGI_THREADS is how many of those a worker
+#   may run against the database at once; the others wait up to
+#   DB_POOL_TIMEOUT for a connection. Raise both together.
+# Without a pool, DB_CONN_MAX_AGE keeps each thread's connection open that
+# many seconds; leave it at 0 under ASGI, which runs every request in a new
+# thread. DB_CONN_HEALTH_CHECKS tests a reused connection before using it.
+SERVER_INTERFACE = config('SERVER_INTERFACE', default='asgi')
+WEB_THREADS = config('WEB_THREADS', default=4, cast=int)
+ASGI_THREADS = config('ASGI_THREADS', default=16, cast=int)
+REQUEST_THREADS = ASGI_THREADS if SERVER_INTERFACE == 'asgi' else WEB_THREADS
+DB_POOL = config('DB_POOL', default=True, cast=bool) and DATABASES['default']['ENGINE'].endswith('postgresql')
+if DB_POOL:
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+            'max_size': config('DB_POOL_MAX_SIZE', default=REQUEST_THREADS + 3, cast=int),
+            'timeout': config('DB_POOL_TIMEOUT', default=10.0, cast=float),
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = config(
+        'DB_CONN_MAX_AGE', default=0 if SERVER_INTERFACE == 'asgi' else 60, cast=int)
+
+# Read replicas (see polls/replicas.py): DB_REPLICA_HOSTS lists host[:port]
+# of streaming replicas of the default database, which become the aliases
+# replica_1, replica_2, ... with the same credentials and pool settings.
+# Read-only endpoints use a replica that is no more than DB_REPLICA_MAX_LAG
+# seconds behind (checked every DB_REPLICA_LAG_CHECK_INTERVAL seconds), and
+# clients and polls that just wrote stay on the primary for
+# DB_REPLICA_PIN_SECONDS, which should be longer than the allowed lag.
+DB_REPLICA_HOSTS = config('DB_REPLICA_HOSTS', default='', cast=Csv())
+REPLICA_OPTIONS = dict(DATABASES['default'].get('OPTIONS', {}))
+if DATABASES['default']['ENGINE'].endswith('postgresql'):
+    # Fail over to the primary quickly when a replica is down.
+    REPLICA_OPTIONS['connect_timeout'] = config('DB_REPLICA_CONNECT_TIMEOUT', default=2, cast=int)
+for number, replica_host in enumerate(DB_REPLICA_HOSTS, 1):
+    replica_host, _, replica_port = replica_host.partition(':')
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': replica_host,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'OPTIONS': REPLICA_OPTIONS,
+        # Tests run against the primary's test database.
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# A second, unreplicated database standing in for a replica in the test
+# suite, which writes to it directly to fake replica contents and lag.
+# Nothing is routed to it unless POLL_READ_REPLICAS lists it.
+DATABASES['replica_standin'] = {
+    **DATABASES['default'],
+    'TEST': {'NAME': f"test_{DATABASES['default']['NAME']}_replica"
+             if DATABASES['default']['ENGINE'].endswith('postgresql') else None},
+}
+
+DATABASE_ROUTERS = ['polls.replicas.ReplicaRouter']
+
+POLL_READ_REPLICAS = {
+    'ALIASES': [f'replica_{number}' for number in range(1, len(DB_REPLICA_HOSTS) + 1)],
+    'MAX_LAG': config('DB_REPLICA_MAX_LAG', default=2.0, cast=float),
+    'LAG_CHECK_INTERVAL': config('DB_REPLICA_LAG_CHECK_INTERVAL', default=5.0, cast=float),
+    'PIN_SECONDS': config('DB_REPLICA_PIN_SECONDS', default=5.0, cast=float),
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -147,6 +229,12 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# Upper bound for client-selected page sizes (?page_size=)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=100, cast=int)
+
+# Most polls a single POST /api/polls/ballot/ may vote on
+BALLOT_MAX_ITEMS = config('BALLOT_MAX_ITEMS', default=100, cast=int)
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
@@ -155,7 +243,7 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'polls.api.pagination.StandardPageNumberPagination',
     'PAGE_SIZE': 10,
 }
 
@@ -188,3 +276,106 @@ SWAGGER_SETTINGS = {
         {'name': 'Poll Analytics', 'description': 'Poll view analytics'},
     ],
 }
+
+# Write-behind vote ingestion (see polls/ingestion.py). MODE is 'sync' or
+# 'buffered'; DURABILITY is one of 'memory', 'local', 'fsync', 'database'.
+# All workers on a host may share PATH: each claims the queued rows it flushes.
+VOTE_INGESTION = {
+    'MODE': config('VOTE_INGESTION_MODE', default='sync'),
+    'BACKEND': config('VOTE_INGESTION_BACKEND', default='polls.ingestion.MemoryVoteQueue'),
+    'PATH': config('VOTE_INGESTION_PATH', default=str(BASE_DIR / 'vote_queue.sqlite3')),
+    'BATCH_SIZE': config('VOTE_INGESTION_BATCH_SIZE', default=500, cast=int),
+    'FLUSH_INTERVAL': config('VOTE_INGESTION_FLUSH_INTERVAL', default=0.5, cast=float),
+    'DURABILITY': config('VOTE_INGESTION_DURABILITY', default='memory'),
+    'WAIT_TIMEOUT': config('VOTE_INGESTION_WAIT_TIMEOUT', default=5.0, cast=float),
+}
+
+# Caching. Defaults to the per-process locmem cache; point CACHE_BACKEND /
+# CACHE_LOCATION at a shared backend (e.g. Redis or Memcached) in production
+# so result caches and their version counters are shared by all workers.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='online-poll-system'),
+    }
+}
+
+# Poll results cache (see polls/results_cache.py)
+POLL_RESULTS_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': config('RESULTS_CACHE_TIMEOUT', default=300, cast=int),
+    'LOCK_TIMEOUT': config('RESULTS_CACHE_LOCK_TIMEOUT', default=10, cast=int),
+    'LOCK_WAIT': config('RESULTS_CACHE_LOCK_WAIT', default=2.0, cast=float),
+}
+
+# Batched poll view tracking (see polls/tracking.py)
+POLL_VIEW_TRACKING = {
+    'ENABLED': config('POLL_VIEW_TRACKING_ENABLED', default=True, cast=bool),
+    'CAPACITY': config('POLL_VIEW_TRACKING_CAPACITY', default=10000, cast=int),
+    'BATCH_SIZE': config('POLL_VIEW_TRACKING_BATCH_SIZE', default=500, cast=int),
+    'FLUSH_INTERVAL': config('POLL_VIEW_TRACKING_FLUSH_INTERVAL', default=1.0, cast=float),
+    'OVERFLOW': config('POLL_VIEW_TRACKING_OVERFLOW', default='drop_oldest'),
+    # Tests flush the tracker themselves; a background flusher would write
+    # into (or fail against) test databases that come and go under it.
+    'AUTOSTART': sys.argv[1:2] != ['test'],
+}
+
+# Scheduled poll expiry (see polls/expiry.py; run with manage.py run_expiry)
+POLL_EXPIRY = {
+    'BATCH_SIZE': config('POLL_EXPIRY_BATCH_SIZE', default=1000, cast=int),
+    'INTERVAL': config('POLL_EXPIRY_INTERVAL', default=1.0, cast=float),
+}
+
+# Columnar snapshots of closed polls (see polls/snapshots.py). Polls closed
+# for SETTLE seconds are snapshotted by run_expiry into DIR (default
+# BASE_DIR/snapshots), BATCH_SIZE per pass.
+POLL_SNAPSHOTS = {
+    'ENABLED': config('POLL_SNAPSHOTS_ENABLED', default=True, cast=bool),
+    'DIR': config('POLL_SNAPSHOT_DIR', default=''),
+    'SETTLE': config('POLL_SNAPSHOT_SETTLE', default=60.0, cast=float),
+    'BATCH_SIZE': config('POLL_SNAPSHOT_BATCH_SIZE', default=100, cast=int),
+}
+
+# Archival of long-closed polls (see polls/archive.py; run with manage.py
+# archive_polls): snapshotted polls closed for OLDER_THAN_DAYS lose their
+# vote, ballot and view rows, BATCH_SIZE rows per transaction.
+POLL_ARCHIVE = {
+    'OLDER_THAN_DAYS': config('POLL_ARCHIVE_OLDER_THAN_DAYS', default=365, cast=float),
+    'BATCH_SIZE': config('POLL_ARCHIVE_BATCH_SIZE', default=5000, cast=int),
+}
+
+# Sharded vote counters for hot polls (see polls/counters.py). A poll is
+# promoted to SHARDS counter rows per option once one of its options gets
+# PROMOTE_VOTES_PER_SECOND votes in a worker, averaged over WINDOW seconds.
+VOTE_COUNTER_SHARDS = {
+    'SHARDS': config('VOTE_COUNTER_SHARDS', default=16, cast=int),
+    'AUTO_PROMOTE': config('VOTE_COUNTER_AUTO_PROMOTE', default=True, cast=bool),
+    'PROMOTE_VOTES_PER_SECOND': config('VOTE_COUNTER_PROMOTE_RATE', default=50.0, cast=float),
+    'WINDOW': config('VOTE_COUNTER_PROMOTE_WINDOW', default=10.0, cast=float),
+}
+
+# Per-request timing and query instrumentation (see polls/instrumentation.py).
+# Histograms are served at /metrics/, which requires "Authorization: Bearer
+# <METRICS_TOKEN>" if that is set and a client address in METRICS_ALLOWED_IPS
+# (addresses or networks, comma-separated) if that is; with neither it is
+# only served with DEBUG on. REQUEST_METRICS_SERVER_TIMING adds a
+# Server-Timing header with each request's database and serializer time.
+REQUEST_METRICS = {
+    'ENABLED': config('REQUEST_METRICS_ENABLED', default=True, cast=bool),
+    'SERVER_TIMING': config('REQUEST_METRICS_SERVER_TIMING', default=False, cast=bool),
+    'SLOW_REQUEST_MS': config('SLOW_REQUEST_MS', default=1000, cast=float),
+    'SLOW_REQUEST_SAMPLE_RATE': config('SLOW_REQUEST_SAMPLE_RATE', default=1.0, cast=float),
+    'TOKEN': config('METRICS_TOKEN', default=''),
+    'ALLOWED_IPS': config('METRICS_ALLOWED_IPS', default='', cast=Csv()),
+}
+
+# Target standard error of the unique viewer/voter HyperLogLog sketches
+# (see polls/sketches.py); 0.01 keeps a sketch under ~8 KB stored.
+ANALYTICS_SKETCH_ERROR = config('ANALYTICS_SKETCH_ERROR', default=0.01, cast=float)
+
+# Live results over Server-Sent Events (see polls/live.py)
+POLL_RESULTS_STREAM = {
+    'BACKEND': config('RESULTS_STREAM_BACKEND', default='polls.live.CacheVersionPubSub'),
+    'MAX_UPDATES_PER_SECOND': config('RESULTS_STREAM_MAX_UPDATES_PER_SECOND', default=2.0, cast=float),
+    'HEARTBEAT': config('RESULTS_STREAM_HEARTBEAT', default=15.0, cast=float),
+}
@@ -25,6 +25,7 @@ from django.conf.urls.static import static
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 from rest_framework import permissions
+from polls.instrumentation import metrics_view
 
 
 def health_check(request):
@@ -47,6 +48,7 @@ urlpatterns = [
     path('', home, name='home'),
     path('api/', include('polls.api.urls')),
     path('health/', health_check, name='health'),
+    path('metrics/', metrics_view, name='metrics'),
     re_path(r'^swagger(?P<format>\.json|\.yaml)$',
             schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger',
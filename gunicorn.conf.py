@@ -0,0 +1,24 @@
+"""
+Gunicorn settings for the production command in the Dockerfile, read from
+the environment (see .env.example). Gunicorn loads this file from the
+working directory for both the sync (WSGI) and uvicorn (ASGI) workers.
+"""
+from decouple import config
+
+bind = config('GUNICORN_BIND', default='0.0.0.0:8000')
+workers = config('WEB_CONCURRENCY', default=2, cast=int)
+# Request threads per sync worker (uvicorn workers ignore it; their pool is
+# sized from ASGI_THREADS). The database pool of each sync worker is sized
+# from the same variable in config/settings.py.
+threads = config('WEB_THREADS', default=4, cast=int)
+timeout = config('GUNICORN_TIMEOUT', default=30, cast=int)
+keepalive = 5
+
+
+def worker_exit(server, worker):
+    # Give the worker's pooled database connections back to Postgres now
+    # rather than when their sockets time out.
+    from django.db import connections
+    for connection in connections.all(initialized_only=True):
+        if getattr(connection, 'pool', None) is not None:
+            connection.close_pool()
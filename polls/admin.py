@@ -1,13 +1,18 @@
 from django.contrib import admin
-from .models import Poll, Option, Vote, GuestVote, PollView
+from .models import Ballot, Poll, Option, Vote, GuestVote, PollView
+from .search import search_polls
 
 
 @admin.register(Poll)
 class PollAdmin(admin.ModelAdmin):
-    list_display = ['question', 'created_by', 'is_active', 'created_at']
-    list_filter = ['is_active', 'created_at']
+    list_display = ['question', 'created_by', 'voting_method', 'is_active', 'created_at']
+    list_filter = ['voting_method', 'is_active', 'created_at']
     search_fields = ['question']
 
+    def get_search_results(self, request, queryset, search_term):
+        # Full-text search (polls.search) instead of ILIKE '%term%' scans.
+        return search_polls(queryset, search_term), False
+
 
 @admin.register(Option)
 class OptionAdmin(admin.ModelAdmin):
@@ -17,7 +22,7 @@ class OptionAdmin(admin.ModelAdmin):
 
 @admin.register(Vote)
 class VoteAdmin(admin.ModelAdmin):
-    list_display = ['poll', 'selected_option', 'user', 'created_at']
+    list_display = ['poll', 'selected_option', 'user', 'ip_address', 'created_at']
     list_filter = ['created_at']
 
 
@@ -27,6 +32,12 @@ class GuestVoteAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
 
 
+@admin.register(Ballot)
+class BallotAdmin(admin.ModelAdmin):
+    list_display = ['poll', 'user', 'ip_address', 'updated_at']
+    list_filter = ['updated_at']
+
+
 @admin.register(PollView)
 class PollViewAdmin(admin.ModelAdmin):
     list_display = ['poll', 'user', 'ip_address', 'viewed_at']
@@ -0,0 +1,77 @@
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from polls.search import search_polls
+
+TRUE_VALUES = ('true', '1', 'yes')
+FALSE_VALUES = ('false', '0', 'no')
+
+
+def _boolean(params, name):
+    value = params[name].lower()
+    if value not in TRUE_VALUES + FALSE_VALUES:
+        raise ValidationError({name: ['Expected true or false.']})
+    return value in TRUE_VALUES
+
+
+def _datetime(params, name):
+    value = parse_datetime(params[name])
+    if value is None:
+        raise ValidationError({name: ['Expected an ISO 8601 date-time.']})
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+class PollFilter(BaseFilterBackend):
+    """
+    ``?is_active=``, ``?expired=``, ``?created_by=<user id>`` and a
+    ``?created_after=`` / ``?created_before=`` range (inclusive / exclusive).
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        if 'is_active' in params:
+            queryset = queryset.filter(is_active=_boolean(params, 'is_active'))
+        if 'expired' in params:
+            expired = Q(expires_at__lte=timezone.now())
+            queryset = queryset.filter(expired if _boolean(params, 'expired') else ~expired)
+        if 'created_by' in params:
+            try:
+                queryset = queryset.filter(created_by_id=int(params['created_by']))
+            except ValueError:
+                raise ValidationError({'created_by': ['Expected a user id.']})
+        if 'created_after' in params:
+            queryset = queryset.filter(created_at__gte=_datetime(params, 'created_after'))
+        if 'created_before' in params:
+            queryset = queryset.filter(created_at__lt=_datetime(params, 'created_before'))
+        return queryset
+
+
+class PollSearchFilter(BaseFilterBackend):
+    """``?search=`` over questions and option texts (see polls.search)."""
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        return search_polls(queryset, request.query_params.get(self.search_param, ''))
+
+
+class KeysetOrderingFilter(OrderingFilter):
+    """
+    ``?ordering=`` for views paginated by KeysetPagination, which does the
+    actual ordering: only one field is honoured, and rows whose ordering
+    field is NULL cannot be placed by a cursor, so they are left out.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        return tuple(ordering[:1]) if ordering else ordering
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if ordering:
+            field = ordering[0].lstrip('-')
+            if queryset.model._meta.get_field(field).null:
+                queryset = queryset.filter(**{f'{field}__isnull': False})
+        return queryset
@@ -0,0 +1,113 @@
+import base64
+import json
+from collections import namedtuple
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+Cursor = namedtuple('Cursor', ['value', 'pk', 'reverse'])
+
+
+class StandardPageNumberPagination(PageNumberPagination):
+    """
+    Page-number pagination with a client-selectable, capped page size
+    (``?page_size=``).
+    """
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Newest-first keyset pagination over ``(ordering_field, id)``.
+
+    Each page is a single indexed range scan - ``WHERE (field, id) < cursor
+    ORDER BY field DESC, id DESC LIMIT n`` - so deep pages cost the same as
+    the first one and no ``COUNT(*)`` is ever issued. Unlike DRF's
+    CursorPagination, the cursor carries the row id as a tie-breaker instead
+    of an offset, so rows sharing a timestamp never degrade into OFFSET scans.
+
+    Views may pick another non-null datetime field, or ascending order, with
+    a ``KeysetOrderingFilter`` in ``filter_backends``; that field needs an
+    ``(field, id)`` index of its own.
+    """
+    ordering_field = 'created_at'
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_MAX_PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        cursor = self.decode_cursor(request)
+        ordering = self.get_ordering(request, queryset, view)[0]
+        field = self.ordering_field = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+        # Walking back from a "previous" cursor scans the other way round.
+        if cursor is not None and cursor.reverse:
+            descending = not descending
+        after, prefix = ('lt', '-') if descending else ('gt', '')
+        queryset = queryset.order_by(f'{prefix}{field}', f'{prefix}pk')
+        if cursor is not None:
+            queryset = queryset.filter(
+                Q(**{f'{field}__{after}': cursor.value})
+                | Q(**{field: cursor.value, f'pk__{after}': cursor.pk}))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if cursor is not None and cursor.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self._cursor_for(self.page[-1], reverse=False))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self._cursor_for(self.page[0], reverse=True))
+
+    def _cursor_for(self, instance, reverse):
+        return Cursor(value=getattr(instance, self.ordering_field), pk=instance.pk, reverse=reverse)
+
+    def encode_cursor(self, cursor):
+        value = cursor.value.isoformat() if hasattr(cursor.value, 'isoformat') else cursor.value
+        payload = json.dumps([value, cursor.pk, int(cursor.reverse)], separators=(',', ':'))
+        encoded = base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            value, pk, reverse = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            value = parse_datetime(value)
+            if value is None:
+                raise ValueError
+            return Cursor(value=value, pk=int(pk), reverse=bool(reverse))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class PollViewKeysetPagination(KeysetPagination):
+    ordering_field = 'viewed_at'
+    ordering = ('-viewed_at', '-id')
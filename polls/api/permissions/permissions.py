@@ -5,4 +5,5 @@ class IsPollCreatorOrReadOnly(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.created_by == request.user
+        # Compare ids so the check never loads the creator row.
+        return obj.created_by_id == request.user.id
@@ -0,0 +1,33 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class _ExportRenderer(BaseRenderer):
+    """
+    Lets ``?format=csv|ndjson`` (or the matching Accept header) pass DRF
+    content negotiation for streaming views. Successful exports return a StreamingHttpResponse and
+    bypass rendering; only error payloads (404, 403, ...) reach render(),
+    which emits them as JSON.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data).encode(self.charset)
+
+
+class CSVRenderer(_ExportRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(_ExportRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class EventStreamRenderer(_ExportRenderer):
+    media_type = 'text/event-stream'
+    format = 'sse'
@@ -1,10 +1,12 @@
 from rest_framework import serializers
-from polls.models import Poll, Option, Vote, GuestVote, PollView
+from polls.api.serializers.timing import TimedSerializerMixin
+from polls.models import Poll, Option, Vote, GuestVote, PollView, make_voter_key
+from django.db import transaction
 from django.utils import timezone
 from django.utils.html import escape
 
 
-class OptionSerializer(serializers.ModelSerializer):
+class OptionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for poll options (choices).
     """
@@ -13,15 +15,18 @@ class OptionSerializer(serializers.ModelSerializer):
         fields = ['id', 'option_text']
 
 
-class PollSerializer(serializers.ModelSerializer):
+class PollSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Polls. Requires at least two unique options at creation.
     - question: The poll question (string).
     - expires_at: Optional expiration datetime (ISO 8601).
     - is_active: Whether the poll is open for voting.
+    - voting_method: plurality (default), approval, ranked or weighted.
+    - allow_multiple_votes: Lets a plurality poll's voters choose several options (approval voting).
     - options_data: List of option texts (choices) to create with the poll.
     - options: List of created options (read-only).
     - created_at: Poll creation timestamp (read-only).
+    - archived_at: When the poll's votes were archived, or null (read-only).
     """
 
     def validate_options_data(self, value):
@@ -48,40 +53,91 @@ class PollSerializer(serializers.ModelSerializer):
         many=True, read_only=True, help_text="List of poll options (choices). Read-only.")
     created_at = serializers.DateTimeField(
         read_only=True, help_text="Poll creation timestamp.")
+    voting_method = serializers.ChoiceField(
+        choices=Poll.VOTING_METHOD_CHOICES, default='plurality', required=False,
+        help_text="How voters choose: one option (plurality), any number (approval), "
+                  "a ranking (ranked) or weighted points (weighted).")
     options = OptionSerializer(many=True, read_only=True)
 
     expires_at = serializers.DateTimeField(required=False, allow_null=True)
 
     class Meta:
         model = Poll
-        fields = ['id', 'question', 'expires_at', 'is_active',
-                  'options', 'options_data', 'created_at']
-        read_only_fields = ('created_by', 'created_at')
+        fields = ['id', 'question', 'expires_at', 'is_active', 'voting_method',
+                  'allow_multiple_votes', 'options', 'options_data', 'created_at', 'archived_at']
+        read_only_fields = ('created_by', 'created_at', 'archived_at')
 
     def validate_question(self, value):
         return escape(value)
 
+    def validate(self, attrs):
+        poll = self.instance
+        if poll is not None and poll.archived_at is not None and attrs.get('is_active'):
+            raise serializers.ValidationError({'is_active': "Archived polls cannot be reopened."})
+        # Votes and ballots are stored per method; switching would misread them.
+        if poll is not None:
+            changed = Poll(voting_method=attrs.get('voting_method', poll.voting_method),
+                           allow_multiple_votes=attrs.get('allow_multiple_votes', poll.allow_multiple_votes))
+            if changed.ballot_method != poll.ballot_method and (
+                    poll.archived_at is not None
+                    or Vote.objects.filter(poll=poll).exists() or poll.ballots.exists()):
+                raise serializers.ValidationError(
+                    {'voting_method': "The voting method cannot change once votes have been cast."})
+        return attrs
+
     def create(self, validated_data):
         options_data = validated_data.pop('options_data')
-        poll = Poll.objects.create(**validated_data)
-        for option_text in options_data:
-            Option.objects.create(poll=poll, option_text=escape(option_text))
+        with transaction.atomic():
+            poll = Poll.objects.create(**validated_data)
+            Option.objects.bulk_create(
+                Option(poll=poll, option_text=escape(option_text)) for option_text in options_data)
         return poll
 
 
-class VoteSerializer(serializers.ModelSerializer):
+class VoteSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Vote
-        fields = '__all__'
+        fields = ['id', 'poll', 'selected_option', 'user', 'session_id', 'ip_address', 'created_at']
+
+    def validate(self, attrs):
+        # One vote per (poll, voter_key); the key is derived, so the unique
+        # constraint cannot be turned into a field validator automatically.
+        def current(field):
+            return attrs.get(field, getattr(self.instance, field, None))
+
+        user, session_id, ip_address = current('user'), current('session_id'), current('ip_address')
+        if not user and not (session_id and ip_address):
+            raise serializers.ValidationError(
+                "A vote needs a user, or both a session_id and an ip_address.")
+        duplicates = Vote.objects.filter(
+            poll=current('poll'),
+            voter_key=make_voter_key(user.id if user else None, session_id, ip_address))
+        if self.instance is not None:
+            duplicates = duplicates.exclude(pk=self.instance.pk)
+        if duplicates.exists():
+            raise serializers.ValidationError("This voter has already voted on this poll.")
+        return attrs
 
 
-class GuestVoteSerializer(serializers.ModelSerializer):
+class GuestVoteSerializer(VoteSerializer):
     class Meta:
         model = GuestVote
-        fields = '__all__'
+        fields = ['id', 'poll', 'selected_option', 'ip_address', 'session_id', 'created_at']
+        extra_kwargs = {
+            'ip_address': {'required': True, 'allow_null': False},
+            'session_id': {'required': True, 'allow_null': False, 'allow_blank': False},
+        }
+
+
+class BallotItemSerializer(TimedSerializerMixin, serializers.Serializer):
+    """
+    One answer in a bulk ballot: the poll and the chosen option.
+    """
+    poll = serializers.IntegerField(min_value=1, help_text="ID of the poll.")
+    option = serializers.IntegerField(min_value=1, help_text="ID of the chosen option.")
 
 
-class PollViewSerializer(serializers.ModelSerializer):
+class PollViewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = PollView
         fields = '__all__'
@@ -0,0 +1,32 @@
+from rest_framework import serializers
+
+from polls.instrumentation import serializer_timer
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+
+class TimedSerializerMixin:
+    """
+    Counts ``.data``, where DRF turns instances into primitives, as the
+    request's serializer time (see polls.instrumentation). Nested
+    serializers go through ``to_representation``, so nothing is counted
+    twice.
+    """
+
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        serializer = super().many_init(*args, **kwargs)
+        # Unless Meta.list_serializer_class picked another one.
+        if type(serializer) is serializers.ListSerializer:
+            serializer.__class__ = TimedListSerializer
+        return serializer
@@ -2,15 +2,17 @@ from django.contrib.auth.models import User
 from rest_framework import serializers
 from django.utils.html import escape
 
+from polls.api.serializers.timing import TimedSerializerMixin
 
-class UserProfileSerializer(serializers.ModelSerializer):
+
+class UserProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name')
         read_only_fields = ('id', 'username')
 
 
-class UserRegistrationSerializer(serializers.ModelSerializer):
+class UserRegistrationSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
 
     class Meta:
@@ -0,0 +1,167 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.conf import settings
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from polls.archive import archive_poll, archive_polls
+from polls.counters import rebuild_vote_counts
+from polls.exports import iter_vote_rows
+from polls.models import AnalyticsRollup, Ballot, Option, Poll, PollView, Vote
+from polls.rollups import METRICS, rebuild_rollups, rollup_metric
+from polls.snapshots import SnapshotMissing, snapshot_path, snapshot_poll
+from polls.tallying import pack_choices
+from polls.voting import compute_results
+
+User = get_user_model()
+
+T0 = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=500)
+
+
+class PollArchiveTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        overrides = override_settings(POLL_SNAPSHOTS={'DIR': directory}, POLL_VIEW_TRACKING={'ENABLED': False})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        voters = User.objects.bulk_create(User(username=f'voter{i}') for i in range(5))
+        self.poll = Poll.objects.create(question='Old news?', created_by=self.owner)
+        yes, no = (Option.objects.create(poll=self.poll, option_text=text) for text in ('Yes', 'No'))
+        Vote.objects.bulk_create(
+            [Vote(poll=self.poll, selected_option=yes if i < 3 else no, user=voter, voter_key=f'u:{voter.id}')
+             for i, voter in enumerate(voters)] +
+            [Vote(poll=self.poll, selected_option=no, session_id=f'guest-{i}', ip_address='10.0.0.1',
+                  voter_key=f'g:{i}') for i in range(2)])
+        Vote.objects.update(created_at=T0)
+        PollView.objects.bulk_create(
+            PollView(poll=self.poll, session_id=f'guest-{i}', viewed_at=T0) for i in range(4))
+        rebuild_vote_counts([self.poll.id])
+
+        self.ranked = Poll.objects.create(question='Rank them', created_by=self.owner, voting_method='ranked')
+        a, b, c = (Option.objects.create(poll=self.ranked, option_text=text).id for text in 'ABC')
+        Ballot.objects.bulk_create(
+            Ballot(poll=self.ranked, voter_key=f'g:{i}', choices=pack_choices(ranking))
+            for i, ranking in enumerate([[a, b], [b, c], [c, b], [b], [a, c, b]]))
+
+        # Closed long ago, snapshotted and rolled up.
+        self.recent = Poll.objects.create(question='Just closed?', created_by=self.owner)
+        Poll.objects.update(is_active=False, updated_at=T0 + timedelta(days=1))
+        Poll.objects.filter(pk=self.recent.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        for poll in Poll.objects.all():
+            snapshot_poll(poll.id, poll.updated_at)
+        for metric in METRICS:
+            rollup_metric(metric, settle_seconds=0)
+        self.poll.refresh_from_db()
+        self.ranked.refresh_from_db()
+
+    def test_rows_move_out_and_results_stay(self):
+        results = compute_results(self.poll)
+        ranked = {method: compute_results(self.ranked, method) for method in ('irv', 'borda')}
+        rows = list(iter_vote_rows(self.poll.id))
+        ballot_rows = list(iter_vote_rows(self.ranked.id))
+        self.assertEqual(len(ballot_rows), 10)
+
+        self.assertEqual(archive_polls(timedelta(days=365)), (2, 0, {'votes': 7, 'ballots': 5, 'views': 4}))
+        self.assertFalse(Vote.objects.exists() or Ballot.objects.exists() or PollView.objects.exists())
+        self.assertEqual(set(Poll.objects.filter(archived_at__isnull=False).values_list('pk', flat=True)),
+                         {self.poll.pk, self.ranked.pk})
+
+        self.assertEqual(compute_results(self.poll), results)
+        for method, expected in ranked.items():
+            self.assertEqual(compute_results(self.ranked, method), expected)
+        self.assertEqual(list(iter_vote_rows(self.poll.id)), rows)
+        self.assertEqual(list(iter_vote_rows(self.ranked.id)), ballot_rows)
+        response = self.client.get(reverse('poll-results', args=[self.poll.id]))
+        self.assertEqual([row['votes'] for row in response.data['results']], [3, 4])
+
+        # Totals stay online, and rebuilds leave them alone.
+        self.assertEqual(rebuild_vote_counts(), [])
+        self.assertEqual(list(self.poll.options.order_by('id').values_list('vote_count', flat=True)), [3, 4])
+        rebuild_rollups()
+        self.assertEqual(AnalyticsRollup.objects.get(
+            poll=self.poll, metric='views', granularity='day').count, 4)
+        self.assertEqual(AnalyticsRollup.objects.get(
+            poll=self.ranked, metric='guest_votes', granularity='day').count, 5)
+
+        self.assertEqual(archive_polls(timedelta(days=365)), (0, 0, {'votes': 0, 'ballots': 0, 'views': 0}))
+
+    def test_rows_not_rolled_up_are_kept(self):
+        PollView.objects.create(poll=self.poll, session_id='late')
+        archived, skipped, _ = archive_polls(timedelta(days=365))
+        self.assertEqual((archived, skipped), (1, 1))
+        self.assertIsNone(Poll.objects.get(pk=self.poll.pk).archived_at)
+        self.assertEqual(PollView.objects.filter(poll=self.poll).count(), 5)
+
+    def test_ballots_not_rolled_up_are_kept(self):
+        first = self.ranked.options.first()
+        Ballot.objects.create(poll=self.ranked, session_id='late', ip_address='10.0.0.2',
+                              choices=pack_choices([first.id]))
+        self.assertEqual(archive_polls(timedelta(days=365))[:2], (1, 1))
+        self.assertEqual(Ballot.objects.filter(poll=self.ranked).count(), 6)
+
+    def test_missing_or_stale_snapshots_block_archival(self):
+        snapshot_path(self.poll.id).unlink()
+        self.assertIsNone(archive_poll(self.poll.id))
+        # A ballot the snapshot does not hold.
+        first = self.ranked.options.first()
+        Ballot.objects.create(poll=self.ranked, voter_key='g:late', choices=pack_choices([first.id]))
+        self.assertIsNone(archive_poll(self.ranked.id))
+        self.assertFalse(Poll.objects.filter(archived_at__isnull=False).exists())
+
+    def test_archived_polls_stay_closed(self):
+        archive_poll(self.poll.id)
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(reverse('poll-reopen', args=[self.poll.id]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['detail'], 'Archived polls cannot be reopened.')
+        response = self.client.patch(reverse('poll-detail', args=[self.poll.id]), {'is_active': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('is_active', response.data)
+        self.assertFalse(Poll.objects.get(pk=self.poll.pk).is_active)
+        self.assertTrue(snapshot_path(self.poll.id).exists())
+
+        # Its snapshot is the only copy of the votes and is never rewritten.
+        self.assertIsNone(snapshot_poll(self.poll.id, Poll.objects.get(pk=self.poll.pk).updated_at))
+        self.assertEqual(compute_results(self.poll)['results'][1]['votes'], 4)
+
+    def test_archived_polls_are_only_read_from_their_snapshot(self):
+        archive_poll(self.poll.id)
+        self.poll.refresh_from_db()
+        results = self.client.get(reverse('poll-results', args=[self.poll.id])).data
+        with self.settings(POLL_SNAPSHOTS={**settings.POLL_SNAPSHOTS, 'ENABLED': False}):
+            cache.clear()
+            self.assertEqual(compute_results(self.poll), results)
+            self.assertEqual(len(list(iter_vote_rows(self.poll.id, archived=True))), 7)
+
+        snapshot_path(self.poll.id).unlink()
+        cache.clear()
+        with self.assertRaises(SnapshotMissing):
+            compute_results(self.poll)
+        with self.assertRaises(SnapshotMissing):
+            iter_vote_rows(self.poll.id, archived=True)
+        self.client.force_authenticate(self.owner)
+        for name in ('poll-results', 'async-poll-results', 'poll-export', 'poll-results-stream'):
+            with self.subTest(name):
+                response = self.client.get(reverse(name, args=[self.poll.id]))
+                self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_archive_polls_command(self):
+        out = StringIO()
+        call_command('archive_polls', '--older-than', '365', '--batch-size', '2', stdout=out)
+        self.assertIn('Archived 2 poll(s)', out.getvalue())
+        self.assertIn('7 vote(s), 5 ballot(s) and 4 view(s)', out.getvalue())
+        call_command('archive_polls', '--older-than', '0', stdout=out)
+        self.assertIn('Archived 1 poll(s)', out.getvalue())
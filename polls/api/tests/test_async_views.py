@@ -0,0 +1,90 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from polls.ingestion import get_vote_buffer, reset_vote_buffer
+from polls.models import GuestVote, Option, Poll, Vote
+
+User = get_user_model()
+
+
+@override_settings(POLL_VIEW_TRACKING={'ENABLED': False})
+class AsyncPollViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='voter', password='pass12345')
+        self.poll = Poll.objects.create(question='Async?', created_by=self.user)
+        self.yes = Option.objects.create(poll=self.poll, option_text='Yes')
+        self.no = Option.objects.create(poll=self.poll, option_text='No')
+        self.auth = {'headers': {'Authorization': f'Bearer {RefreshToken.for_user(self.user).access_token}'}}
+
+    async def test_detail_matches_sync_endpoint(self):
+        response = await self.async_client.get(reverse('async-poll-detail', args=[self.poll.id]))
+        self.assertEqual(response.status_code, 200)
+        sync_response = await sync_to_async(self.client.get)(reverse('poll-detail', args=[self.poll.id]))
+        self.assertEqual(response.json(), sync_response.json())
+        missing = await self.async_client.get(reverse('async-poll-detail', args=[self.poll.id + 100]))
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_user_vote_then_change(self):
+        url = reverse('async-poll-vote', args=[self.poll.id])
+        response = await self.async_client.post(
+            url, {'option': self.yes.id}, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 201)
+        response = await self.async_client.post(
+            url, {'option': self.no.id}, content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 200)
+        vote = await Vote.objects.aget(poll=self.poll, user=self.user)
+        self.assertEqual(vote.selected_option_id, self.no.id)
+        await self.yes.arefresh_from_db()
+        await self.no.arefresh_from_db()
+        self.assertEqual((self.yes.vote_count, self.no.vote_count), (0, 1))
+
+    async def test_guest_vote_and_validation(self):
+        url = reverse('async-poll-vote', args=[self.poll.id])
+        self.async_client.cookies['sessionid'] = 'guest-1'
+        response = await self.async_client.post(
+            url, {'option': self.yes.id}, content_type='application/json', REMOTE_ADDR='1.2.3.4')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await GuestVote.objects.filter(poll=self.poll, session_id='guest-1').aexists())
+
+        for body in ({}, {'option': 'abc'}, {'option': self.yes.id + 100}):
+            response = await self.async_client.post(url, body, content_type='application/json', **self.auth)
+            self.assertEqual(response.status_code, 400, body)
+        bad_token = await self.async_client.post(
+            url, {'option': self.yes.id}, content_type='application/json',
+            headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(bad_token.status_code, 401)
+
+    async def test_closed_poll_rejects_votes(self):
+        await Poll.objects.filter(pk=self.poll.pk).aupdate(is_active=False)
+        response = await self.async_client.post(
+            reverse('async-poll-vote', args=[self.poll.id]), {'option': self.yes.id},
+            content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 400)
+
+    async def test_results_etag_revalidation(self):
+        url = reverse('async-poll-results', args=[self.poll.id])
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [
+            {'option': 'Yes', 'votes': 0}, {'option': 'No', 'votes': 0}])
+        cached = await self.async_client.get(url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(cached.status_code, 304)
+        missing = await self.async_client.get(reverse('async-poll-results', args=[self.poll.id + 100]))
+        self.assertEqual(missing.status_code, 404)
+        missing = await self.async_client.get(
+            reverse('async-poll-results', args=[self.poll.id + 100]), headers={'If-None-Match': '*'})
+        self.assertEqual(missing.status_code, 404)
+
+    @override_settings(VOTE_INGESTION={'MODE': 'buffered', 'AUTOSTART': False})
+    async def test_buffered_vote_is_accepted(self):
+        self.addCleanup(reset_vote_buffer)
+        response = await self.async_client.post(
+            reverse('async-poll-vote', args=[self.poll.id]), {'option': self.yes.id},
+            content_type='application/json', **self.auth)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(get_vote_buffer().stats()['submitted'], 1)
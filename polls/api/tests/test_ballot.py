@@ -0,0 +1,114 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from polls import voting
+from polls.models import GuestVote, Option, Poll, Vote
+
+User = get_user_model()
+
+
+class BallotTests(APITestCase):
+    url = reverse('poll-ballot')
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='voter', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.polls = []
+        for i in range(20):
+            poll = Poll.objects.create(question=f'Question {i}?', created_by=self.user)
+            options = Option.objects.bulk_create(
+                Option(poll=poll, option_text=text) for text in ('Yes', 'No'))
+            self.polls.append((poll, options))
+
+    def ballot(self, polls, choice=0):
+        return [{'poll': poll.id, 'option': options[choice].id} for poll, options in polls]
+
+    def counts(self):
+        return list(Option.objects.order_by('id').values_list('vote_count', flat=True))
+
+    def test_ballot_creates_then_updates_votes(self):
+        response = self.client.post(self.url, self.ballot(self.polls), format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({item['status'] for item in response.data['results']}, {'created'})
+        self.assertEqual(Vote.objects.filter(user=self.user).count(), 20)
+        self.assertEqual(self.counts(), [1, 0] * 20)
+
+        response = self.client.post(self.url, self.ballot(self.polls[:5], choice=1), format='json')
+        self.assertEqual([item['status'] for item in response.data['results']], ['updated'] * 5)
+        self.assertEqual(Vote.objects.count(), 20)
+        self.assertEqual(self.counts(), [0, 1] * 5 + [1, 0] * 15)
+
+    def test_query_count_does_not_grow_with_ballot_size(self):
+        self.client.post(self.url, self.ballot(self.polls[:2]), format='json')
+        with self.assertNumQueries(7) as small:
+            self.client.post(self.url, self.ballot(self.polls[2:4]), format='json')
+        with self.assertNumQueries(len(small.captured_queries)):
+            self.client.post(self.url, self.ballot(self.polls[4:]), format='json')
+
+    def test_invalid_items_are_reported_without_rejecting_the_ballot(self):
+        (open_poll, open_options), (closed, closed_options), (expired, expired_options) = self.polls[:3]
+        Poll.objects.filter(pk=closed.pk).update(is_active=False)
+        Poll.objects.filter(pk=expired.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        other_option = self.polls[3][1][0]
+        response = self.client.post(self.url, [
+            {'poll': open_poll.id, 'option': open_options[1].id},
+            {'poll': 999999, 'option': open_options[0].id},
+            {'poll': open_poll.id, 'option': open_options[0].id},
+            {'poll': closed.id, 'option': closed_options[0].id},
+            {'poll': expired.id, 'option': expired_options[0].id},
+            {'poll': self.polls[4][0].id, 'option': other_option.id},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['status'] for item in response.data['results']],
+                         ['created'] + ['error'] * 5)
+        self.assertEqual([item.get('detail') for item in response.data['results'][1:]], [
+            'Poll not found.',
+            'This poll appears more than once in the ballot.',
+            'Voting is closed for this poll.',
+            'Voting is closed for this poll.',
+            'Invalid option for this poll.',
+        ])
+        self.assertEqual(Vote.objects.get().selected_option, open_options[1])
+
+    def test_guest_ballot(self):
+        guest = APIClient()
+        guest.cookies['sessionid'] = 'guest-ballot'
+        response = guest.post(self.url, self.ballot(self.polls[:3]), REMOTE_ADDR='1.2.3.4', format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(GuestVote.objects.filter(session_id='guest-ballot').count(), 3)
+
+        self.assertEqual(APIClient().post(self.url, self.ballot(self.polls[:3]), format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(BALLOT_MAX_ITEMS=5)
+    def test_malformed_ballots_are_rejected(self):
+        for body in ([], self.ballot(self.polls[:6]), {'poll': 1, 'option': 1}, [{'poll': 'x'}]):
+            with self.subTest(body=body):
+                response = self.client.post(self.url, body, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_vote_inserted_concurrently_is_moved_not_double_counted(self):
+        (poll, (yes, no)), = self.polls[:1]
+        lock_votes = voting._lock_votes
+
+        def racing_lock(keys):
+            # Another request inserts this voter's vote after the lock query.
+            if not Vote.objects.exists():
+                voting.cast_vote(poll.id, yes.id, self.user.id)
+                return {}
+            return lock_votes(keys)
+
+        with mock.patch('polls.voting._lock_votes', side_effect=racing_lock):
+            response = self.client.post(self.url, [{'poll': poll.id, 'option': no.id}], format='json')
+        self.assertEqual(response.data['results'][0]['status'], 'updated')
+        self.assertEqual(Vote.objects.get(user=self.user).selected_option, no)
+        self.assertEqual(self.counts()[:2], [0, 1])
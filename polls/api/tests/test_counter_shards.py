@@ -0,0 +1,110 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+
+from polls.counters import compact_counter_shards, rebuild_vote_counts
+from polls.models import Option, OptionCounterShard, Poll
+from polls.voting import cast_vote
+
+User = get_user_model()
+
+
+@override_settings(VOTE_COUNTER_SHARDS={'SHARDS': 4, 'AUTO_PROMOTE': False})
+class ShardedCounterTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.poll = Poll.objects.create(question='Viral?', created_by=self.owner)
+        self.yes = Option.objects.create(poll=self.poll, option_text='Yes')
+        self.no = Option.objects.create(poll=self.poll, option_text='No')
+
+    def vote(self, option, guest):
+        with self.captureOnCommitCallbacks(execute=True):
+            return cast_vote(self.poll.id, option.id, session_id=f's{guest}', ip_address='10.0.0.1')
+
+    def shard_total(self, option):
+        return option.counter_shards.aggregate(total=Sum('count'))['total'] or 0
+
+    def results(self):
+        response = self.client.get(reverse('poll-results', args=[self.poll.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {row['option']: row['votes'] for row in response.data['results']}
+
+    def test_sharded_polls_spread_votes_over_shards(self):
+        for guest in range(2):
+            self.vote(self.yes, guest)
+        Poll.objects.filter(pk=self.poll.pk).update(counter_shards=4)
+        for guest in range(2, 42):
+            self.vote(self.yes, guest)
+        self.vote(self.no, 0)  # Moves a vote counted on vote_count onto a shard.
+
+        self.yes.refresh_from_db()
+        self.assertEqual(self.yes.vote_count, 2)
+        self.assertEqual(self.shard_total(self.yes), 39)
+        self.assertGreater(self.yes.counter_shards.count(), 1)
+        self.assertTrue(set(self.yes.counter_shards.values_list('shard', flat=True)) <= set(range(4)))
+        self.assertEqual(self.results(), {'Yes': 41, 'No': 1})
+        self.assertEqual(rebuild_vote_counts(), [])
+
+    def test_unsharded_votes_take_one_counter_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.vote(self.yes, 0)
+        counter_queries = [q['sql'] for q in queries.captured_queries
+                           if 'polls_option' in q['sql'] and 'vote_count' in q['sql']]
+        self.assertEqual(len(counter_queries), 1)
+        self.assertTrue(counter_queries[0].startswith('UPDATE'))
+        self.assertFalse(OptionCounterShard.objects.exists())
+
+    @override_settings(VOTE_COUNTER_SHARDS={'SHARDS': 4, 'PROMOTE_VOTES_PER_SECOND': 0.5, 'WINDOW': 10})
+    def test_hot_polls_are_promoted(self):
+        for guest in range(4):
+            self.vote(self.yes, guest)
+        self.poll.refresh_from_db()
+        self.assertEqual(self.poll.counter_shards, 0)
+        self.vote(self.yes, 4)
+        self.poll.refresh_from_db()
+        self.assertEqual(self.poll.counter_shards, 4)
+
+        self.vote(self.no, 5)
+        self.assertEqual(self.shard_total(self.no), 1)
+        self.assertEqual(self.results(), {'Yes': 5, 'No': 1})
+
+    def test_rebuild_accounts_for_shards(self):
+        Poll.objects.filter(pk=self.poll.pk).update(counter_shards=4)
+        for guest in range(10):
+            self.vote(self.yes, guest)
+        OptionCounterShard.objects.filter(option=self.yes).update(count=100)
+        shards = self.yes.counter_shards.count()
+
+        drift = rebuild_vote_counts([self.poll.id])
+        self.assertEqual(drift, [(self.yes.id, 100 * shards, 10)])
+        self.assertEqual(self.results(), {'Yes': 10, 'No': 0})
+
+    def test_compaction_folds_shards_into_vote_count(self):
+        Poll.objects.filter(pk=self.poll.pk).update(counter_shards=4)
+        for guest in range(10):
+            self.vote(self.yes if guest % 3 else self.no, guest)
+        before = self.results()
+
+        shards = OptionCounterShard.objects.count()
+        self.assertEqual(compact_counter_shards([self.poll.id]), shards)
+        self.assertFalse(OptionCounterShard.objects.exists())
+        self.assertEqual(dict(self.poll.options.values_list('option_text', 'vote_count')), before)
+        self.poll.refresh_from_db()
+        self.assertEqual(self.poll.counter_shards, 4)
+
+        self.vote(self.yes, 10)
+        out = StringIO()
+        call_command('compact_counter_shards', '--poll', str(self.poll.id), '--demote', stdout=out)
+        self.assertIn('1 counter shard(s) folded.', out.getvalue())
+        self.poll.refresh_from_db()
+        self.assertEqual(self.poll.counter_shards, 0)
+        self.vote(self.yes, 11)
+        self.assertFalse(OptionCounterShard.objects.exists())
+        self.assertEqual(self.results(), {'Yes': before['Yes'] + 2, 'No': before['No']})
@@ -0,0 +1,81 @@
+import re
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from polls.expiry import due_polls, expire_due_polls, expiry_lag
+from polls.models import Poll
+from polls.results_cache import get_poll_version, get_poll_versions
+
+User = get_user_model()
+
+
+class PollExpiryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.now = timezone.now()
+        owner = User.objects.create_user(username='owner', password='pass12345')
+        self.due = Poll.objects.bulk_create(
+            Poll(question=f'Due {i}?', created_by=owner, expires_at=self.now - timedelta(minutes=i + 1))
+            for i in range(7))
+        self.open = Poll.objects.bulk_create([
+            Poll(question='Later?', created_by=owner, expires_at=self.now + timedelta(hours=1)),
+            Poll(question='Forever?', created_by=owner),
+        ])
+        self.closed = Poll.objects.create(
+            question='Closed?', created_by=owner, is_active=False, expires_at=self.now - timedelta(days=1))
+
+    def test_due_polls_are_closed_in_batches(self):
+        self.assertEqual(expiry_lag(self.now), 7 * 60)
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                closed, lag = expire_due_polls(self.now, batch_size=3)
+        self.assertEqual((closed, lag), (7, 7 * 60))
+        # Batches of 3, 3 and 1, each one SELECT and one UPDATE.
+        statements = [q['sql'].split()[0] for q in queries.captured_queries
+                      if q['sql'].startswith(('SELECT', 'UPDATE'))]
+        self.assertEqual(statements, ['SELECT', 'UPDATE'] * 3)
+        self.assertEqual(
+            set(Poll.objects.filter(is_active=False).values_list('pk', flat=True)),
+            {poll.pk for poll in self.due} | {self.closed.pk})
+        self.assertEqual(Poll.objects.filter(pk__in=[poll.pk for poll in self.open], is_active=True).count(), 2)
+        self.assertEqual(expiry_lag(self.now), 0)
+        self.assertEqual(expire_due_polls(self.now), (0, 0.0))
+
+    def test_cached_results_are_invalidated(self):
+        watched = self.due[0].pk
+        version = get_poll_version(watched)
+        with self.captureOnCommitCallbacks(execute=True):
+            expire_due_polls(self.now)
+        self.assertNotEqual(get_poll_version(watched), version)
+        # Polls nobody has read get no counter.
+        self.assertEqual(set(get_poll_versions(poll.pk for poll in self.due)), {watched})
+
+    @skipUnless(connection.vendor == 'sqlite', "Checks the SQLite query plan.")
+    def test_due_polls_are_read_from_the_partial_index(self):
+        sql, params = due_polls(self.now).order_by('expires_at').values_list('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('polls_poll_expiry_idx', plan)
+
+    @override_settings(REQUEST_METRICS={'ALLOWED_IPS': ['127.0.0.1']})
+    def test_run_expiry_command_and_lag_metric(self):
+        body = self.client.get(reverse('metrics')).content.decode()
+        lag = float(re.search(r'^polls_expiry_lag_seconds ([\d.]+)$', body, re.M).group(1))
+        self.assertGreaterEqual(lag, 7 * 60)
+
+        out = StringIO()
+        call_command('run_expiry', '--once', stdout=out)
+        self.assertIn('Closed 7 poll(s) in 1 pass(es)', out.getvalue())
+        body = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('polls_expiry_lag_seconds 0.000', body)
@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from polls.models import Ballot, Poll, Option, Vote, GuestVote
+from polls.tallying import pack_choices
+
+User = get_user_model()
+
+
+class VoteExportTests(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.voter = User.objects.create_user(username='voter', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner)
+        self.poll = Poll.objects.create(question='Mountains or sea?', created_by=self.owner)
+        self.mountains = Option.objects.create(poll=self.poll, option_text='Mountains')
+        self.sea = Option.objects.create(poll=self.poll, option_text='Sea')
+        Vote.objects.create(poll=self.poll, selected_option=self.mountains, user=self.voter)
+        GuestVote.objects.create(poll=self.poll, selected_option=self.sea,
+                                 session_id='guest-1', ip_address='10.0.0.1')
+        Vote.objects.create(poll=self.poll, selected_option=self.sea, user=self.owner)
+        self.url = reverse('poll-export', args=[self.poll.id])
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_merges_user_and_guest_votes_in_time_order(self):
+        response = self.client.get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual([row['voter_type'] for row in rows], ['user', 'guest', 'user'])
+        self.assertEqual([row['option_text'] for row in rows], ['Mountains', 'Sea', 'Sea'])
+        self.assertEqual(rows[1]['session_id'], 'guest-1')
+
+    def test_ndjson_export(self):
+        response = self.client.get(self.url, {'format': 'ndjson'})
+        records = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]['user_id'], self.voter.id)
+        self.assertIsNone(records[1]['user_id'])
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        await self.async_client.aforce_login(self.owner)
+        response = await self.async_client.get(self.url, {'format': 'ndjson'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Served chunk by chunk, not read into memory by the handler first.
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual([json.loads(line)['option_text'] for line in content.splitlines()],
+                         ['Mountains', 'Sea', 'Sea'])
+
+    def test_ballots_export_one_row_per_choice(self):
+        for method, weights, ranks in (('ranked', None, ['1', '2']), ('weighted', [3, 7], ['', ''])):
+            with self.subTest(method):
+                poll = Poll.objects.create(question=f'{method}?', created_by=self.owner, voting_method=method)
+                a, b = (Option.objects.create(poll=poll, option_text=text) for text in 'AB')
+                Ballot.objects.create(poll=poll, user=self.voter, choices=pack_choices([b.id, a.id], weights))
+                response = self.client.get(reverse('poll-export', args=[poll.id]), {'format': 'csv'})
+                rows = list(csv.DictReader(io.StringIO(self.read(response))))
+                self.assertEqual([(row['option_text'], row['user_id']) for row in rows],
+                                 [('B', str(self.voter.id)), ('A', str(self.voter.id))])
+                self.assertEqual([row['rank'] for row in rows], ranks)
+                self.assertEqual([row['weight'] for row in rows], [str(w) for w in weights] if weights else ['', ''])
+
+    def test_only_creator_can_export(self):
+        other = APIClient()
+        other.force_authenticate(user=self.voter)
+        response = other.get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = APIClient().get(self.url, {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_votes_command(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'votes.ndjson')
+            stderr = io.StringIO()
+            call_command('export_votes', self.poll.id, format='ndjson', output=path, stderr=stderr)
+            with open(path) as handle:
+                self.assertEqual(len(handle.readlines()), 3)
+        self.assertIn('exported 3 rows', stderr.getvalue())
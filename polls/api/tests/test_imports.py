@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from polls.models import Option, Poll
+
+User = get_user_model()
+
+CSV_BODY = (
+    "question,options,expires_at,is_active\n"
+    "Best editor?,Vim|Emacs|Nano,,true\n"
+    "Tabs or spaces?,Tabs|Spaces,2030-01-01T00:00:00Z,false\n"
+    "Only one?,Lonely,,\n"
+    "\"Quoted, with comma?\",Yes|No,,\n"
+)
+
+
+def inserts_into(queries, table):
+    return sum(1 for query in queries if query['sql'].startswith(f'INSERT INTO "{table}"'))
+
+
+class PollImportTests(APITestCase):
+    url = reverse('poll-import-polls')
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='importer', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, name, body, **data):
+        return self.client.post(
+            self.url, {'file': SimpleUploadedFile(name, body.encode()), **data}, format='multipart')
+
+    def test_create_poll_inserts_options_in_one_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('poll-list'), {
+                'question': 'Colour?', 'options_data': ['Red', 'Green', 'Blue', 'Black'],
+            }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data['options']), 4)
+        self.assertEqual(inserts_into(queries, 'polls_option'), 1)
+
+    def test_csv_import_reports_invalid_rows(self):
+        response = self.upload('polls.csv', CSV_BODY)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['polls'], response.data['options'], response.data['invalid']),
+                         (3, 7, 1))
+        self.assertEqual(response.data['errors'][0]['line'], 4)
+        self.assertIn('options_data', response.data['errors'][0]['errors'])
+
+        tabs = Poll.objects.get(question='Tabs or spaces?')
+        self.assertFalse(tabs.is_active)
+        self.assertEqual(tabs.expires_at.year, 2030)
+        self.assertEqual(tabs.created_by, self.user)
+        self.assertEqual(list(tabs.options.order_by('id').values_list('option_text', flat=True)),
+                         ['Tabs', 'Spaces'])
+        self.assertTrue(Poll.objects.filter(question='Quoted, with comma?').exists())
+
+    def test_ndjson_import(self):
+        body = '\n'.join([
+            json.dumps({'question': 'Coffee or tea?', 'options': ['Coffee', 'Tea']}),
+            '',
+            '{not json',
+            json.dumps({'question': 'Dupes?', 'options': ['A', 'a']}),
+        ])
+        response = self.upload('polls.ndjson', body)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['polls'], 1)
+        self.assertEqual([error['line'] for error in response.data['errors']], [3, 4])
+
+        response = self.upload('polls.txt', body, format='ndjson')
+        self.assertEqual(response.data['polls'], 1)
+
+    def test_rejected_uploads(self):
+        self.assertEqual(self.client.post(self.url, {}, format='multipart').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.upload('polls.csv', CSV_BODY, format='xml').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.upload('polls.csv', 'question,options\nOnly one?,Lonely\n').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        response = APIClient().post(
+            self.url, {'file': SimpleUploadedFile('polls.csv', CSV_BODY.encode())}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(Poll.objects.exists())
+
+    def test_import_polls_command_writes_in_batches(self):
+        rows = ''.join(f'Question {i}?,Yes|No|Maybe\n' for i in range(5))
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as source:
+            source.write('question,options\n' + rows)
+        self.addCleanup(os.remove, source.name)
+
+        err = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('import_polls', source.name, user='importer', batch_size=2, stderr=err)
+        self.assertIn('imported 5 polls (15 options)', err.getvalue())
+        self.assertEqual(Poll.objects.count(), 5)
+        self.assertEqual(Option.objects.count(), 15)
+        self.assertEqual(inserts_into(queries, 'polls_poll'), 3)
+        self.assertEqual(inserts_into(queries, 'polls_option'), 3)
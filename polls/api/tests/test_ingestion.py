@@ -0,0 +1,211 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError, OperationalError
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from polls import ingestion
+from polls.ingestion import SQLiteVoteQueue, VoteBuffer, get_vote_buffer, reset_vote_buffer
+from polls.models import Poll, Option, Vote, GuestVote
+
+User = get_user_model()
+
+BUFFERED = {
+    'MODE': 'buffered',
+    'BACKEND': 'polls.ingestion.MemoryVoteQueue',
+    'BATCH_SIZE': 100,
+    'DURABILITY': 'memory',
+    'AUTOSTART': False,
+}
+
+
+@override_settings(VOTE_INGESTION=BUFFERED)
+class BufferedVoteIngestionTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='voter', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.poll = Poll.objects.create(question='Tea or coffee?', created_by=self.user)
+        self.tea = Option.objects.create(poll=self.poll, option_text='Tea')
+        self.coffee = Option.objects.create(poll=self.poll, option_text='Coffee')
+        self.url = reverse('poll-vote', args=[self.poll.id])
+        cache.clear()
+        reset_vote_buffer()
+        self.addCleanup(reset_vote_buffer)
+
+    def guest_vote(self, option):
+        # SessionMiddleware drops the (empty) session cookie on every response.
+        guest = APIClient()
+        guest.cookies['sessionid'] = 'guest-1'
+        return guest.post(self.url, {'option': option.id}, REMOTE_ADDR='1.2.3.4', format='json')
+
+    def test_vote_is_accepted_and_written_on_flush(self):
+        response = self.client.post(self.url, {'option': self.tea.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(Vote.objects.exists())
+
+        self.assertEqual(get_vote_buffer().flush(), 1)
+        vote = Vote.objects.get(poll=self.poll, user=self.user)
+        self.assertEqual(vote.selected_option, self.tea)
+        self.tea.refresh_from_db()
+        self.assertEqual(self.tea.vote_count, 1)
+
+    def test_batch_upserts_and_moves_counters(self):
+        self.client.post(self.url, {'option': self.tea.id}, format='json')
+        self.guest_vote(self.tea)
+        get_vote_buffer().flush()
+
+        # Both voters change their minds; the second batch also repeats a vote.
+        self.client.post(self.url, {'option': self.coffee.id}, format='json')
+        self.guest_vote(self.tea)
+        self.guest_vote(self.coffee)
+        get_vote_buffer().flush()
+
+        self.assertEqual(Vote.objects.get(user__isnull=False).selected_option, self.coffee)
+        self.assertEqual(GuestVote.objects.get().selected_option, self.coffee)
+        self.tea.refresh_from_db()
+        self.coffee.refresh_from_db()
+        self.assertEqual((self.tea.vote_count, self.coffee.vote_count), (0, 2))
+
+        stats = get_vote_buffer().stats()
+        self.assertEqual(stats['flushes'], 2)
+        self.assertEqual(stats['last_batch_size'], 3)
+        self.assertEqual(stats['pending'], 0)
+
+    def test_validation_still_happens_before_queueing(self):
+        response = self.client.post(self.url, {'option': 9999}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(get_vote_buffer().stats()['submitted'], 0)
+
+    def test_sqlite_queue_replays_unacked_batch(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'queue.sqlite3')
+            buffer = VoteBuffer(SQLiteVoteQueue(path, durability='fsync'), durability='fsync')
+            buffer.submit(self.poll.id, self.tea.id, self.user.id)
+            items = buffer.queue.take(10)
+            buffer.queue.requeue(items)
+            self.assertEqual(len(buffer.queue), 1)
+
+            # A fresh queue on the same file still holds the vote.
+            self.assertEqual(len(SQLiteVoteQueue(path)), 1)
+            self.assertEqual(buffer.flush(), 1)
+            self.assertEqual(len(SQLiteVoteQueue(path)), 0)
+        self.assertTrue(Vote.objects.filter(poll=self.poll, user=self.user).exists())
+
+    def test_sqlite_queue_shared_by_processes_hands_out_each_entry_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'queue.sqlite3')
+            first, second = SQLiteVoteQueue(path), SQLiteVoteQueue(path)
+            for option in (self.tea, self.coffee, self.tea):
+                first.put({'poll': self.poll.id, 'option': option.id})
+            taken = first.take(2)
+            self.assertEqual([token for token, _ in second.take(10)], [3])
+            self.assertEqual((len(first), len(second)), (1, 0))
+
+            # Neither acks nor requeues touch entries the other one holds.
+            second.ack(taken)
+            first.requeue(taken)
+            self.assertEqual([token for token, _ in second.take(10)], [1, 2])
+
+            # Claims left by a process that died are taken over.
+            stranded = SQLiteVoteQueue(path, claim_timeout=0)
+            self.assertEqual([token for token, _ in stranded.take(10)], [1, 2, 3])
+
+    def test_sqlite_queue_length_does_not_query_the_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            queue = SQLiteVoteQueue(os.path.join(tmp, 'queue.sqlite3'))
+            for option in (self.tea, self.coffee, self.tea):
+                queue.put({'poll': self.poll.id, 'option': option.id})
+            with mock.patch.object(queue, '_conn') as conn:
+                self.assertEqual(len(queue), 3)
+            conn.execute.assert_not_called()
+            items = queue.take(2)
+            self.assertEqual(len(queue), 1)
+            queue.requeue(items)
+            self.assertEqual(len(queue), 3)
+            queue.take(10)
+            self.assertEqual(len(queue), 0)
+
+    @override_settings(REQUEST_METRICS={'ALLOWED_IPS': ['127.0.0.1']})
+    def test_live_buffer_stats_are_on_metrics(self):
+        for option in (self.tea, self.coffee):
+            self.client.post(self.url, {'option': option.id}, format='json')
+        get_vote_buffer().flush()
+        body = self.client.get('/metrics/').content.decode()
+        self.assertIn('polls_vote_ingestion_pending 0', body)
+        self.assertIn('polls_vote_ingestion_votes_total{outcome="submitted"} 2', body)
+        self.assertIn('polls_vote_ingestion_flushes_total{result="ok"} 1', body)
+        self.assertIn('polls_vote_ingestion_batch_size{batch="last"} 2', body)
+        self.assertRegex(body, r'polls_vote_ingestion_flush_seconds\{batch="max"\} \d+\.\d{6}')
+
+    def test_votes_for_deleted_polls_are_discarded(self):
+        other = Poll.objects.create(question='Gone soon?', created_by=self.user)
+        doomed = Option.objects.create(poll=other, option_text='Maybe')
+        buffer = get_vote_buffer()
+        buffer.submit(self.poll.id, self.tea.id, self.user.id)
+        buffer.submit(other.id, doomed.id, self.user.id)
+        other.delete()
+
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(buffer.flush(), 0)
+        stats = buffer.stats()
+        self.assertEqual((stats['pending'], stats['discarded'], stats['failed_flushes']), (0, 1, 0))
+        self.assertEqual(Vote.objects.get().selected_option, self.tea)
+
+    def test_one_bad_vote_does_not_block_the_batch(self):
+        voters = User.objects.bulk_create(User(username=f'bulk{i}') for i in range(4))
+        poison = voters[2].id
+        upsert_votes = ingestion.upsert_votes
+
+        def failing_upsert(entries):
+            if any(entry['user'] == poison for entry in entries):
+                raise IntegrityError('bad row')
+            return upsert_votes(entries)
+
+        buffer = get_vote_buffer()
+        for voter in voters:
+            buffer.submit(self.poll.id, self.tea.id, voter.id)
+        with mock.patch('polls.ingestion.upsert_votes', side_effect=failing_upsert), \
+                self.assertLogs('polls.ingestion', 'ERROR'):
+            self.assertEqual(buffer.flush(), 3)
+        self.assertEqual(set(Vote.objects.values_list('user_id', flat=True)),
+                         {voter.id for voter in voters} - {poison})
+        self.assertEqual((buffer.stats()['pending'], buffer.stats()['rejected']), (0, 1))
+
+    def test_connection_errors_keep_the_batch_queued(self):
+        buffer = get_vote_buffer()
+        buffer.submit(self.poll.id, self.tea.id, self.user.id)
+        with mock.patch('polls.ingestion.upsert_votes', side_effect=OperationalError('gone away')):
+            with self.assertRaises(OperationalError):
+                buffer.flush()
+        self.assertEqual(buffer.stats()['pending'], 1)
+        self.assertEqual(buffer.flush(), 1)
+
+    @override_settings(VOTE_INGESTION={**BUFFERED, 'DURABILITY': 'database', 'WAIT_TIMEOUT': 0.1})
+    def test_unconfirmed_database_durability_vote_is_503(self):
+        reset_vote_buffer()
+        with mock.patch('polls.ingestion.upsert_votes', side_effect=OperationalError('gone away')), \
+                self.assertLogs('polls.ingestion', 'ERROR'):
+            response = self.client.post(self.url, {'option': self.tea.id}, format='json')
+            guest = APIClient()
+            guest.cookies['sessionid'] = 'guest-1'
+            async_response = guest.post(
+                reverse('async-poll-vote', args=[self.poll.id]), {'option': self.coffee.id},
+                format='json', REMOTE_ADDR='1.2.3.4')
+        for response in (response, async_response):
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(Vote.objects.exists())
+        self.assertFalse(GuestVote.objects.exists())
+
+        # Both votes stayed queued and go out with the next one.
+        response = self.client.post(self.url, {'option': self.tea.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(Vote.objects.get(user=self.user).selected_option, self.tea)
+        self.assertEqual(GuestVote.objects.get().selected_option, self.coffee)
@@ -0,0 +1,117 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.serializers import BaseSerializer
+
+from polls.instrumentation import RequestMetricsMiddleware, get_metrics_registry, reset_metrics_registry
+from polls.models import Option, Poll
+
+User = get_user_model()
+
+
+def server_timing(response):
+    """Parse a Server-Timing header into ``{name: (duration_ms, description)}``."""
+    metrics = {}
+    for entry in response['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        params = dict(param.split('=', 1) for param in params)
+        metrics[name] = (float(params['dur']), params.get('desc', '').strip('"'))
+    return metrics
+
+
+@override_settings(POLL_VIEW_TRACKING={'ENABLED': False},
+                   REQUEST_METRICS={'SERVER_TIMING': True, 'ALLOWED_IPS': ['127.0.0.1']})
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_metrics_registry()
+        self.user = User.objects.create_user(username='owner', password='pass12345')
+        self.poll = Poll.objects.create(question='Measured?', created_by=self.user)
+        Option.objects.bulk_create(Option(poll=self.poll, option_text=text) for text in ('Yes', 'No'))
+
+    def test_server_timing_header(self):
+        with self.assertNumQueries(2) as queries:
+            response = self.client.get(reverse('poll-detail', args=[self.poll.id]))
+        timing = server_timing(response)
+        self.assertEqual(set(timing), {'total', 'db', 'serializer'})
+        self.assertEqual(timing['db'][1], f'{len(queries.captured_queries)} queries (0 duplicate)')
+        self.assertGreater(timing['serializer'][0], 0)
+        self.assertGreaterEqual(timing['total'][0], timing['db'][0])
+
+    def test_list_serializers_are_timed_and_drf_is_left_alone(self):
+        response = self.client.get(reverse('poll-list'))
+        self.assertGreater(server_timing(response)['serializer'][0], 0)
+        self.assertEqual(BaseSerializer.data.fget.__module__, 'rest_framework.serializers')
+
+    async def test_async_views_are_measured(self):
+        response = await self.async_client.get(reverse('async-poll-detail', args=[self.poll.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(server_timing(response)['db'][1], r'^[1-9]\d* queries')
+
+    def test_duplicate_queries_are_counted(self):
+        def view(request):
+            for _ in range(3):
+                Poll.objects.filter(pk=self.poll.id).exists()
+            Poll.objects.filter(pk=self.poll.id + 1).exists()
+            return HttpResponse()
+
+        response = RequestMetricsMiddleware(view)(RequestFactory().get('/'))
+        self.assertEqual(server_timing(response)['db'][1], '4 queries (2 duplicate)')
+
+    def test_metrics_endpoint_serves_per_route_histograms(self):
+        for _ in range(3):
+            self.client.get(reverse('poll-detail', args=[self.poll.id]))
+        self.client.get(reverse('poll-results', args=[self.poll.id]))
+        body = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('# TYPE polls_request_duration_seconds histogram', body)
+        labels = 'route="poll-detail",method="GET"'
+        self.assertIn(f'polls_request_duration_seconds_count{{{labels}}} 3', body)
+        self.assertIn(f'polls_request_queries_bucket{{{labels},le="2"}} 3', body)
+        self.assertIn(f'polls_request_queries_bucket{{{labels},le="1"}} 0', body)
+        self.assertIn(f'polls_request_duplicate_queries_total{{{labels}}} 0', body)
+        self.assertIn('route="poll-results"', body)
+        for line in body.splitlines():
+            self.assertRegex(line, r'^(# (HELP|TYPE) \w+ .+|\w+(\{[^}]*\})? [\d.e+-]+)$')
+
+    @override_settings(REQUEST_METRICS={'TOKEN': 's3cret'})
+    def test_metrics_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer s3cret'})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(REQUEST_METRICS={'ALLOWED_IPS': ['10.0.0.0/8']})
+    def test_metrics_allowed_ips(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.1.2.3').status_code, 200)
+
+    @override_settings(REQUEST_METRICS={})
+    def test_metrics_and_timings_are_private_by_default(self):
+        response = self.client.get(reverse('poll-detail', args=[self.poll.id]))
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(REQUEST_METRICS={'SLOW_REQUEST_MS': 0})
+    def test_slow_requests_log_their_queries(self):
+        with self.assertLogs('polls.instrumentation', 'WARNING') as logs:
+            self.client.get(reverse('poll-detail', args=[self.poll.id]))
+        self.assertIn('Slow request GET', logs.output[0])
+        self.assertIn('polls_option', logs.output[0])
+        self.assertEqual(len(re.findall(r' ms  SELECT', logs.output[0])), 2)
+
+    @override_settings(REQUEST_METRICS={'SLOW_REQUEST_MS': 0, 'SLOW_REQUEST_SAMPLE_RATE': 0})
+    def test_slow_request_sampling(self):
+        with self.assertNoLogs('polls.instrumentation', 'WARNING'):
+            self.client.get(reverse('poll-detail', args=[self.poll.id]))
+
+    @override_settings(REQUEST_METRICS={'ENABLED': False})
+    def test_disabled(self):
+        response = self.client.get(reverse('poll-detail', args=[self.poll.id]))
+        self.assertNotIn('Server-Timing', response)
+        self.assertNotIn('poll-detail', get_metrics_registry().render())
@@ -0,0 +1,132 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from polls.live import (
+    CacheVersionPubSub, InProcessPubSub, ResultsHub, get_results_hub, reset_results_hub)
+from polls.models import Option, Poll
+from polls.results_cache import bump_poll_version
+from polls.voting import cast_vote
+
+User = get_user_model()
+
+IN_PROCESS = {'BACKEND': 'polls.live.InProcessPubSub', 'AUTOSTART': False, 'HEARTBEAT': 0.05}
+
+
+def parse_event(chunk):
+    if isinstance(chunk, bytes):
+        chunk = chunk.decode()
+    fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n') if not line.startswith(':'))
+    return fields.get('event'), json.loads(fields['data']) if 'data' in fields else None
+
+
+class ResultsHubTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='owner', password='pass12345')
+        self.poll = Poll.objects.create(question='Live?', created_by=self.user)
+        self.yes = Option.objects.create(poll=self.poll, option_text='Yes')
+        Option.objects.create(poll=self.poll, option_text='No')
+        self.hub = ResultsHub(InProcessPubSub())
+
+    def vote(self, session):
+        # Signals only reach the process-wide hub; this one is told directly.
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(self.poll.id, self.yes.id, session_id=session, ip_address='1.2.3.4')
+        self.hub.publish(self.poll.id)
+
+    def test_subscribers_share_one_computation_per_tick(self):
+        subscribers = [self.hub.subscribe(self.poll.id) for _ in range(50)]
+        for subscriber in subscribers:
+            self.assertEqual(subscriber.get(0)[1]['results'][0]['votes'], 0)
+
+        for session in ('a', 'b', 'c'):
+            self.vote(session)
+        self.hub.tick()
+        self.assertEqual(self.hub.stats()['computations'], 1)
+        self.assertEqual(self.hub.stats()['deliveries'], 50)
+        for subscriber in subscribers:
+            delivered, payload = subscriber.get(0)
+            self.assertTrue(delivered)
+            self.assertEqual(payload['results'][0]['votes'], 3)
+
+        self.hub.tick()  # nothing changed since
+        self.assertEqual(self.hub.stats()['computations'], 1)
+        self.assertEqual(subscribers[0].get(0), (False, None))
+
+    def test_slow_subscriber_only_sees_latest(self):
+        subscriber = self.hub.subscribe(self.poll.id)
+        for session in ('a', 'b'):
+            self.vote(session)
+            self.hub.tick()
+        self.assertEqual(subscriber.get(0)[1]['results'][0]['votes'], 2)
+        self.assertEqual(subscriber.get(0), (False, None))
+
+    def test_unsubscribed_polls_are_not_computed(self):
+        subscriber = self.hub.subscribe(self.poll.id)
+        self.hub.unsubscribe(subscriber)
+        self.vote('a')
+        self.hub.tick()
+        self.assertEqual(self.hub.stats(), {
+            'polls': 0, 'subscribers': 0, 'computations': 0, 'deliveries': 0})
+
+    def test_deleted_poll_closes_stream(self):
+        subscriber = self.hub.subscribe(self.poll.id)
+        subscriber.get(0)
+        poll_id = self.poll.id
+        self.poll.delete()
+        bump_poll_version(poll_id)  # as PollViewSet.perform_destroy does
+        self.hub.publish(poll_id)
+        self.hub.tick()
+        self.assertEqual(subscriber.get(0), (True, None))
+
+    def test_cache_version_backend_detects_bumps(self):
+        pubsub = CacheVersionPubSub()
+        bump_poll_version(self.poll.id)
+        self.assertEqual(pubsub.changed([self.poll.id]), {self.poll.id})
+        self.assertEqual(pubsub.changed([self.poll.id]), set())
+        bump_poll_version(self.poll.id)
+        self.assertEqual(pubsub.changed([self.poll.id]), {self.poll.id})
+
+
+@override_settings(POLL_RESULTS_STREAM=IN_PROCESS)
+class ResultsStreamAPITests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_results_hub()
+        self.addCleanup(reset_results_hub)
+        self.user = User.objects.create_user(username='owner', password='pass12345')
+        self.poll = Poll.objects.create(question='Live?', created_by=self.user)
+        self.yes = Option.objects.create(poll=self.poll, option_text='Yes')
+        Option.objects.create(poll=self.poll, option_text='No')
+        self.url = reverse('poll-results-stream', args=[self.poll.id])
+
+    def test_stream_pushes_results_after_vote(self):
+        response = APIClient().get(self.url, HTTP_ACCEPT='text/event-stream')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = iter(response.streaming_content)
+        event, payload = parse_event(next(events))
+        self.assertEqual(event, 'results')
+        self.assertEqual(payload['results'][0], {'option': 'Yes', 'votes': 0})
+
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post(reverse('poll-vote', args=[self.poll.id]), {'option': self.yes.id}, format='json')
+        get_results_hub().tick()
+        event, payload = parse_event(next(events))
+        self.assertEqual(payload['results'][0], {'option': 'Yes', 'votes': 1})
+
+        self.assertEqual(parse_event(next(events)), (None, None))  # heartbeat
+        response.close()
+        self.assertEqual(get_results_hub().stats()['subscribers'], 0)
+
+    def test_missing_poll(self):
+        response = APIClient().get(reverse('poll-results-stream', args=[self.poll.id + 100]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
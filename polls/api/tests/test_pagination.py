@@ -0,0 +1,71 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from polls.api.pagination import KeysetPagination
+from polls.models import Poll, Option, GuestVote
+
+User = get_user_model()
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        owner = User.objects.create_user(username='owner', password='pass12345')
+        poll = Poll.objects.create(question='Pick one', created_by=owner)
+        option = Option.objects.create(poll=poll, option_text='A')
+        base = timezone.now()
+        votes = GuestVote.objects.bulk_create([
+            GuestVote(poll=poll, selected_option=option, session_id=f's{i}', ip_address='10.0.0.1')
+            for i in range(25)
+        ])
+        # Several rows share a timestamp so the id tie-breaker is exercised.
+        for i, vote in enumerate(votes):
+            GuestVote.objects.filter(pk=vote.pk).update(created_at=base - timedelta(seconds=i // 3))
+        self.expected = list(GuestVote.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+    def walk(self, url, key):
+        ids, pages = [], 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data[key]
+            pages += 1
+        return ids, pages
+
+    def test_forward_walk_visits_every_row_once_in_order(self):
+        ids, pages = self.walk(reverse('guestvote-list') + '?page_size=4', 'next')
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(pages, 7)
+
+    def test_previous_links_walk_back(self):
+        url = reverse('guestvote-list') + '?page_size=4'
+        while True:
+            response = self.client.get(url)
+            if not response.data['next']:
+                break
+            url = response.data['next']
+        last_page = [row['id'] for row in response.data['results']]
+        back = []
+        url = response.data['previous']
+        while url:
+            response = self.client.get(url)
+            back = [row['id'] for row in response.data['results']] + back
+            url = response.data['previous']
+        self.assertEqual(back + last_page, self.expected)
+
+    def test_page_size_is_capped(self):
+        with mock.patch.object(KeysetPagination, 'max_page_size', 5):
+            response = self.client.get(reverse('guestvote-list') + '?page_size=100000')
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(reverse('guestvote-list') + '?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,107 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from polls.models import Option, Poll
+
+User = get_user_model()
+
+
+class PollListFilterTests(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='pass12345')
+        self.bob = User.objects.create_user(username='bob', password='pass12345')
+        now = timezone.now()
+        specs = [
+            # question, creator, is_active, expires_at, options
+            ('Best programming language?', self.alice, True, now + timedelta(days=2), ['Python', 'Rust']),
+            ('Favourite pet?', self.alice, True, now - timedelta(days=1), ['Dogs', 'Cats']),
+            ('Tabs or spaces?', self.bob, False, None, ['Tabs', 'Spaces']),
+            ('Best editor for Python?', self.bob, True, now + timedelta(days=1), ['Vim', 'Emacs']),
+            ('Coffee or tea?', self.bob, True, None, ['Coffee', 'Tea']),
+        ]
+        for i, (question, creator, active, expires_at, options) in enumerate(specs):
+            poll = Poll.objects.create(question=question, created_by=creator, is_active=active,
+                                       expires_at=expires_at)
+            Poll.objects.filter(pk=poll.pk).update(created_at=now - timedelta(days=len(specs) - i))
+            Option.objects.bulk_create(Option(poll=poll, option_text=text) for text in options)
+        self.url = reverse('poll-list')
+
+    def questions(self, params):
+        questions, url = [], self.url
+        response = self.client.get(url, {**params, 'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+            questions += [row['question'] for row in response.data['results']]
+            if not response.data['next']:
+                return questions
+            response = self.client.get(response.data['next'])
+
+    def test_filters(self):
+        cases = [
+            ({'is_active': 'true'}, ['Coffee or tea?', 'Best editor for Python?', 'Favourite pet?',
+                                     'Best programming language?']),
+            ({'is_active': 'false'}, ['Tabs or spaces?']),
+            ({'expired': 'true'}, ['Favourite pet?']),
+            ({'expired': 'false', 'is_active': 'true'},
+             ['Coffee or tea?', 'Best editor for Python?', 'Best programming language?']),
+            ({'created_by': self.alice.id}, ['Favourite pet?', 'Best programming language?']),
+            ({'created_after': (timezone.now() - timedelta(days=3, hours=1)).isoformat(),
+              'created_before': (timezone.now() - timedelta(days=1, hours=1)).isoformat()},
+             ['Best editor for Python?', 'Tabs or spaces?']),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self.questions(params), expected)
+
+    def test_search_matches_questions_and_options(self):
+        self.assertEqual(self.questions({'search': 'python'}),
+                         ['Best editor for Python?', 'Best programming language?'])
+        self.assertEqual(self.questions({'search': 'dogs'}), ['Favourite pet?'])
+        self.assertEqual(self.questions({'search': 'best vim'}), ['Best editor for Python?'])
+        self.assertEqual(self.questions({'search': 'python', 'created_by': self.bob.id}),
+                         ['Best editor for Python?'])
+        self.assertEqual(self.questions({'search': 'nothing-matches'}), [])
+
+    def test_ordering_paginates_in_both_directions(self):
+        self.assertEqual(self.questions({'ordering': 'created_at'}), [
+            'Best programming language?', 'Favourite pet?', 'Tabs or spaces?',
+            'Best editor for Python?', 'Coffee or tea?'])
+        # Polls without an expiry date have no place in an expiry ordering.
+        ending_soon = ['Favourite pet?', 'Best editor for Python?', 'Best programming language?']
+        self.assertEqual(self.questions({'ordering': 'expires_at'}), ending_soon)
+        self.assertEqual(self.questions({'ordering': '-expires_at'}), ending_soon[::-1])
+        # Unknown fields fall back to newest first.
+        self.assertEqual(self.questions({'ordering': 'question'})[0], 'Coffee or tea?')
+
+        first = self.client.get(self.url, {'ordering': 'expires_at', 'page_size': 2})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual([row['id'] for row in back.data['results']],
+                         [row['id'] for row in first.data['results']])
+
+    def test_filters_keep_the_list_query_count(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'is_active': 'true', 'search': 'best', 'ordering': 'expires_at'})
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_invalid_parameters(self):
+        for params in ({'is_active': 'maybe'}, {'expired': '2'}, {'created_by': 'alice'},
+                       {'created_after': 'yesterday'}):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn(next(iter(params)), response.data)
+
+    def test_list_parameters_do_not_apply_to_a_single_poll(self):
+        poll = Poll.objects.get(question='Tabs or spaces?')
+        url = reverse('poll-detail', args=[poll.id])
+        for params in ({'is_active': 'true'}, {'search': 'coffee'}, {'is_active': 'maybe'}):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data['id'], poll.id)
@@ -1,3 +1,5 @@
+from io import StringIO
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
@@ -10,6 +12,7 @@ User = get_user_model()
 class PollAPITests(APITestCase):
     def setUp(self):
         import os
+        cache.clear()
         test_password = os.environ.get(
             'TEST_PASSWORD', 'secure_test_password_123')
         self.user = User.objects.create_user(
@@ -87,6 +90,18 @@ class PollAPITests(APITestCase):
         self.assertEqual(GuestVote.objects.filter(
             poll=self.poll, session_id=session_id, ip_address=ip_address).count(), 1)
 
+    def test_guest_vote_needs_session_and_ip(self):
+        requests = [
+            (reverse('poll-vote', args=[self.poll.id]), {'option': self.option1.id}),
+            (reverse('poll-ballot'), [{'poll': self.poll.id, 'option': self.option1.id}]),
+        ]
+        for url, data in requests:
+            with self.subTest(url=url):
+                response = self.guest_client.post(url, data, REMOTE_ADDR='', format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(response.data['detail'], 'Session ID and IP address are required for guest voting.')
+        self.assertFalse(Vote.objects.exists())
+
     def test_close_poll_by_creator(self):
         url = reverse('poll-close', args=[self.poll.id])
         response = self.client.post(url)
@@ -141,3 +156,79 @@ class PollAPITests(APITestCase):
         response = self.client.post(
             url, {'option': self.option1.id}, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_vote_updates_option_counters(self):
+        url = reverse('poll-vote', args=[self.poll.id])
+        self.client.post(url, {'option': self.option1.id}, format='json')
+        self.other_client.post(url, {'option': self.option1.id}, format='json')
+        self.guest_client.cookies['sessionid'] = 'guest-session-1'
+        self.guest_client.post(
+            url, {'option': self.option2.id}, REMOTE_ADDR='1.2.3.4', format='json')
+        # Changing a vote moves the tally instead of adding to it
+        self.client.post(url, {'option': self.option2.id}, format='json')
+        self.option1.refresh_from_db()
+        self.option2.refresh_from_db()
+        self.assertEqual(self.option1.vote_count, 1)
+        self.assertEqual(self.option2.vote_count, 2)
+
+        response = self.client.get(reverse('poll-results', args=[self.poll.id]))
+        self.assertEqual(response.data['results'], [
+            {'option': 'Red', 'votes': 1},
+            {'option': 'Blue', 'votes': 2},
+        ])
+
+    def test_vote_viewset_delete_updates_counters(self):
+        self.client.post(reverse('poll-vote', args=[self.poll.id]),
+                         {'option': self.option1.id}, format='json')
+        vote = Vote.objects.get(poll=self.poll, user=self.user)
+        response = self.client.delete(reverse('vote-detail', args=[vote.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.option1.refresh_from_db()
+        self.assertEqual(self.option1.vote_count, 0)
+
+    def test_vote_viewset_leaves_guest_votes_alone(self):
+        vote = Vote.objects.create(poll=self.poll, selected_option=self.option1, user=self.user)
+        guest_vote = GuestVote.objects.create(poll=self.poll, selected_option=self.option1,
+                                              session_id='s', ip_address='1.2.3.4')
+        response = self.client.get(reverse('vote-list'))
+        self.assertEqual([row['id'] for row in response.data['results']], [vote.id])
+        url = reverse('vote-detail', args=[guest_vote.id])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Vote.objects.filter(pk=guest_vote.id).exists())
+
+    def test_vote_endpoints_refuse_closed_polls(self):
+        vote = Vote.objects.create(poll=self.poll, selected_option=self.option1, user=self.user)
+        guest_vote = GuestVote.objects.create(poll=self.poll, selected_option=self.option1,
+                                              session_id='s', ip_address='1.2.3.4')
+        Poll.objects.filter(pk=self.poll.pk).update(is_active=False)
+        requests = [
+            (self.client.post, reverse('vote-list'), {'poll': self.poll.id, 'selected_option': self.option2.id,
+                                                      'user': self.other_user.id}),
+            (self.client.patch, reverse('vote-detail', args=[vote.id]), {'selected_option': self.option2.id}),
+            (self.client.delete, reverse('vote-detail', args=[vote.id]), None),
+            (self.guest_client.post, reverse('guestvote-list'), {
+                'poll': self.poll.id, 'selected_option': self.option2.id,
+                'session_id': 't', 'ip_address': '5.6.7.8'}),
+            (self.guest_client.delete, reverse('guestvote-detail', args=[guest_vote.id]), None),
+        ]
+        for method, url, data in requests:
+            with self.subTest(method=method.__name__, url=url):
+                response = method(url, data, format='json')
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertEqual(response.data['detail'], 'Voting is closed for this poll.')
+        self.assertEqual(Vote.objects.count(), 2)
+        self.option1.refresh_from_db()
+        self.assertEqual(self.option1.vote_count, 0)
+
+    def test_rebuild_vote_counts_command(self):
+        from django.core.management import call_command
+        Vote.objects.create(poll=self.poll, selected_option=self.option1, user=self.user)
+        GuestVote.objects.create(poll=self.poll, selected_option=self.option1,
+                                 session_id='s', ip_address='1.2.3.4')
+        Option.objects.filter(pk=self.option2.pk).update(vote_count=7)
+        call_command('rebuild_vote_counts', stdout=StringIO())
+        self.option1.refresh_from_db()
+        self.option2.refresh_from_db()
+        self.assertEqual(self.option1.vote_count, 2)
+        self.assertEqual(self.option2.vote_count, 0)
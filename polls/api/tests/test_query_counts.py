@@ -0,0 +1,140 @@
+from django.contrib.auth import get_user_model
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APITestCase, APIClient
+
+from polls.api.urls import router
+from polls.models import Poll, Option, Vote, GuestVote, PollView
+
+User = get_user_model()
+
+# Queries per request for every router-registered endpoint. These must not
+# depend on how many rows are on the page; registering a new endpoint
+# without an entry here fails the suite.
+EXPECTED_LIST_QUERIES = {
+    'poll': 2,          # keyset page of polls, prefetch of their options
+    'option': 2,        # COUNT, page
+    'vote': 1,          # keyset page, no COUNT
+    'guestvote': 1,
+    'pollview': 1,
+}
+EXPECTED_DETAIL_QUERIES = {
+    'poll': 2,          # poll, its options
+    'option': 1,
+    'vote': 1,
+    'guestvote': 1,
+    'pollview': 1,
+}
+PAGE_SIZES = (1, 5, 10)
+
+
+# View tracking stays on (it must add no queries to retrieve) but without its
+# background flusher writing from another thread mid-test.
+@override_settings(POLL_VIEW_TRACKING={'ENABLED': True, 'AUTOSTART': False})
+class QueryCountRegressionTests(APITestCase):
+    """
+    Every list/retrieve endpoint must run a fixed number of queries
+    regardless of how many rows it renders.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.rows = 0
+
+    def grow_to(self, size):
+        """Add polls (each with options, votes, guest votes and views) until there are ``size``."""
+        objects = {}
+        while self.rows < size:
+            self.rows += 1
+            voter = User.objects.create(username=f'voter{self.rows}')
+            poll = Poll.objects.create(question=f'Question {self.rows}?', created_by=self.owner)
+            first = Option.objects.create(poll=poll, option_text='Yes')
+            Option.objects.create(poll=poll, option_text='No')
+            objects = {
+                'poll': poll,
+                'option': first,
+                'vote': Vote.objects.create(poll=poll, selected_option=first, user=voter),
+                'guestvote': GuestVote.objects.create(
+                    poll=poll, selected_option=first,
+                    session_id=f'session-{self.rows}', ip_address='10.0.0.1'),
+                'pollview': PollView.objects.create(poll=poll, user=voter),
+            }
+        return objects
+
+    def test_every_registered_endpoint_has_an_expectation(self):
+        basenames = {basename for _, _, basename in router.registry}
+        self.assertEqual(basenames, set(EXPECTED_LIST_QUERIES))
+        self.assertEqual(basenames, set(EXPECTED_DETAIL_QUERIES))
+
+    def test_list_endpoints(self):
+        for size in PAGE_SIZES:
+            self.grow_to(size)
+            for _, _, basename in router.registry:
+                with self.subTest(endpoint=basename, page_size=size):
+                    with self.assertNumQueries(EXPECTED_LIST_QUERIES[basename]):
+                        response = self.client.get(reverse(f'{basename}-list'))
+                    self.assertEqual(response.status_code, 200)
+
+    def test_detail_endpoints(self):
+        for size in PAGE_SIZES:
+            objects = self.grow_to(size)
+            for _, _, basename in router.registry:
+                with self.subTest(endpoint=basename, rows=size):
+                    url = reverse(f'{basename}-detail', args=[objects[basename].pk])
+                    with self.assertNumQueries(EXPECTED_DETAIL_QUERIES[basename]):
+                        response = self.client.get(url)
+                    self.assertEqual(response.status_code, 200)
+
+
+class OwnershipQueryCountTests(APITestCase):
+    """
+    Ownership is checked on created_by_id, so no request loads the creator,
+    and close/reopen are a single conditional UPDATE when they succeed.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.other = User.objects.create_user(username='other', password='pass12345')
+        self.poll = Poll.objects.create(question='Owned?', created_by=self.owner)
+        Option.objects.create(poll=self.poll, option_text='Yes')
+        Option.objects.create(poll=self.poll, option_text='No')
+        self.client.force_authenticate(user=self.owner)
+
+    def test_close_and_reopen_are_one_update(self):
+        for name, active in (('poll-close', False), ('poll-reopen', True)):
+            with self.subTest(action=name):
+                with self.assertNumQueries(1):
+                    response = self.client.post(reverse(name, args=[self.poll.id]))
+                self.assertEqual(response.status_code, 200)
+                self.poll.refresh_from_db()
+                self.assertEqual(self.poll.is_active, active)
+
+    def test_failed_close_and_reopen(self):
+        # Reopening an open poll, someone else's poll, a missing poll.
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('poll-reopen', args=[self.poll.id]))
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(user=self.other)
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('poll-close', args=[self.poll.id]))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['detail'], 'You do not have permission to close this poll.')
+        self.assertTrue(Poll.objects.get(pk=self.poll.pk).is_active)
+        self.assertEqual(self.client.post(reverse('poll-close', args=[self.poll.id + 1])).status_code, 404)
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.post(reverse('poll-close', args=[self.poll.id])).status_code, 401)
+
+    def test_update_loads_the_poll_once(self):
+        # Poll, UPDATE, options for the response.
+        with self.assertNumQueries(3):
+            response = self.client.patch(
+                reverse('poll-detail', args=[self.poll.id]), {'question': 'Still owned?'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Poll.objects.get(pk=self.poll.pk).created_by, self.owner)
+
+        self.client.force_authenticate(user=self.other)
+        with self.assertNumQueries(1):
+            response = self.client.patch(
+                reverse('poll-detail', args=[self.poll.id]), {'question': 'Mine now?'}, format='json')
+        self.assertEqual(response.status_code, 403)
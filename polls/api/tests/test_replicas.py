@@ -0,0 +1,139 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APITestCase
+
+from polls.models import Option, Poll, PollView, Vote
+from polls.replicas import PIN_COOKIE, reading_from, replica_metrics, reset_replica_health
+
+User = get_user_model()
+
+# A second test database with no replication: it only holds what
+# replicate() copies to it, so anything written since looks like lag.
+STANDIN = 'replica_standin'
+REPLICATED = (User, Poll, Option, Vote, PollView)
+
+
+@override_settings(
+    POLL_READ_REPLICAS={'ALIASES': [STANDIN], 'MAX_LAG': 2.0, 'LAG_CHECK_INTERVAL': 60, 'PIN_SECONDS': 5,
+                        'OUTER_ATOMIC_BLOCKS': 2},
+    POLL_VIEW_TRACKING={'ENABLED': False})
+class ReadReplicaTests(APITestCase):
+    databases = {'default', STANDIN}
+
+    def setUp(self):
+        cache.clear()
+        reset_replica_health()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.poll = Poll.objects.create(question='Replicated?', created_by=self.owner)
+        self.yes, self.no = (Option.objects.create(poll=self.poll, option_text=text) for text in ('Yes', 'No'))
+        self.replicate()
+
+    def replicate(self):
+        """Bring the stand-in up to date with the primary."""
+        for model in reversed(REPLICATED):
+            model.objects.using(STANDIN).all().delete()
+        for model in REPLICATED:
+            model.objects.using(STANDIN).bulk_create(model.objects.all())
+
+    def test_reads_go_to_the_replica(self):
+        fresh = Poll.objects.create(question='Not replicated yet?', created_by=self.owner)
+        self.assertEqual(self.client.get(reverse('poll-detail', args=[fresh.id])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('poll-list'))
+        self.assertEqual([poll['id'] for poll in response.data['results']], [self.poll.id])
+
+        self.replicate()
+        self.assertEqual(self.client.get(reverse('poll-detail', args=[fresh.id])).status_code, status.HTTP_200_OK)
+
+    def test_analytics_and_export_read_the_replica(self):
+        PollView.objects.create(poll=self.poll, session_id='guest-1')
+        Vote.objects.create(poll=self.poll, selected_option=self.yes, user=self.owner)
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.client.get(reverse('pollview-list')).data['results'], [])
+        response = self.client.get(reverse('poll-export', args=[self.poll.id]), {'format': 'csv'})
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+
+        self.replicate()
+        self.assertEqual(len(self.client.get(reverse('pollview-list')).data['results']), 1)
+        response = self.client.get(reverse('poll-export', args=[self.poll.id]), {'format': 'csv'})
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 2)
+
+    def test_writers_read_their_own_writes(self):
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(reverse('poll-list'), {
+            'question': 'Pinned?', 'options_data': ['Yes', 'No']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.cookies[PIN_COOKIE]['max-age'], 5)
+        url = reverse('poll-detail', args=[response.data['id']])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        # Other clients are not pinned and read the replica.
+        self.assertEqual(APIClient().get(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn(PIN_COOKIE, self.client.get(url).cookies)
+
+    def test_results_right_after_a_vote_come_from_the_primary(self):
+        guest = APIClient()
+        guest.cookies['sessionid'] = 'guest-1'
+        with self.captureOnCommitCallbacks(execute=True):
+            response = guest.post(reverse('poll-vote', args=[self.poll.id]), {'option': self.yes.id},
+                                  REMOTE_ADDR='10.0.0.1', format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        url = reverse('poll-results', args=[self.poll.id])
+        for client in (guest, APIClient()):
+            # The voter is pinned, and so are the poll's changed results.
+            self.assertEqual([row['votes'] for row in client.get(url).data['results']], [1, 0])
+
+        # Once the pin has expired the results are recomputed on the replica.
+        cache.clear()
+        self.assertEqual([row['votes'] for row in APIClient().get(url).data['results']], [0, 0])
+
+    def test_async_results_pick_the_database_like_the_sync_view(self):
+        guest = APIClient()
+        guest.cookies['sessionid'] = 'guest-1'
+        with self.captureOnCommitCallbacks(execute=True):
+            guest.post(reverse('poll-vote', args=[self.poll.id]), {'option': self.yes.id},
+                       REMOTE_ADDR='10.0.0.1', format='json')
+        url = reverse('async-poll-results', args=[self.poll.id])
+        for client in (guest, APIClient()):
+            self.assertEqual([row['votes'] for row in client.get(url).json()['results']], [1, 0])
+
+        cache.clear()
+        self.assertEqual([row['votes'] for row in APIClient().get(url).json()['results']], [0, 0])
+
+    def test_lagging_or_unreachable_replicas_are_skipped(self):
+        fresh = Poll.objects.create(question='Not replicated yet?', created_by=self.owner)
+        url = reverse('poll-detail', args=[fresh.id])
+        with mock.patch('polls.replicas.replica_lag', return_value=30.0) as replica_lag:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        # Checked once per LAG_CHECK_INTERVAL.
+        self.assertEqual(replica_lag.call_count, 1)
+        self.assertIn('polls_replica_lag_seconds{alias="replica_standin"} 30.000', replica_metrics())
+
+        reset_replica_health()
+        with mock.patch('polls.replicas.replica_lag', return_value=None):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertIn('polls_replica_lag_seconds{alias="replica_standin"} NaN', replica_metrics())
+
+        reset_replica_health()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_router(self):
+        with reading_from(STANDIN):
+            self.assertEqual(Poll.objects.all().db, STANDIN)
+            # Other apps and writes stay on the primary, as do reads in a transaction.
+            self.assertEqual(User.objects.all().db, 'default')
+            poll = Poll.objects.get(pk=self.poll.pk)
+            poll.question = 'Renamed?'
+            poll.save()
+            with transaction.atomic():
+                self.assertEqual(Poll.objects.all().db, 'default')
+        self.assertEqual(Poll.objects.all().db, 'default')
+        self.assertEqual(Poll.objects.get(pk=self.poll.pk).question, 'Renamed?')
+        self.assertEqual(Poll.objects.using(STANDIN).get(pk=self.poll.pk).question, 'Replicated?')
@@ -0,0 +1,107 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from polls.models import Poll, Option
+from polls.results_cache import bump_poll_version, get_cached_results, get_poll_version
+
+User = get_user_model()
+
+
+class ResultsCacheAPITests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='owner', password='pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.guest_client = APIClient()
+        self.poll = Poll.objects.create(question='Cats or dogs?', created_by=self.user)
+        self.cats = Option.objects.create(poll=self.poll, option_text='Cats')
+        Option.objects.create(poll=self.poll, option_text='Dogs')
+        self.url = reverse('poll-results', args=[self.poll.id])
+
+    def test_unchanged_poll_is_served_without_queries(self):
+        first = self.guest_client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(self.url)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.guest_client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.guest_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_deleted_poll_is_not_revalidated(self):
+        etag = self.guest_client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            Poll.objects.filter(pk=self.poll.id).delete()
+        for if_none_match in (etag, '*'):
+            with self.subTest(if_none_match=if_none_match):
+                response = self.guest_client.get(self.url, HTTP_IF_NONE_MATCH=if_none_match)
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_vote_invalidates_results(self):
+        etag = self.guest_client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('poll-vote', args=[self.poll.id]),
+                             {'option': self.cats.id}, format='json')
+        response = self.guest_client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0], {'option': 'Cats', 'votes': 1})
+
+    def test_close_and_option_edits_invalidate_results(self):
+        etag = self.guest_client.get(self.url)['ETag']
+        self.client.post(reverse('poll-close', args=[self.poll.id]))
+        closed_etag = self.guest_client.get(self.url)['ETag']
+        self.assertNotEqual(closed_etag, etag)
+
+        self.client.patch(reverse('option-detail', args=[self.cats.id]),
+                          {'option_text': 'Kittens'}, format='json')
+        response = self.guest_client.get(self.url)
+        self.assertNotEqual(response['ETag'], closed_etag)
+        self.assertEqual(response.data['results'][0]['option'], 'Kittens')
+
+    def test_missing_poll_is_not_found(self):
+        response = self.guest_client.get(reverse('poll-results', args=[999999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ResultsCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_bump_changes_version(self):
+        version = get_poll_version(1)
+        self.assertEqual(get_poll_version(1), version)
+        bump_poll_version(1)
+        self.assertNotEqual(get_poll_version(1), version)
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(1)
+            return {'results': []}
+
+        threads = [
+            threading.Thread(target=get_cached_results, args=(7, 1, compute))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
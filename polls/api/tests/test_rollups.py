@@ -0,0 +1,113 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from polls.models import AnalyticsRollup, Ballot, Option, Poll, PollView, RollupWatermark, Vote
+from polls.rollups import rollup_metric, time_series
+from polls.tallying import pack_choices
+
+User = get_user_model()
+
+T0 = datetime(2025, 1, 1, 10, 0, tzinfo=dt_timezone.utc)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='pass12345')
+        self.poll = Poll.objects.create(question='Counted?', created_by=self.user)
+
+    def add_views(self, *offsets):
+        PollView.objects.bulk_create(
+            PollView(poll=self.poll, session_id=f's{i}', viewed_at=T0 + offset)
+            for i, offset in enumerate(offsets))
+
+    def test_views_are_bucketed_per_minute_hour_and_day(self):
+        self.add_views(timedelta(seconds=5), timedelta(seconds=50),
+                       timedelta(minutes=3), timedelta(hours=2))
+        self.assertEqual(rollup_metric('views', batch_size=2), 4)
+
+        def buckets(granularity):
+            return dict(AnalyticsRollup.objects.filter(
+                poll=self.poll, metric='views', granularity=granularity
+            ).values_list('bucket_start', 'count'))
+
+        self.assertEqual(buckets('minute'), {
+            T0: 2, T0 + timedelta(minutes=3): 1, T0 + timedelta(hours=2): 1})
+        self.assertEqual(buckets('hour'), {T0: 3, T0 + timedelta(hours=2): 1})
+        self.assertEqual(buckets('day'), {T0.replace(hour=0): 4})
+
+    def test_second_pass_only_counts_new_rows(self):
+        self.add_views(timedelta(0), timedelta(minutes=1))
+        rollup_metric('views')
+        self.add_views(timedelta(minutes=1, seconds=30))
+        self.assertEqual(rollup_metric('views'), 1)
+        self.assertEqual(rollup_metric('views'), 0)
+        self.assertEqual(
+            time_series([self.poll.id], 'views', 'hour', T0, T0 + timedelta(hours=1)),
+            [(T0, 3)])
+        self.assertEqual(RollupWatermark.objects.get(metric='views').last_id,
+                         PollView.objects.latest('id').id)
+
+    def test_ballots_count_as_votes_under_their_own_watermark(self):
+        option = Option.objects.create(poll=self.poll, option_text='Yes')
+        Vote.objects.create(poll=self.poll, selected_option=option, user=self.user)
+        ballot = Ballot.objects.create(poll=self.poll, session_id='s', ip_address='10.0.0.1',
+                                       choices=pack_choices([option.id]))
+        Ballot.objects.create(poll=self.poll, user=self.user, choices=pack_choices([option.id]))
+        Vote.objects.update(created_at=T0)
+        Ballot.objects.update(created_at=T0)
+
+        self.assertEqual(rollup_metric('votes', settle_seconds=0), 2)
+        self.assertEqual(rollup_metric('guest_votes', settle_seconds=0), 1)
+        self.assertEqual(time_series([self.poll.id], 'votes', 'day', T0, T0 + timedelta(days=1)),
+                         [(T0.replace(hour=0), 2)])
+        self.assertEqual(RollupWatermark.objects.get(metric='guest_ballots').last_id, ballot.id)
+
+    def test_unsettled_rows_wait_for_next_pass(self):
+        PollView.objects.create(poll=self.poll, session_id='now')
+        self.assertEqual(rollup_metric('views', settle_seconds=60), 0)
+        self.assertEqual(rollup_metric('views', settle_seconds=0), 1)
+
+    def test_command_rebuild_recounts_votes(self):
+        option = Option.objects.create(poll=self.poll, option_text='Yes')
+        vote = Vote.objects.create(poll=self.poll, user=self.user, selected_option=option)
+        Vote.objects.filter(pk=vote.pk).update(created_at=T0)
+        out = StringIO()
+        call_command('rollup_analytics', metric=['votes'], stdout=out)
+        self.assertIn('votes: 1 new row(s)', out.getvalue())
+        call_command('rollup_analytics', metric=['votes'], rebuild=True, stdout=out)
+        self.assertEqual(
+            AnalyticsRollup.objects.get(metric='votes', granularity='day').count, 1)
+
+
+class TimeSeriesAPITests(APITestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='owner', password='pass12345')
+        self.poll = Poll.objects.create(question='Counted?', created_by=user)
+        PollView.objects.bulk_create(
+            PollView(poll=self.poll, session_id=f's{i}', viewed_at=T0 + timedelta(hours=i // 2))
+            for i in range(5))
+        rollup_metric('views')
+        self.url = reverse('pollview-timeseries')
+
+    def test_hourly_series(self):
+        response = self.client.get(self.url, {
+            'poll': self.poll.id, 'granularity': 'hour',
+            'start': T0.isoformat(), 'end': (T0 + timedelta(hours=2)).isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['count'] for row in response.data['series']], [2, 2])
+        self.assertEqual(response.data['metric'], 'views')
+
+    def test_invalid_parameters(self):
+        for params in ({}, {'poll': 'x'}, {'poll': self.poll.id, 'metric': 'likes'},
+                       {'poll': self.poll.id, 'start': 'yesterday'},
+                       {'poll': self.poll.id, 'granularity': 'minute',
+                        'start': T0.isoformat(), 'end': (T0 + timedelta(days=30)).isoformat()}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
@@ -0,0 +1,139 @@
+import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+
+from polls.models import AnalyticsSketch, Option, Poll, PollView, Vote
+from polls.rollups import distinct_counts, rollup_metric
+from polls.sketches import HyperLogLog, merge_all, precision_for_error
+
+User = get_user_model()
+
+T0 = datetime(2025, 1, 1, 0, 0, tzinfo=dt_timezone.utc)
+
+
+def assert_close(test, estimate, exact, precision=14, sigmas=3):
+    """The estimate must be within ``sigmas`` standard errors of the exact count."""
+    tolerance = max(sigmas * 1.04 / (1 << precision) ** 0.5 * exact, 1)
+    test.assertLessEqual(abs(estimate - exact), tolerance, f"estimated {estimate}, exact {exact}")
+
+
+class HyperLogLogTests(SimpleTestCase):
+    def test_precision_for_error(self):
+        self.assertEqual(precision_for_error(0.01), 14)
+        self.assertEqual(precision_for_error(0.02), 12)
+        with self.assertRaises(ValueError):
+            precision_for_error(0)
+
+    def test_accuracy_against_exact_counts(self):
+        rng = random.Random(7)
+        for exact in (0, 1, 50, 1000, 25000, 120000):
+            with self.subTest(exact=exact):
+                sketch = HyperLogLog(14)
+                values = [f'session-{rng.getrandbits(64)}' for _ in range(exact)]
+                # Repeats must not inflate the estimate.
+                sketch.update(values + values[: exact // 3])
+                assert_close(self, sketch.count(), len(set(values)))
+
+    def test_merge_and_precision_reduction(self):
+        a, b = HyperLogLog(14), HyperLogLog(12)
+        a.update(f'v{i}' for i in range(30000))
+        b.update(f'v{i}' for i in range(20000, 60000))
+        assert_close(self, merge_all([a, b]).count(), 60000, precision=12)
+        self.assertEqual(merge_all([a, b]).precision, 12)
+        assert_close(self, a.reduce(12).count(), 30000, precision=12)
+        # Merging the same values twice is a no-op.
+        self.assertEqual(merge_all([a, a]).count(), a.count())
+        self.assertIsNone(merge_all([]))
+
+    def test_storage_stays_small(self):
+        sketch = HyperLogLog(14)
+        sketch.update(f'v{i}' for i in range(200000))
+        data = sketch.to_bytes()
+        self.assertLess(len(data), 8 * 1024)
+        self.assertEqual(HyperLogLog.from_bytes(data).count(), sketch.count())
+
+
+class UniqueCountRollupTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.polls = [Poll.objects.create(question=f'Q{i}?', created_by=self.owner) for i in range(2)]
+        rng = random.Random(11)
+        # 6000 views from 1500 guests over two days, spread across both polls.
+        self.guests = [(f'session-{i}', f'10.0.{i // 250}.{i % 250}') for i in range(1500)]
+        PollView.objects.bulk_create(
+            PollView(poll=rng.choice(self.polls), session_id=session, ip_address=ip,
+                     viewed_at=T0 + timedelta(minutes=rng.randrange(2 * 24 * 60)))
+            for session, ip in (rng.choice(self.guests) for _ in range(6000)))
+
+    def exact_viewers(self, polls, start, end):
+        return len(set(PollView.objects.filter(
+            poll__in=polls, viewed_at__gte=start, viewed_at__lt=end
+        ).values_list('session_id', 'ip_address')))
+
+    def test_unique_viewers_match_exact_counts(self):
+        self.assertEqual(rollup_metric('viewers', batch_size=2500), 6000)
+        end = T0 + timedelta(days=2)
+        total, series = distinct_counts([poll.id for poll in self.polls], 'viewers', 'day', T0, end)
+        assert_close(self, total, self.exact_viewers(self.polls, T0, end))
+        self.assertEqual([bucket for bucket, _ in series], [T0, T0 + timedelta(days=1)])
+        for bucket, estimate in series:
+            assert_close(self, estimate, self.exact_viewers(self.polls, bucket, bucket + timedelta(days=1)))
+
+        window = (T0 + timedelta(hours=5), T0 + timedelta(hours=17))
+        total, series = distinct_counts([self.polls[0].id], 'viewers', 'hour', *window)
+        self.assertEqual(len(series), 12)
+        assert_close(self, total, self.exact_viewers(self.polls[:1], *window))
+
+    def test_later_passes_merge_into_existing_sketches(self):
+        rollup_metric('viewers')
+        sketches = AnalyticsSketch.objects.count()
+        # The same guests come back: no new buckets, no change in the estimate.
+        PollView.objects.bulk_create(
+            PollView(poll=self.polls[0], session_id=session, ip_address=ip, viewed_at=T0)
+            for session, ip in self.guests[:500])
+        before = distinct_counts([self.polls[0].id], 'viewers', 'day', T0, T0 + timedelta(days=1))[0]
+        self.assertEqual(rollup_metric('viewers'), 500)
+        self.assertEqual(AnalyticsSketch.objects.count(), sketches)
+        after = distinct_counts([self.polls[0].id], 'viewers', 'day', T0, T0 + timedelta(days=1))[0]
+        assert_close(self, after, self.exact_viewers(self.polls[:1], T0, T0 + timedelta(days=1)))
+        self.assertGreaterEqual(after, before)
+
+    @override_settings(ANALYTICS_SKETCH_ERROR=0.05)
+    def test_error_rate_is_configurable(self):
+        rollup_metric('viewers')
+        precision = precision_for_error(0.05)
+        for data in AnalyticsSketch.objects.values_list('sketch', flat=True):
+            self.assertEqual(HyperLogLog.from_bytes(data).precision, precision)
+        end = T0 + timedelta(days=2)
+        total, _ = distinct_counts([poll.id for poll in self.polls], 'viewers', 'day', T0, end)
+        assert_close(self, total, self.exact_viewers(self.polls, T0, end), precision=precision)
+
+    def test_unique_voters_count_users_and_guests(self):
+        option = Option.objects.create(poll=self.polls[0], option_text='Yes')
+        users = User.objects.bulk_create(User(username=f'u{i}') for i in range(300))
+        Vote.objects.bulk_create(
+            [Vote(poll=self.polls[0], selected_option=option, user=user, voter_key=f'u:{user.id}')
+             for user in users] +
+            [Vote(poll=self.polls[0], selected_option=option, session_id=session, ip_address=ip,
+                  voter_key=f'g:{session}|{ip}')
+             for session, ip in self.guests[:700]])
+        Vote.objects.update(created_at=T0)
+        self.assertEqual(rollup_metric('voters'), 1000)
+
+        response = self.client.get(reverse('pollview-unique'), {
+            'poll': self.polls[0].id, 'metric': 'voters',
+            'start': T0.isoformat(), 'end': (T0 + timedelta(days=1)).isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        assert_close(self, response.data['estimate'], 1000)
+        self.assertEqual(response.data['error_rate'], 0.01)
+        self.assertEqual(len(response.data['series']), 1)
+
+    def test_invalid_parameters(self):
+        url = reverse('pollview-unique')
+        for params in ({'poll': self.polls[0].id, 'metric': 'views'},
+                       {'poll': self.polls[0].id, 'granularity': 'minute'}):
+            self.assertEqual(self.client.get(url, params).status_code, status.HTTP_400_BAD_REQUEST)
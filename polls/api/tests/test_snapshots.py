@@ -0,0 +1,200 @@
+import csv
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from polls.counters import rebuild_vote_counts
+from polls.exports import iter_vote_rows
+from polls.models import Ballot, Option, Poll, PollView, Vote
+from polls.snapshots import (
+    open_snapshot, pending_snapshots, snapshot_distinct_counts, snapshot_path, snapshot_poll, snapshot_time_series,
+    take_snapshots)
+from polls.tallying import pack_choices
+from polls.voting import compute_results
+
+User = get_user_model()
+
+T0 = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=3)
+
+
+class SnapshotTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        overrides = override_settings(POLL_SNAPSHOTS={'DIR': directory}, POLL_VIEW_TRACKING={'ENABLED': False})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.voters = User.objects.bulk_create(User(username=f'voter{i}') for i in range(4))
+        self.poll = Poll.objects.create(question='Mountains or sea?', created_by=self.owner)
+        self.mountains = Option.objects.create(poll=self.poll, option_text='Mountains')
+        self.sea = Option.objects.create(poll=self.poll, option_text='Sea')
+        for i, voter in enumerate(self.voters):
+            Vote.objects.create(poll=self.poll, selected_option=self.sea if i % 2 else self.mountains, user=voter)
+        for i in range(3):
+            Vote.objects.create(poll=self.poll, selected_option=self.sea, session_id=f'guest-{i}',
+                                ip_address='10.0.0.1')
+        for i, vote in enumerate(Vote.objects.filter(poll=self.poll).order_by('id')):
+            Vote.objects.filter(pk=vote.pk).update(created_at=T0 + timedelta(minutes=40 * i))
+        PollView.objects.bulk_create(
+            PollView(poll=self.poll, session_id=f'guest-{i % 3}', ip_address='10.0.0.1',
+                     viewed_at=T0 + timedelta(minutes=25 * i))
+            for i in range(8))
+        rebuild_vote_counts([self.poll.id])
+
+    def close(self, poll, closed_at):
+        Poll.objects.filter(pk=poll.pk).update(is_active=False, updated_at=closed_at)
+        poll.refresh_from_db()
+
+
+class SnapshotTests(SnapshotTestCase, APITestCase):
+    def test_settled_closed_polls_are_snapshotted(self):
+        now = timezone.now()
+        self.close(self.poll, now - timedelta(seconds=30))
+        self.assertFalse(pending_snapshots(now).exists())
+        self.assertEqual(take_snapshots(now=now), 0)
+
+        later = now + timedelta(seconds=60)
+        self.assertEqual(list(pending_snapshots(later)), [self.poll])
+        self.assertEqual(take_snapshots(now=later), 1)
+        self.poll.refresh_from_db()
+        self.assertIsNotNone(self.poll.snapshot_at)
+        self.assertFalse(pending_snapshots(later).exists())
+
+        snapshot = open_snapshot(self.poll.id)
+        self.assertEqual((snapshot.votes, snapshot.header['views']), (7, 8))
+        self.assertEqual(snapshot.guests().tolist(), [False] * 4 + [True] * 3)
+        self.assertEqual(snapshot.vote_counts([self.mountains.id, self.sea.id]).tolist(), [2, 5])
+
+    def test_results_and_export_match_the_database(self):
+        closed_at = timezone.now()
+        self.close(self.poll, closed_at)
+        expected_results = compute_results(self.poll)
+        expected_rows = list(iter_vote_rows(self.poll.id, chunk_size=3))
+
+        self.assertIsNotNone(snapshot_poll(self.poll.id, closed_at))
+        # Counted from the snapshot, not the denormalized counters.
+        Option.objects.filter(poll=self.poll).update(vote_count=0)
+        self.assertEqual(compute_results(self.poll), expected_results)
+        self.assertEqual(list(iter_vote_rows(self.poll.id, chunk_size=3)), expected_rows)
+
+    def test_reopened_or_edited_polls_keep_no_snapshot(self):
+        closed_at = timezone.now()
+        self.close(self.poll, closed_at)
+        # Edited between the queue read and the write: the file is withdrawn.
+        Poll.objects.filter(pk=self.poll.pk).update(updated_at=closed_at + timedelta(seconds=1))
+        self.assertIsNone(snapshot_poll(self.poll.id, closed_at))
+        self.assertFalse(snapshot_path(self.poll.id).exists())
+
+        self.poll.refresh_from_db()
+        self.assertIsNotNone(snapshot_poll(self.poll.id, self.poll.updated_at))
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(reverse('poll-reopen', args=[self.poll.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.poll.refresh_from_db()
+        self.assertIsNone(self.poll.snapshot_at)
+        self.assertFalse(snapshot_path(self.poll.id).exists())
+
+    @override_settings(POLL_SNAPSHOTS={'ENABLED': False})
+    def test_disabled(self):
+        self.close(self.poll, timezone.now() - timedelta(days=1))
+        self.assertEqual(take_snapshots(), 0)
+        self.assertIsNone(open_snapshot(self.poll.id))
+
+    def test_ballot_polls(self):
+        poll = Poll.objects.create(question='Rank them', created_by=self.owner, voting_method='ranked')
+        a, b, c = (Option.objects.create(poll=poll, option_text=text).id for text in 'ABC')
+        Ballot.objects.bulk_create(
+            Ballot(poll=poll, voter_key=f'g:{i}', session_id=f'g{i}', ip_address='10.0.0.1',
+                   choices=pack_choices(ranking))
+            for i, ranking in enumerate([[a, b], [b, c], [c, b], [b], [a, c, b]]))
+        closed_at = timezone.now()
+        self.close(poll, closed_at)
+        expected = {method: compute_results(poll, method) for method in ('irv', 'borda', 'plurality')}
+        rows = list(iter_vote_rows(poll.id))
+
+        snapshot_poll(poll.id, closed_at)
+        Ballot.objects.filter(poll=poll).delete()
+        for method, results in expected.items():
+            with self.subTest(method=method):
+                self.assertEqual(compute_results(poll, method), results)
+        # Who voted, and when, is kept too.
+        self.assertEqual(list(iter_vote_rows(poll.id)), rows)
+        window = (closed_at - timedelta(days=1), closed_at + timedelta(days=1))
+        self.assertEqual(snapshot_distinct_counts([poll.id], 'voters', 'day', *window)[0], 5)
+        self.assertEqual(sum(count for _, count in snapshot_time_series([poll.id], 'guest_votes', 'day', *window)), 5)
+
+    def test_snapshot_polls_command(self):
+        self.close(self.poll, timezone.now())
+        out = StringIO()
+        call_command('snapshot_polls', stdout=out)
+        self.assertIn('0 poll snapshot(s) written', out.getvalue())
+        call_command('snapshot_polls', '--poll', str(self.poll.id), stdout=out)
+        self.assertIn('1 poll snapshot(s) written', out.getvalue())
+        self.assertTrue(snapshot_path(self.poll.id).exists())
+
+
+class SnapshotAnalyticsAPITests(SnapshotTestCase, APITestCase):
+    def setUp(self):
+        super().setUp()
+        closed_at = timezone.now()
+        self.close(self.poll, closed_at)
+        snapshot_poll(self.poll.id, closed_at)
+        self.window = {'poll': self.poll.id, 'start': T0.isoformat(), 'end': (T0 + timedelta(hours=3)).isoformat()}
+
+    def test_time_series_is_counted_from_the_snapshot(self):
+        # No rollups have been run: every vote count comes from the snapshot.
+        response = self.client.get(reverse('pollview-timeseries'), {
+            **self.window, 'metric': 'votes', 'granularity': 'hour'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([row['count'] for row in response.data['series']], [2, 1, 1])
+
+        response = self.client.get(reverse('pollview-timeseries'), {
+            **self.window, 'metric': 'guest_votes', 'granularity': 'hour'})
+        self.assertEqual([row['count'] for row in response.data['series']], [1])
+
+        # Closed polls are still viewed: views come from the rollups.
+        response = self.client.get(reverse('pollview-timeseries'), {**self.window, 'granularity': 'hour'})
+        self.assertEqual(response.data['series'], [])
+
+    def test_unique_counts_are_exact(self):
+        response = self.client.get(reverse('pollview-unique'),
+                                   {**self.window, 'metric': 'voters', 'granularity': 'hour'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['estimate'], 5)
+        self.assertEqual(response.data['error_rate'], 0.0)
+        self.assertEqual([row['estimate'] for row in response.data['series']], [2, 1, 2])
+
+    def test_unsnapshotted_polls_use_the_rollups(self):
+        other = Poll.objects.create(question='Open?', created_by=self.owner)
+        response = self.client.get(reverse('pollview-unique'), {
+            **self.window, 'poll': f'{self.poll.id},{other.id}', 'metric': 'voters'})
+        self.assertEqual(response.data['estimate'], 0)
+        self.assertEqual(response.data['error_rate'], 0.01)
+
+
+class ExportFromSnapshotTests(SnapshotTestCase, APITestCase):
+    def test_csv_export(self):
+        self.client.force_authenticate(self.owner)
+        url = reverse('poll-export', args=[self.poll.id])
+        before = b''.join(self.client.get(url, {'format': 'csv'}).streaming_content).decode()
+        closed_at = timezone.now()
+        self.close(self.poll, closed_at)
+        snapshot_poll(self.poll.id, closed_at)
+        Vote.objects.filter(poll=self.poll).delete()
+        after = b''.join(self.client.get(url, {'format': 'csv'}).streaming_content).decode()
+        self.assertEqual(after, before)
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(after)))), 7)
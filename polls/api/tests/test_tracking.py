@@ -0,0 +1,89 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase, APIClient
+
+from polls.models import Poll, PollView
+from polls.tracking import ViewTracker, get_view_tracker, reset_view_tracker
+
+User = get_user_model()
+
+
+@override_settings(POLL_VIEW_TRACKING={'ENABLED': True, 'AUTOSTART': False, 'BATCH_SIZE': 2})
+class PollViewTrackingAPITests(APITestCase):
+    def setUp(self):
+        reset_view_tracker()
+        self.addCleanup(reset_view_tracker)
+        self.user = User.objects.create_user(username='viewer', password='pass12345')
+        self.poll = Poll.objects.create(question='Seen?', created_by=self.user)
+
+    def test_retrieve_buffers_views_until_flush(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        url = reverse('poll-detail', args=[self.poll.id])
+        for _ in range(3):
+            self.assertEqual(client.get(url).status_code, status.HTTP_200_OK)
+        self.assertFalse(PollView.objects.exists())
+
+        tracker = get_view_tracker()
+        self.assertEqual(tracker.flush(), 3)
+        self.assertEqual(PollView.objects.filter(poll=self.poll, user=self.user).count(), 3)
+        self.assertEqual(tracker.stats()['flushes'], 2)  # batches of two
+
+    def test_tracking_status_is_staff_only(self):
+        url = reverse('pollview-tracking')
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self.assertEqual(client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+        admin = User.objects.create_superuser(username='admin', password='pass12345')
+        client.force_authenticate(user=admin)
+        response = client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['enabled'])
+        self.assertIn('dropped', response.data)
+
+
+class ViewTrackerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='viewer', password='pass12345')
+        self.poll = Poll.objects.create(question='Seen?', created_by=self.user)
+
+    def test_drop_oldest_keeps_newest_events(self):
+        tracker = ViewTracker(capacity=2, overflow='drop_oldest')
+        for session in ('a', 'b', 'c'):
+            self.assertTrue(tracker.record(self.poll.id, session_id=session))
+        self.assertEqual(tracker.stats()['dropped'], 1)
+        tracker.flush()
+        self.assertEqual(sorted(PollView.objects.values_list('session_id', flat=True)), ['b', 'c'])
+
+    def test_drop_newest_rejects_when_full(self):
+        tracker = ViewTracker(capacity=1, overflow='drop_newest')
+        self.assertTrue(tracker.record(self.poll.id, session_id='a'))
+        self.assertFalse(tracker.record(self.poll.id, session_id='b'))
+        tracker.flush()
+        self.assertEqual(list(PollView.objects.values_list('session_id', flat=True)), ['a'])
+
+    def test_views_of_deleted_polls_are_discarded(self):
+        tracker = ViewTracker()
+        tracker.record(self.poll.id)
+        tracker.record(self.poll.id + 1000)
+        self.assertEqual(tracker.flush(), 1)
+        self.assertEqual(tracker.stats()['discarded'], 1)
+
+    def test_failed_flush_keeps_the_batch(self):
+        tracker = ViewTracker(capacity=3, batch_size=2)
+        for session in ('a', 'b', 'c'):
+            tracker.record(self.poll.id, session_id=session)
+        with mock.patch('polls.tracking.PollView.objects.bulk_create', side_effect=OperationalError('gone away')):
+            with self.assertRaises(OperationalError):
+                tracker.flush()
+        tracker.record(self.poll.id, session_id='d')
+        stats = tracker.stats()
+        self.assertEqual((stats['buffered'], stats['failed_flushes'], stats['dropped']), (3, 1, 1))
+
+        self.assertEqual(tracker.flush(), 3)
+        self.assertEqual(sorted(PollView.objects.values_list('session_id', flat=True)), ['b', 'c', 'd'])
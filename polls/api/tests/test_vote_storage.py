@@ -0,0 +1,138 @@
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from polls.models import GuestVote, LegacyGuestVote, Option, Poll, Vote, make_voter_key
+from polls.voting import cast_vote
+
+User = get_user_model()
+
+T0 = datetime(2025, 1, 1, 10, 0, tzinfo=dt_timezone.utc)
+
+
+class UnifiedVoteStorageTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='voter', password='pass12345')
+        self.poll = Poll.objects.create(question='One table?', created_by=self.user)
+        self.yes = Option.objects.create(poll=self.poll, option_text='Yes')
+        self.no = Option.objects.create(poll=self.poll, option_text='No')
+
+    def test_one_row_per_voter_key(self):
+        self.assertTrue(cast_vote(self.poll.id, self.yes.id, user_id=self.user.id))
+        self.assertTrue(cast_vote(self.poll.id, self.yes.id, session_id='s1', ip_address='1.2.3.4'))
+        self.assertFalse(cast_vote(self.poll.id, self.no.id, session_id='s1', ip_address='1.2.3.4'))
+        self.assertEqual(Vote.objects.count(), 2)
+        self.assertEqual(GuestVote.objects.get().selected_option, self.no)
+        self.assertEqual(
+            set(Vote.objects.values_list('voter_key', flat=True)),
+            {f'u:{self.user.id}', make_voter_key(session_id='s1', ip_address='1.2.3.4')})
+
+    def test_viewsets_reject_duplicate_and_anonymous_votes(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        body = {'poll': self.poll.id, 'selected_option': self.yes.id, 'user': self.user.id}
+        self.assertEqual(client.post(reverse('vote-list'), body, format='json').status_code,
+                         status.HTTP_201_CREATED)
+        self.assertEqual(client.post(reverse('vote-list'), body, format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        anonymous = {'poll': self.poll.id, 'selected_option': self.yes.id}
+        self.assertEqual(client.post(reverse('vote-list'), anonymous, format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(client.post(reverse('guestvote-list'), anonymous, format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+        guest = {**anonymous, 'session_id': 's1', 'ip_address': '1.2.3.4'}
+        response = APIClient().post(reverse('guestvote-list'), guest, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('user', response.data)
+        self.assertEqual(len(APIClient().get(reverse('guestvote-list')).data['results']), 1)
+        self.yes.refresh_from_db()
+        self.assertEqual(self.yes.vote_count, 2)
+
+    def test_backfill_copies_rollout_stragglers(self):
+        cast_vote(self.poll.id, self.yes.id, session_id='s1', ip_address='1.2.3.4')
+        # Written by workers still on the previous release:
+        LegacyGuestVote.objects.create(poll=self.poll, selected_option=self.no,
+                                       session_id='s2', ip_address='1.2.3.4')
+        LegacyGuestVote.objects.create(poll=self.poll, selected_option=self.no,
+                                       session_id='s1', ip_address='1.2.3.4')
+        unkeyed = Vote.objects.create(poll=self.poll, selected_option=self.no, user=self.user)
+        Vote.objects.filter(pk=unkeyed.pk).update(voter_key=None)
+
+        out = StringIO()
+        call_command('backfill_votes', stdout=out)
+        self.assertIn('keyed=1', out.getvalue())
+        self.assertFalse(Vote.objects.filter(voter_key__isnull=True).exists())
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assertEqual(GuestVote.objects.get(session_id='s1').selected_option, self.yes)
+        self.yes.refresh_from_db()
+        self.no.refresh_from_db()
+        self.assertEqual((self.yes.vote_count, self.no.vote_count), (1, 2))
+
+    def test_backfill_keeps_the_newest_of_duplicate_votes(self):
+        other = User.objects.create_user(username='other', password='pass12345')
+        cast_vote(self.poll.id, self.yes.id, user_id=self.user.id)
+        # Unkeyed rows written by the previous release, newer than the keyed one.
+        Vote.objects.bulk_create([
+            Vote(poll=self.poll, selected_option=self.yes, user=other),
+            Vote(poll=self.poll, selected_option=self.no, user=self.user),
+            Vote(poll=self.poll, selected_option=self.no, user=other),
+        ])
+
+        out = StringIO()
+        call_command('backfill_votes', stdout=out)
+        self.assertIn('keyed=2 duplicates_removed=2', out.getvalue())
+        self.assertEqual(dict(Vote.objects.values_list('user_id', 'selected_option_id')),
+                         {self.user.id: self.no.id, other.id: self.no.id})
+        self.yes.refresh_from_db()
+        self.no.refresh_from_db()
+        self.assertEqual((self.yes.vote_count, self.no.vote_count), (0, 2))
+
+
+class VoteStorageMigrationTests(TransactionTestCase):
+    before = [('polls', '0005_analytics_rollups')]
+    after = [('polls', '0006_unified_vote_storage')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_guest_votes_move_into_vote_table(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.before)
+        old = executor.loader.project_state(self.before).apps
+        user = old.get_model('auth', 'User').objects.create(username='voter')
+        poll = old.get_model('polls', 'Poll').objects.create(question='Q', created_by_id=user.id)
+        Option = old.get_model('polls', 'Option')
+        yes = Option.objects.create(poll=poll, option_text='Yes', vote_count=9)
+        no = Option.objects.create(poll=poll, option_text='No')
+        OldVote = old.get_model('polls', 'Vote')
+        OldVote.objects.create(poll=poll, selected_option=yes, user_id=user.id)
+        # The same guest in both tables is merged into one vote.
+        OldVote.objects.create(poll=poll, selected_option=yes, session_id='s1', ip_address='1.2.3.4')
+        OldGuestVote = old.get_model('polls', 'GuestVote')
+        OldGuestVote.objects.create(poll=poll, selected_option=no, session_id='s1', ip_address='1.2.3.4')
+        guest = OldGuestVote.objects.create(poll=poll, selected_option=no, session_id='s2', ip_address='1.2.3.4')
+        OldGuestVote.objects.filter(pk=guest.pk).update(created_at=T0)
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(self.after)
+        new = executor.loader.project_state(self.after).apps
+        Vote = new.get_model('polls', 'Vote')
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assertEqual(Vote.objects.get(user_id=user.id).voter_key, f'u:{user.id}')
+        self.assertEqual(Vote.objects.get(session_id='s1').selected_option_id, yes.id)
+        self.assertEqual(Vote.objects.get(session_id='s2').created_at, T0)
+        self.assertEqual(
+            dict(new.get_model('polls', 'Option').objects.values_list('pk', 'vote_count')),
+            {yes.id: 2, no.id: 1})
@@ -0,0 +1,216 @@
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from polls.models import Ballot, Option, Poll, Vote
+from polls.tallying import (
+    borda_totals, first_preferences, instant_runoff, load_ballots, pack_choices, unpack_choices,
+    weighted_totals)
+
+User = get_user_model()
+
+
+class TallyingTests(SimpleTestCase):
+    def test_pack_round_trip(self):
+        self.assertEqual(unpack_choices(pack_choices([7, 3, 5])), ([7, 3, 5], None))
+        self.assertEqual(unpack_choices(pack_choices([7, 3], [10, 1]), weighted=True), ([7, 3], [10, 1]))
+
+    def test_unknown_options_are_dropped(self):
+        ballots = load_ballots([pack_choices([30, 99, 10]), pack_choices([99])], [10, 20, 30])
+        self.assertEqual(ballots.count, 2)
+        self.assertEqual(ballots.column.tolist(), [2, 0])
+        self.assertEqual(ballots.position.tolist(), [0, 1])
+
+    def test_instant_runoff_transfers_votes(self):
+        packed = ([pack_choices([1, 2, 3])] * 8 + [pack_choices([2, 3])] * 6
+                  + [pack_choices([3, 2])] * 5 + [pack_choices([4])] * 2)
+        ballots = load_ballots(packed, [1, 2, 3, 4])
+        winner, rounds = instant_runoff(ballots)
+        self.assertEqual(winner, 1)
+        self.assertEqual(rounds, [
+            ({0: 8, 1: 6, 2: 5, 3: 2}, 0, 3),
+            ({0: 8, 1: 6, 2: 5}, 2, 2),
+            ({0: 8, 1: 11}, 2, None),
+        ])
+        self.assertEqual(first_preferences(ballots).tolist(), [8, 6, 5, 2])
+        self.assertEqual(borda_totals(ballots).tolist(), [24, 44, 35, 6])
+
+    def test_instant_runoff_ties(self):
+        # Tied last: the option with fewer first preferences goes, then the newer one.
+        ballots = load_ballots([pack_choices([1]), pack_choices([2]), pack_choices([3, 1])], [1, 2, 3])
+        winner, rounds = instant_runoff(ballots)
+        self.assertEqual([eliminated for _, _, eliminated in rounds], [2, None])
+        self.assertEqual(winner, 0)
+        self.assertEqual(instant_runoff(load_ballots([], [1, 2])), (None, []))
+
+    def test_weighted_totals(self):
+        ballots = load_ballots(
+            [pack_choices([1, 3], [5, 2]), pack_choices([3], [4])], [1, 2, 3], weighted=True)
+        self.assertEqual(weighted_totals(ballots).tolist(), [5, 0, 6])
+
+
+@override_settings(POLL_VIEW_TRACKING={'ENABLED': False})
+class VotingMethodAPITests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='pass12345')
+        self.voters = [User.objects.create_user(username=f'voter{i}', password='pass12345') for i in range(5)]
+
+    def make_poll(self, voting_method, options=('Python', 'Rust', 'Go'), **extra):
+        self.client.force_authenticate(self.owner)
+        response = self.client.post(reverse('poll-list'), {
+            'question': f'{voting_method}?', 'voting_method': voting_method,
+            'options_data': list(options), **extra}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        poll = Poll.objects.get(pk=response.data['id'])
+        return poll, list(poll.options.order_by('id').values_list('id', flat=True))
+
+    def vote(self, poll, voter, body):
+        self.client.force_authenticate(voter)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('poll-vote', args=[poll.id]), body, format='json')
+
+    def results(self, poll, **params):
+        return self.client.get(reverse('poll-results', args=[poll.id]), params)
+
+    def test_approval_ballots(self):
+        poll, (py, rust, go) = self.make_poll('approval')
+        self.assertEqual(self.vote(poll, self.voters[0], {'options': [py, rust]}).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.vote(poll, self.voters[1], {'option': rust}).status_code, status.HTTP_201_CREATED)
+        response = self.results(poll)
+        self.assertEqual(response.data, {
+            'question': 'approval?', 'method': 'approval', 'ballots': 2,
+            'results': [{'option': 'Python', 'votes': 1}, {'option': 'Rust', 'votes': 2},
+                        {'option': 'Go', 'votes': 0}]})
+
+        # Replacing a ballot invalidates the cached results.
+        self.assertEqual(self.vote(poll, self.voters[0], {'options': [go]}).status_code, status.HTTP_200_OK)
+        self.assertEqual([row['votes'] for row in self.results(poll).data['results']], [0, 1, 1])
+        self.assertEqual(Ballot.objects.filter(poll=poll).count(), 2)
+        self.assertFalse(Vote.objects.filter(poll=poll).exists())
+
+    def test_allow_multiple_votes_means_approval(self):
+        poll, (py, rust, _) = self.make_poll('plurality', allow_multiple_votes=True)
+        self.assertEqual(self.vote(poll, self.voters[0], {'options': [py, rust]}).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.results(poll).data['method'], 'approval')
+
+    def test_ranked_ballots(self):
+        poll, (py, rust, go) = self.make_poll('ranked')
+        for voter, ranking in zip(self.voters, [[py, go], [py], [rust, go], [go, rust], [rust, py]]):
+            self.assertEqual(self.vote(poll, voter, {'options': ranking}).status_code, status.HTTP_201_CREATED)
+
+        irv = self.results(poll).data
+        self.assertEqual(irv['method'], 'irv')
+        self.assertEqual(irv['winner'], 'Rust')
+        self.assertEqual(irv['rounds'], [
+            {'results': [{'option': 'Python', 'votes': 2}, {'option': 'Rust', 'votes': 2},
+                         {'option': 'Go', 'votes': 1}],
+             'exhausted': 0, 'eliminated': 'Go'},
+            {'results': [{'option': 'Python', 'votes': 2}, {'option': 'Rust', 'votes': 3}],
+             'exhausted': 0, 'eliminated': None},
+        ])
+        self.assertEqual(irv['results'], irv['rounds'][-1]['results'])
+        self.assertEqual([row['votes'] for row in self.results(poll, method='borda').data['results']], [5, 5, 4])
+        self.assertEqual([row['votes'] for row in self.results(poll, method='plurality').data['results']], [2, 2, 1])
+
+        for method in ('approval', 'bogus'):
+            with self.subTest(method=method):
+                self.assertEqual(self.results(poll, method=method).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_results_etag_depends_on_method(self):
+        poll, _ = self.make_poll('ranked')
+        irv, borda = self.results(poll), self.results(poll, method='borda')
+        self.assertNotEqual(irv['ETag'], borda['ETag'])
+        response = self.client.get(reverse('poll-results', args=[poll.id]), {'method': 'borda'},
+                                   HTTP_IF_NONE_MATCH=borda['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_weighted_ballots(self):
+        poll, (py, rust, go) = self.make_poll('weighted')
+        self.assertEqual(self.vote(poll, self.voters[0], {'options': [py, go], 'weights': [3, 7]}).status_code,
+                         status.HTTP_201_CREATED)
+        self.assertEqual(self.vote(poll, self.voters[1], {'options': [go], 'weights': [2]}).status_code,
+                         status.HTTP_201_CREATED)
+        self.assertEqual([row['votes'] for row in self.results(poll).data['results']], [3, 0, 9])
+
+        for body in ({'options': [py]}, {'options': [py, go], 'weights': [1]}, {'options': [py], 'weights': [0]},
+                     {'options': [py], 'weights': ['a lot']}):
+            with self.subTest(body=body):
+                self.assertEqual(self.vote(poll, self.voters[2], body).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_ballots(self):
+        poll, (py, rust, _) = self.make_poll('ranked')
+        other, (elsewhere, *_) = self.make_poll('approval')
+        for body in ({}, {'options': []}, {'options': 'py'}, {'options': [py, py]}, {'options': [py, elsewhere]},
+                     {'options': [py, 'x']}):
+            with self.subTest(body=body):
+                self.assertEqual(self.vote(poll, self.voters[0], body).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Ballot.objects.exists())
+
+        poll.is_active = False
+        poll.save()
+        response = self.vote(poll, self.voters[0], {'options': [py, rust]})
+        self.assertEqual(response.data['detail'], 'Voting is closed for this poll.')
+
+    def test_deleted_options_leave_the_tally(self):
+        poll, (py, rust, go) = self.make_poll('ranked')
+        self.vote(poll, self.voters[0], {'options': [go, py]})
+        self.vote(poll, self.voters[1], {'options': [rust]})
+        Option.objects.filter(pk=go).delete()
+        cache.clear()
+        self.assertEqual([row['votes'] for row in self.results(poll, method='plurality').data['results']], [1, 1])
+
+    def test_plurality_results_are_unchanged(self):
+        poll, (py, _, _) = self.make_poll('plurality')
+        self.assertEqual(self.vote(poll, self.voters[0], {'option': py}).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.results(poll).data, self.results(poll, method='plurality').data)
+        self.assertNotIn('method', self.results(poll).data)
+        self.assertEqual(self.results(poll, method='irv').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_voting_method_is_fixed_once_voted(self):
+        poll, (py, rust, _) = self.make_poll('approval')
+        url = reverse('poll-detail', args=[poll.id])
+        self.client.force_authenticate(self.owner)
+        body = {'question': 'approval?', 'options_data': ['a', 'b'], 'voting_method': 'ranked'}
+        self.assertEqual(self.client.put(url, body, format='json').status_code, status.HTTP_200_OK)
+        self.vote(poll, self.voters[0], {'options': [py, rust]})
+        self.client.force_authenticate(self.owner)
+        response = self.client.put(url, {**body, 'voting_method': 'weighted'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('voting_method', response.data)
+
+    def test_bulk_ballot_skips_non_plurality_polls(self):
+        poll, (py, _, _) = self.make_poll('ranked')
+        self.client.force_authenticate(self.voters[0])
+        response = self.client.post(reverse('poll-ballot'), [{'poll': poll.id, 'option': py}], format='json')
+        self.assertEqual(response.data['results'][0]['status'], 'error')
+
+
+@override_settings(POLL_VIEW_TRACKING={'ENABLED': False})
+class AsyncVotingMethodTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        owner = User.objects.create_user(username='owner', password='pass12345')
+        self.poll = Poll.objects.create(question='Ranked?', created_by=owner, voting_method='ranked')
+        self.options = [Option.objects.create(poll=self.poll, option_text=text).id for text in ('A', 'B')]
+
+    async def test_ranked_vote_and_results(self):
+        self.async_client.cookies['sessionid'] = 'guest-1'
+        response = await self.async_client.post(
+            reverse('async-poll-vote', args=[self.poll.id]), {'options': self.options[::-1]},
+            content_type='application/json', REMOTE_ADDR='1.2.3.4')
+        self.assertEqual(response.status_code, 201)
+
+        url = reverse('async-poll-results', args=[self.poll.id])
+        response = await self.async_client.get(url, {'method': 'borda'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['votes'] for row in response.json()['results']], [0, 1])
+        sync_response = await sync_to_async(self.client.get)(
+            reverse('poll-results', args=[self.poll.id]), {'method': 'borda'})
+        self.assertEqual(response.json(), sync_response.json())
+        response = await self.async_client.get(url, {'method': 'weighted'})
+        self.assertEqual(response.status_code, 400)
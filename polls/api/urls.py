@@ -1,6 +1,7 @@
 from drf_yasg.views import get_schema_view
 from .views.user_profile import UserProfileView
 from .views.user_views import UserRegistrationView
+from .views import async_views
 from .views.viewsets import PollViewSet, OptionViewSet, VoteViewSet, GuestVoteViewSet, PollAnalyticsViewSet
 from rest_framework import permissions
 from rest_framework.routers import DefaultRouter
@@ -68,13 +69,16 @@ router.register(r'polls', PollViewSet, basename='poll')
 router.register(r'options', OptionViewSet, basename='option')
 router.register(r'votes', VoteViewSet, basename='vote')
 router.register(r'guest-votes', GuestVoteViewSet, basename='guestvote')
-router.register(r'poll-analytics', PollAnalyticsViewSet, basename='pollanalytics')
+router.register(r'poll-analytics', PollAnalyticsViewSet, basename='pollview')
 
 urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='user-register'),
     path('token/', TokenObtainPairViewPatched.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshViewPatched.as_view(), name='token_refresh'),
     path('profile/', UserProfileView.as_view(), name='user-profile'),
+    path('async/polls/<int:pk>/', async_views.poll_detail, name='async-poll-detail'),
+    path('async/polls/<int:pk>/results/', async_views.poll_results, name='async-poll-results'),
+    path('async/polls/<int:pk>/vote/', async_views.poll_vote, name='async-poll-vote'),
     path('', include(router.urls)),
 ]
 
@@ -93,4 +97,4 @@ urlpatterns += [
     re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
-]
\ No newline at end of file
+]
@@ -0,0 +1,191 @@
+"""
+Native async versions of the hot paths: poll detail, results and vote.
+
+They are plain Django async views rather than DRF viewsets (DRF has no
+async support), mounted under ``/api/async/`` with the same request and
+response shapes as their ``/api/polls/`` counterparts. Under an ASGI server
+a request waiting on the cache or the database yields the event loop
+instead of pinning a worker thread, so one process can hold many more
+concurrent connections.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils import timezone
+from django.utils.http import parse_etags
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from polls.api.serializers.poll import PollSerializer
+from polls.ballots import InvalidBallot, record_ballot
+from polls.ingestion import VOTE_NOT_CONFIRMED, buffered_ingestion_enabled, get_vote_buffer
+from polls.models import Option, Poll
+from polls.replicas import replica_reads
+from polls.results_cache import aget_cached_results, aget_poll_version, ahas_cached_results, results_etag
+from polls.snapshots import SNAPSHOT_UNAVAILABLE, SnapshotMissing
+from polls.tallying import ALL_METHODS, MethodNotSupported
+from polls.tracking import track_poll_view
+from polls.voting import GUEST_IDENTITY_REQUIRED, cast_vote, compute_results, missing_guest_identity
+
+NOT_FOUND = 'No Poll matches the given query.'
+
+
+def _error(detail, status):
+    return JsonResponse({'detail': str(detail)}, status=status)
+
+
+async def authenticate(request):
+    """
+    Resolve the user the way the API's DRF authentication classes do: a JWT
+    bearer token first, then the session (with CSRF enforced on writes).
+    Raises DRF's ``AuthenticationFailed`` / ``PermissionDenied``.
+    """
+    if request.headers.get('Authorization'):
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+        if result is not None:
+            return result[0]
+    user = await request.auser()
+    if user.is_authenticated and request.method not in ('GET', 'HEAD', 'OPTIONS'):
+        SessionAuthentication().enforce_csrf(request)
+    return user
+
+
+@require_GET
+async def poll_detail(request, pk):
+    try:
+        user = await authenticate(request)
+        poll = await Poll.objects.prefetch_related('options').aget(pk=pk)
+    except APIException as exc:
+        return _error(exc.detail, exc.status_code)
+    except Poll.DoesNotExist:
+        return _error(NOT_FOUND, 404)
+    track_poll_view(request, poll.id, user=user)
+    return JsonResponse(PollSerializer(poll).data)
+
+
+def _compute(request, poll_id, method=None):
+    # Runs on the sync thread. Like PollViewSet.results: on a replica unless
+    # this client or poll just wrote (see polls.replicas).
+    with replica_reads(request, poll_id):
+        return compute_results(Poll.objects.get(pk=poll_id), method)
+
+
+@require_GET
+async def poll_results(request, pk):
+    method = request.GET.get('method')
+    if method is not None and method not in ALL_METHODS:
+        return _error(f'method must be one of {ALL_METHODS}.', 400)
+    variant = f':{method}' if method else ''
+    version = await aget_poll_version(pk)
+    etag = results_etag(pk, version, variant)
+    if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        if not (await ahas_cached_results(pk, version, variant)
+                or await Poll.objects.filter(pk=pk).aexists()):
+            return _error(NOT_FOUND, 404)
+        response = HttpResponseNotModified()
+    else:
+        try:
+            payload = await aget_cached_results(pk, version, lambda: _compute(request, pk, method), variant)
+        except Poll.DoesNotExist:
+            return _error(NOT_FOUND, 404)
+        except MethodNotSupported as exc:
+            return _error(exc, 400)
+        except SnapshotMissing:
+            return _error(SNAPSHOT_UNAVAILABLE, 503)
+        response = JsonResponse(payload)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@csrf_exempt
+@require_POST
+async def poll_vote(request, pk):
+    try:
+        user = await authenticate(request)
+    except APIException as exc:
+        return _error(exc.detail, exc.status_code)
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return _error('JSON parse error.', 400)
+        if not isinstance(data, dict):
+            return _error('Expected a JSON object.', 400)
+    else:
+        data = request.POST
+
+    try:
+        poll = await Poll.objects.aget(pk=pk)
+    except Poll.DoesNotExist:
+        return _error(NOT_FOUND, 404)
+    if poll.ballot_method != 'plurality':
+        return await _vote_ballot(request, data, poll, user)
+    option_id = data.get('option')
+    if not option_id:
+        return _error('Option ID is required.', 400)
+    try:
+        option = await Option.objects.only('id').aget(poll_id=poll.id, pk=option_id)
+    except (Option.DoesNotExist, ValueError, TypeError):
+        return _error('Invalid option for this poll.', 400)
+
+    if not poll.is_active or (poll.expires_at and poll.expires_at < timezone.now()):
+        return _error('Voting is closed for this poll.', 400)
+
+    user_id, session_id, ip_address = _voter(request, data, user)
+    if missing_guest_identity(user_id, session_id, ip_address):
+        return _error(GUEST_IDENTITY_REQUIRED, 400)
+
+    if buffered_ingestion_enabled():
+        buffer = get_vote_buffer()
+        if buffer.durability == 'memory':
+            accepted = buffer.submit(poll.id, option.id, user_id, session_id, ip_address)
+        else:
+            accepted = await sync_to_async(buffer.submit)(poll.id, option.id, user_id, session_id, ip_address)
+        if not accepted:
+            response = _error(VOTE_NOT_CONFIRMED, 503)
+            response['Retry-After'] = '1'
+            return response
+        return JsonResponse({'detail': 'Vote accepted.'}, status=202)
+
+    created = await sync_to_async(cast_vote)(poll.id, option.id, user_id, session_id, ip_address)
+    return _vote_response(created, user_id)
+
+
+async def _vote_ballot(request, data, poll, user):
+    """Approval, ranked and weighted polls: record the whole ballot, as the DRF view does."""
+    if not poll.is_active or (poll.expires_at and poll.expires_at < timezone.now()):
+        return _error('Voting is closed for this poll.', 400)
+    user_id, session_id, ip_address = _voter(request, data, user)
+    if missing_guest_identity(user_id, session_id, ip_address):
+        return _error(GUEST_IDENTITY_REQUIRED, 400)
+
+    getlist = getattr(data, 'getlist', data.get)
+    option_ids, weights = getlist('options'), getlist('weights')
+    if not option_ids and data.get('option'):
+        option_ids = [data['option']]
+    try:
+        created = await sync_to_async(record_ballot)(
+            poll, option_ids, weights or None, user_id, session_id, ip_address)
+    except InvalidBallot as exc:
+        return _error(exc, 400)
+    return _vote_response(created, user_id)
+
+
+def _voter(request, data, user):
+    user_id = user.id if user.is_authenticated else None
+    session_id = request.session.session_key or request.COOKIES.get(
+        'sessionid') or data.get('session_id')
+    return user_id, session_id, request.META.get('REMOTE_ADDR')
+
+
+def _vote_response(created, user_id):
+    suffix = '' if user_id else ' (guest)'
+    if created:
+        return JsonResponse({'detail': f'Vote recorded{suffix}.'}, status=201)
+    return JsonResponse({'detail': f'Your vote has been updated{suffix}.'}, status=200)
@@ -1,23 +1,115 @@
+from django.db import transaction
+from django.utils.decorators import method_decorator
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from polls.models import Poll, Option, Vote, GuestVote, PollView
-from polls.api.serializers.poll import PollSerializer, OptionSerializer, VoteSerializer, GuestVoteSerializer, PollViewSerializer
+from polls.api.serializers.poll import (
+    PollSerializer, OptionSerializer, VoteSerializer, GuestVoteSerializer, PollViewSerializer,
+    BallotItemSerializer)
+from polls.api.filters import KeysetOrderingFilter, PollFilter, PollSearchFilter
+from polls.api.pagination import KeysetPagination, PollViewKeysetPagination
 from polls.api.permissions.permissions import IsPollCreatorOrReadOnly
+from polls.api.renderers import CSVRenderer, EventStreamRenderer, NDJSONRenderer
+from polls.ballots import InvalidBallot, record_ballot
+from polls.counters import record_vote_change
+from polls.exports import EXPORT_FORMATS, aexport_lines, export_lines
+from polls.ingestion import VOTE_NOT_CONFIRMED, buffered_ingestion_enabled, get_vote_buffer
+from polls.live import aevent_stream, event_stream, get_results_hub, stream_settings
+from polls.replicas import replica_reads
+from polls.rollups import (
+    BUCKET_WIDTH, GRANULARITIES, MAX_BUCKETS, SKETCH_GRANULARITIES, SKETCH_SOURCES, SOURCES,
+    distinct_counts, time_series)
+from polls.results_cache import (
+    bump_poll_version, bump_poll_version_on_commit, get_cached_results, get_poll_version,
+    has_cached_results, results_etag)
+from polls.snapshots import (
+    SNAPSHOT_UNAVAILABLE, SnapshotMissing, discard_snapshot, open_snapshot, snapshot_distinct_counts,
+    snapshot_time_series,
+)
+from polls.tallying import ALL_METHODS, MethodNotSupported
+from polls.tracking import get_view_tracker, track_poll_view
+from polls.voting import (
+    GUEST_IDENTITY_REQUIRED, cast_ballot, cast_vote, compute_results, missing_guest_identity)
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 
-class PollViewSet(viewsets.ModelViewSet):
+def archive_unavailable():
+    return Response({'detail': SNAPSHOT_UNAVAILABLE}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class ReplicaReadsMixin:
+    """
+    Run the viewset's ``replica_actions`` with their reads on a read replica
+    when one is configured and healthy (see polls.replicas).
+    """
+    replica_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.action_map.get(request.method.lower()) not in self.replica_actions:
+            return super().dispatch(request, *args, **kwargs)
+        with replica_reads(request):
+            return super().dispatch(request, *args, **kwargs)
+
+
+@method_decorator(name='list', decorator=swagger_auto_schema(
+    operation_summary="List Polls",
+    operation_description=(
+        "Polls newest first, or by `ordering`, with keyset (cursor) pagination. Filters "
+        "combine; `search` matches words in the question or any option text (full-text "
+        "search with stemming on Postgres)."
+    ),
+    manual_parameters=[
+        openapi.Parameter('is_active', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN),
+        openapi.Parameter('expired', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                          description='Whether expires_at has passed'),
+        openapi.Parameter('created_by', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                          description='Creator user id'),
+        openapi.Parameter('created_after', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          format=openapi.FORMAT_DATETIME, description='Inclusive (ISO 8601)'),
+        openapi.Parameter('created_before', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          format=openapi.FORMAT_DATETIME, description='Exclusive (ISO 8601)'),
+        openapi.Parameter('search', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter('ordering', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          enum=['-created_at', 'created_at', 'expires_at', '-expires_at'],
+                          default='-created_at',
+                          description='Ordering by expires_at leaves out polls without one'),
+    ],
+    tags=['Polls Management']
+))
+class PollViewSet(ReplicaReadsMixin, viewsets.ModelViewSet):
     """
     Polls Management
-    
+
     Create, view, update and delete polls. Authentication required for creating polls.
     Poll creators can modify their own polls, others can only view.
     """
     queryset = Poll.objects.all()
     serializer_class = PollSerializer
     permission_classes = [IsPollCreatorOrReadOnly]
+    pagination_class = KeysetPagination
+    filter_backends = [PollFilter, PollSearchFilter, KeysetOrderingFilter]
+    ordering_fields = ['created_at', 'expires_at']
+    # results picks its database per cache miss, export for its stream.
+    replica_actions = ('list', 'retrieve')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # PollSerializer nests the options; fetch them for the whole page at once.
+            queryset = queryset.prefetch_related('options')
+        return queryset
+
+    def filter_queryset(self, queryset):
+        # get_object() runs the filter backends too; list query parameters
+        # must not hide (or fail) a poll fetched by id.
+        if self.action != 'list':
+            return queryset
+        return super().filter_queryset(queryset)
 
     def get_permissions(self):
         if self.action == 'create':
@@ -27,29 +119,63 @@ class PollViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        track_poll_view(request, response.data['id'])
+        return response
+
     def perform_update(self, serializer):
-        serializer.save(created_by=self.get_object().created_by)
+        # created_by is read-only, so the poll loaded by get_object() keeps it.
+        poll = serializer.save()
+        if poll.is_active and poll.snapshot_at is not None:
+            # Reopened by an update: its votes can change again.
+            poll.snapshot_at = None
+            poll.save(update_fields=['snapshot_at'])
+            discard_snapshot(poll.id)
+        bump_poll_version(poll.id)
+
+    def perform_destroy(self, instance):
+        poll_id = instance.id
+        instance.delete()
+        discard_snapshot(poll_id)
+        bump_poll_version(poll_id)
 
     @swagger_auto_schema(
         method='post',
         operation_summary="Vote on Poll",
-        operation_description="Submit or update your vote for a specific poll. Supports both authenticated users and guests.",
+        operation_description=(
+            "Submit or update your vote for a specific poll. Supports both authenticated users and guests."
+        ),
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
-            required=['option'],
             properties={
                 'option': openapi.Schema(
                     type=openapi.TYPE_INTEGER,
                     description='ID of the option to vote for',
                     example=1
                 ),
+                'options': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                    description=('Approval, ranked and weighted polls: the chosen option IDs, '
+                                 'in order of preference on ranked polls'),
+                    example=[3, 1, 2]
+                ),
+                'weights': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                    description='Weighted polls: a positive weight for each of the options',
+                    example=[5, 3, 2]
+                ),
             }
         ),
         responses={
             201: openapi.Response('Vote successfully recorded'),
             200: openapi.Response('Vote successfully updated'),
+            202: openapi.Response('Vote accepted for buffered ingestion'),
             400: openapi.Response('Bad request - invalid option or missing data'),
-            401: openapi.Response('Authentication required for some polls')
+            401: openapi.Response('Authentication required for some polls'),
+            503: openapi.Response('Buffered vote could not be confirmed in time; retry')
         },
         tags=['Votes']
     )
@@ -59,10 +185,12 @@ class PollViewSet(viewsets.ModelViewSet):
         Custom action to vote on a poll.
         Accepts option ID in the request body. Handles both authenticated and guest voting.
         Voting is only allowed if the poll is active and not expired.
+        Approval, ranked and weighted polls take a whole ballot instead.
         """
-        from django.db import transaction
         from django.utils import timezone
         poll = self.get_object()
+        if poll.ballot_method != 'plurality':
+            return self._vote_ballot(request, poll)
         option_id = request.data.get('option')
         if not option_id:
             return Response({'detail': 'Option ID is required.'}, status=status.HTTP_400_BAD_REQUEST)
@@ -75,41 +203,188 @@ class PollViewSet(viewsets.ModelViewSet):
         if not poll.is_active or (poll.expires_at and poll.expires_at < now):
             return Response({'detail': 'Voting is closed for this poll.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        user = request.user if request.user.is_authenticated else None
-        session_id = request.session.session_key or request.COOKIES.get(
-            'sessionid') or request.data.get('session_id')
-        ip_address = request.META.get('REMOTE_ADDR')
+        user, session_id, ip_address = self._voter(request, request.data.get('session_id'))
+
+        if buffered_ingestion_enabled():
+            if not get_vote_buffer().submit(
+                    poll.id, option.id, user.id if user else None, session_id, ip_address):
+                return Response({'detail': VOTE_NOT_CONFIRMED}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                                headers={'Retry-After': '1'})
+            return Response({'detail': 'Vote accepted.'}, status=status.HTTP_202_ACCEPTED)
 
+        created = cast_vote(poll.id, option.id, user.id if user else None, session_id, ip_address)
+        return self._vote_response(created, user)
+
+    def _vote_ballot(self, request, poll):
+        """
+        Record the voter's ``options`` (and ``weights``) on an approval,
+        ranked or weighted poll. A single ``option`` is taken as a ballot
+        of one. Ballots are always written synchronously.
+        """
+        from django.utils import timezone
+        if not poll.is_active or (poll.expires_at and poll.expires_at < timezone.now()):
+            return Response({'detail': 'Voting is closed for this poll.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        user, session_id, ip_address = self._voter(request, request.data.get('session_id'))
+
+        getlist = getattr(request.data, 'getlist', request.data.get)
+        option_ids, weights = getlist('options'), getlist('weights')
+        if not option_ids and request.data.get('option'):
+            option_ids = [request.data['option']]
+        try:
+            created = record_ballot(
+                poll, option_ids, weights or None, user.id if user else None, session_id, ip_address)
+        except InvalidBallot as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return self._vote_response(created, user)
+
+    @staticmethod
+    def _vote_response(created, user):
         if user:
-            with transaction.atomic():
-                vote, created = Vote.objects.select_for_update().get_or_create(
-                    poll=poll, user=user, defaults={
-                        'selected_option': option, 'session_id': session_id, 'ip_address': ip_address}
-                )
-                if not created:
-                    vote.selected_option = option
-                    vote.save()
-                    return Response({'detail': 'Your vote has been updated.'}, status=status.HTTP_200_OK)
-            return Response({'detail': 'Vote recorded.'}, status=status.HTTP_201_CREATED)
-        else:
-            if not session_id or not ip_address:
-                return Response({'detail': 'Session ID and IP address are required for guest voting.'}, status=status.HTTP_400_BAD_REQUEST)
-            with transaction.atomic():
-                guest_vote, created = GuestVote.objects.select_for_update().get_or_create(
-                    poll=poll, session_id=session_id, ip_address=ip_address, defaults={
-                        'selected_option': option}
-                )
-                if not created:
-                    guest_vote.selected_option = option
-                    guest_vote.save()
-                    return Response({'detail': 'Your vote has been updated (guest).'}, status=status.HTTP_200_OK)
+            if created:
+                return Response({'detail': 'Vote recorded.'}, status=status.HTTP_201_CREATED)
+            return Response({'detail': 'Your vote has been updated.'}, status=status.HTTP_200_OK)
+        if created:
             return Response({'detail': 'Vote recorded (guest).'}, status=status.HTTP_201_CREATED)
+        return Response({'detail': 'Your vote has been updated (guest).'}, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _voter(request, session_id=None):
+        """
+        Return ``(user, session_id, ip_address)`` identifying who is voting.
+        A guest without a session or IP address gets a 400.
+        """
+        user = request.user if request.user.is_authenticated else None
+        session_id = request.session.session_key or request.COOKIES.get('sessionid') or session_id
+        ip_address = request.META.get('REMOTE_ADDR')
+        if missing_guest_identity(user, session_id, ip_address):
+            raise ValidationError({'detail': GUEST_IDENTITY_REQUIRED})
+        return user, session_id, ip_address
+
+    @swagger_auto_schema(
+        method='post',
+        operation_summary="Submit Ballot",
+        operation_description=(
+            "Vote on several polls in one request. Every item is checked and answered "
+            "on its own: invalid items are reported without rejecting the rest. Guests "
+            "are identified by session and IP address as for single votes."
+        ),
+        request_body=BallotItemSerializer(many=True),
+        responses={
+            200: openapi.Response(
+                'Per-item outcome, in request order',
+                examples={
+                    'application/json': {
+                        'results': [
+                            {'poll': 1, 'option': 3, 'status': 'created'},
+                            {'poll': 2, 'option': 9, 'status': 'error',
+                             'detail': 'Invalid option for this poll.'}
+                        ]
+                    }
+                }
+            ),
+            400: openapi.Response('Malformed ballot, or guest without session/IP')
+        },
+        tags=['Votes']
+    )
+    @action(detail=False, methods=['post'], permission_classes=[permissions.AllowAny])
+    def ballot(self, request):
+        """
+        Vote on up to ``BALLOT_MAX_ITEMS`` polls at once.
+
+        Polls and options are validated with one query each and all valid
+        votes are upserted in a single transaction, so a ballot runs a fixed
+        handful of queries instead of several per question. Ballots are
+        always written synchronously, also in buffered ingestion mode.
+        """
+        from django.conf import settings
+        serializer = BallotItemSerializer(
+            data=request.data, many=True, allow_empty=False, max_length=settings.BALLOT_MAX_ITEMS)
+        serializer.is_valid(raise_exception=True)
+
+        user, session_id, ip_address = self._voter(request)
+
+        results = cast_ballot(serializer.validated_data, user.id if user else None, session_id, ip_address)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(
+        method='post',
+        operation_summary="Import Polls",
+        operation_description=(
+            "Create many polls from an uploaded CSV or NDJSON file. CSV needs a header "
+            "with `question` and `options` (separated by `|`) and may add `expires_at` "
+            "and `is_active`; NDJSON lines are objects with the same keys and "
+            "`options` as a list. Invalid records are skipped and reported."
+        ),
+        manual_parameters=[
+            openapi.Parameter('file', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True,
+                              description='CSV or NDJSON file'),
+            openapi.Parameter('format', openapi.IN_FORM, type=openapi.TYPE_STRING,
+                              enum=['csv', 'ndjson'],
+                              description='Defaults to the file extension, else csv'),
+        ],
+        responses={
+            201: openapi.Response(
+                'Import report',
+                examples={
+                    'application/json': {
+                        'polls': 998, 'options': 3992, 'invalid': 2,
+                        'errors': [{'line': 17, 'errors': {'options_data': ['All option texts must be unique.']}}],
+                        'seconds': 0.412, 'polls_per_second': 2422
+                    }
+                }
+            ),
+            400: openapi.Response('No file, unknown format or no valid records'),
+            401: openapi.Response('Authentication required')
+        },
+        tags=['Polls Management']
+    )
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser],
+            permission_classes=[permissions.IsAuthenticated])
+    def import_polls(self, request):
+        """
+        Bulk-create polls from an uploaded file, owned by the requesting user.
+
+        The upload is decoded and parsed line by line and written in batches
+        of multi-row INSERTs (see ``polls.imports``).
+        """
+        import codecs
+        from polls.imports import IMPORT_FORMATS, import_polls, parse_records
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'detail': 'Upload a CSV or NDJSON file as "file".'}, status=status.HTTP_400_BAD_REQUEST)
+        import_format = request.data.get('format') or (
+            'ndjson' if upload.name.endswith(('.ndjson', '.jsonl')) else 'csv')
+        if import_format not in IMPORT_FORMATS:
+            return Response({'detail': f'Unsupported format. Use one of: {", ".join(IMPORT_FORMATS)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        lines = codecs.iterdecode(upload, 'utf-8-sig')
+        try:
+            report = import_polls(parse_records(lines, import_format), request.user)
+        except UnicodeDecodeError:
+            return Response({'detail': 'The file must be UTF-8 encoded.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not report['polls'] and report['invalid']:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_201_CREATED)
 
     @swagger_auto_schema(
         method='get',
         operation_summary="Get Poll Results",
-        operation_description="Retrieve vote counts and statistics for all options in a poll.",
+        operation_description=(
+            "Retrieve vote counts and statistics for all options in a poll. Approval, ranked "
+            "and weighted polls add `method` and `ballots`; instant runoff (`irv`) also "
+            "reports the `winner` and every counting round."
+        ),
+        manual_parameters=[
+            openapi.Parameter('method', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=ALL_METHODS,
+                              description=(
+                                  'Counting method. Defaults to the poll\'s own: plurality, approval, '
+                                  'irv (ranked polls, which also support borda and plurality of first '
+                                  'preferences) or weighted.')),
+        ],
         responses={
+            304: openapi.Response('Results unchanged since the ETag sent in If-None-Match'),
             200: openapi.Response(
                 'Poll results with vote counts',
                 examples={
@@ -122,7 +397,9 @@ class PollViewSet(viewsets.ModelViewSet):
                     }
                 }
             ),
-            404: openapi.Response('Poll not found')
+            400: openapi.Response('Counting method not supported by this poll'),
+            404: openapi.Response('Poll not found'),
+            503: openapi.Response('Archived poll whose snapshot is unavailable')
         },
         tags=['Poll Analytics']
     )
@@ -131,25 +408,132 @@ class PollViewSet(viewsets.ModelViewSet):
         """
         Custom action to retrieve poll results (vote counts for each option).
         Returns the poll question and a list of options with their total votes.
+
+        Results are cached per poll version, so repeated reads of an unchanged
+        poll never touch the database, and clients sending the returned ETag
+        in If-None-Match get 304 Not Modified (after checking that the poll
+        still exists if its results are no longer cached).
         """
-        from django.db.models import Count, Q
-        poll = self.get_object()
+        from django.http import Http404
+        from django.utils.http import parse_etags
+        try:
+            poll_id = int(pk)
+        except (TypeError, ValueError):
+            raise Http404
+        method = request.query_params.get('method')
+        if method is not None and method not in ALL_METHODS:
+            return Response({'detail': f'method must be one of {ALL_METHODS}.'}, status=status.HTTP_400_BAD_REQUEST)
+        variant = f':{method}' if method else ''
+        version = get_poll_version(poll_id)
+        etag = results_etag(poll_id, version, variant)
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            # A deleted poll matches '*' and, until its payload expires, an old ETag.
+            if not (has_cached_results(poll_id, version, variant)
+                    or Poll.objects.filter(pk=poll_id).exists()):
+                raise Http404
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            try:
+                payload = get_cached_results(poll_id, version, lambda: self._compute_results(poll_id, method), variant)
+            except MethodNotSupported as exc:
+                return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            except SnapshotMissing:
+                return archive_unavailable()
+            response = Response(payload)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
 
-        # Optimized single query with aggregation
-        results = poll.options.annotate(
-            vote_count=Count('vote', distinct=True),
-            guest_vote_count=Count('guestvote', distinct=True)
-        ).values('option_text', 'vote_count', 'guest_vote_count')
+    def _compute_results(self, poll_id, method):
+        # On a replica unless this poll's results just changed (see polls.replicas).
+        with replica_reads(self.request, poll_id):
+            return compute_results(self.get_object(), method)
 
-        formatted_results = [
-            {
-                'option': result['option_text'],
-                'votes': result['vote_count'] + result['guest_vote_count']
-            }
-            for result in results
-        ]
+    @swagger_auto_schema(
+        method='get',
+        operation_summary="Stream Poll Results",
+        operation_description=(
+            "Server-Sent Events stream of the poll's results. An `event: results` message carries the "
+            "current tallies on connect and again whenever they change, at most "
+            "`RESULTS_STREAM_MAX_UPDATES_PER_SECOND` times a second; `event: closed` ends the stream "
+            "if the poll is deleted."
+        ),
+        responses={
+            200: openapi.Response('text/event-stream of results payloads'),
+            404: openapi.Response('Poll not found')
+        },
+        tags=['Poll Analytics']
+    )
+    @action(detail=True, methods=['get'], url_path='results/stream', permission_classes=[permissions.AllowAny],
+            renderer_classes=[JSONRenderer, EventStreamRenderer])
+    def results_stream(self, request, pk=None):
+        """
+        Push live results. All streams of a poll in this process share one
+        producer, which recomputes the results at most once per tick.
+        """
+        from django.core.handlers.asgi import ASGIRequest
+        from django.http import StreamingHttpResponse
+        poll = self.get_object()
+        if poll.archived_at is not None:
+            try:
+                open_snapshot(poll.id, archived=True)
+            except SnapshotMissing:
+                return archive_unavailable()
+        hub = get_results_hub()
+        heartbeat = stream_settings()['HEARTBEAT']
+        if isinstance(request._request, ASGIRequest):
+            events = aevent_stream(hub, poll.id, heartbeat)
+        else:
+            events = event_stream(hub, poll.id, heartbeat)
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
-        return Response({'question': poll.question, 'results': formatted_results})
+    @swagger_auto_schema(
+        method='get',
+        operation_summary="Export Poll Votes",
+        operation_description=(
+            "Stream every authenticated and guest vote on the poll as CSV or NDJSON; ballots on approval, "
+            "ranked and weighted polls give one row per chosen option, with its `rank` or `weight`. Only the "
+            "poll creator can export."),
+        manual_parameters=[
+            openapi.Parameter('format', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=list(EXPORT_FORMATS), default='csv',
+                              description='Export format'),
+        ],
+        responses={
+            200: openapi.Response('Vote stream'),
+            403: openapi.Response('You do not have permission to export this poll.'),
+            404: openapi.Response('Poll not found'),
+            503: openapi.Response('Archived poll whose snapshot is unavailable')
+        },
+        tags=['Poll Analytics']
+    )
+    @action(detail=True, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer])
+    def export(self, request, pk=None):
+        """
+        Stream the poll's raw votes (authenticated and guest, merged by time).
+        Rows are read through server-side cursors so memory stays flat, under
+        ASGI too (see polls.exports).
+        """
+        from django.core.handlers.asgi import ASGIRequest
+        from django.http import StreamingHttpResponse
+        with replica_reads(request) as alias:
+            poll = self.get_object()
+        if not request.user.is_authenticated or poll.created_by_id != request.user.id:
+            self.permission_denied(request, message='You do not have permission to export this poll.')
+        export_format = request.accepted_renderer.format
+        try:
+            lines = export_lines(poll.id, export_format, using=alias, archived=poll.archived_at is not None)
+        except SnapshotMissing:
+            return archive_unavailable()
+        if isinstance(request._request, ASGIRequest):
+            lines = aexport_lines(lines)
+        response = StreamingHttpResponse(lines, content_type=request.accepted_renderer.media_type)
+        response['Content-Disposition'] = f'attachment; filename="poll-{poll.id}-votes.{export_format}"'
+        return response
 
     @swagger_auto_schema(
         method='post',
@@ -164,11 +548,7 @@ class PollViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[IsPollCreatorOrReadOnly])
     def close(self, request, pk=None):
         """Close a poll (deactivate voting)."""
-        poll = self.get_object()
-        if not request.user.is_authenticated or poll.created_by != request.user:
-            return Response({'detail': 'You do not have permission to close this poll.'}, status=status.HTTP_403_FORBIDDEN)
-        poll.is_active = False
-        poll.save()
+        self._set_active(pk, False, 'close')
         return Response({'detail': 'Poll closed successfully.'}, status=status.HTTP_200_OK)
 
     @swagger_auto_schema(
@@ -177,7 +557,7 @@ class PollViewSet(viewsets.ModelViewSet):
         operation_description="Reopen a closed poll. Only the poll creator can perform this action.",
         responses={
             200: openapi.Response('Poll reopened successfully.'),
-            400: openapi.Response('Poll is already open.'),
+            400: openapi.Response('Poll is already open, or archived.'),
             403: openapi.Response('You do not have permission to reopen this poll.')
         },
         tags=['Polls Management']
@@ -185,55 +565,286 @@ class PollViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], permission_classes=[IsPollCreatorOrReadOnly])
     def reopen(self, request, pk=None):
         """Reopen a closed poll (reactivate voting)."""
-        poll = self.get_object()
-        if not request.user.is_authenticated or poll.created_by != request.user:
-            return Response({'detail': 'You do not have permission to reopen this poll.'}, status=status.HTTP_403_FORBIDDEN)
-        if poll.is_active:
+        changed = self._set_active(pk, True, 'reopen')
+        if changed is None:
+            return Response({'detail': 'Archived polls cannot be reopened.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not changed:
             return Response({'detail': 'Poll is already open.'}, status=status.HTTP_400_BAD_REQUEST)
-        poll.is_active = True
-        poll.save()
         return Response({'detail': 'Poll reopened successfully.'}, status=status.HTTP_200_OK)
 
+    def _set_active(self, pk, active, verb):
+        """
+        Open or close the poll with one conditional UPDATE that also checks
+        ownership. The poll is only read back when nothing was updated, to
+        tell a missing poll, someone else's poll and a no-op apart.
+        Returns whether the poll changed state, or None when reopening an
+        archived poll.
+        """
+        from django.http import Http404
+        from django.utils import timezone
+        try:
+            poll_id = int(pk)
+        except (TypeError, ValueError):
+            raise Http404
+        polls = self.get_queryset().filter(pk=poll_id)
+        fields = {'is_active': active, 'updated_at': timezone.now()}
+        updated = polls.filter(created_by_id=self.request.user.id, is_active=not active)
+        if active:
+            # Reopening also retires the closed poll's snapshot; archived
+            # polls have no votes left to reopen with.
+            fields['snapshot_at'] = None
+            updated = updated.filter(archived_at__isnull=True)
+        changed = updated.update(**fields)
+        if changed:
+            if active:
+                discard_snapshot(poll_id)
+            bump_poll_version(poll_id)
+            return True
+        owner_id, archived_at = polls.values_list('created_by_id', 'archived_at').first() or (None, None)
+        if owner_id is None:
+            raise Http404
+        if owner_id != self.request.user.id:
+            self.permission_denied(self.request, message=f'You do not have permission to {verb} this poll.')
+        return None if active and archived_at is not None else False
+
 
 class OptionViewSet(viewsets.ModelViewSet):
     """
     Poll Options
-    
+
     Manage poll options (choices). Authentication required for creating/modifying options.
     """
-    queryset = Option.objects.all()
+    queryset = Option.objects.order_by('id')
     serializer_class = OptionSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def perform_create(self, serializer):
+        option = serializer.save()
+        bump_poll_version(option.poll_id)
+
+    def perform_update(self, serializer):
+        option = serializer.save()
+        bump_poll_version(option.poll_id)
+
+    def perform_destroy(self, instance):
+        poll_id = instance.poll_id
+        instance.delete()
+        bump_poll_version(poll_id)
+
+
+class VoteCounterMixin:
+    """
+    Keep Option.vote_count in step with votes written through the generic
+    create/update/destroy endpoints. Like the vote and ballot actions, they
+    refuse votes on closed polls, whose snapshot (see polls.snapshots) and
+    archive must keep matching their votes.
+    """
+
+    @staticmethod
+    def check_voting_open(*polls):
+        from django.utils import timezone
+        now = timezone.now()
+        for poll in polls:
+            if not poll.is_active or poll.archived_at is not None or (poll.expires_at and poll.expires_at < now):
+                raise ValidationError({'detail': 'Voting is closed for this poll.'})
+
+    def perform_create(self, serializer):
+        self.check_voting_open(serializer.validated_data['poll'])
+        with transaction.atomic():
+            vote = serializer.save()
+            record_vote_change(new_option_id=vote.selected_option_id)
+            bump_poll_version_on_commit(vote.poll_id)
+
+    def perform_update(self, serializer):
+        instance = serializer.instance
+        self.check_voting_open(instance.poll, serializer.validated_data.get('poll', instance.poll))
+        with transaction.atomic():
+            previous_option_id = serializer.instance.selected_option_id
+            previous_poll_id = serializer.instance.poll_id
+            vote = serializer.save()
+            record_vote_change(previous_option_id, vote.selected_option_id)
+            bump_poll_version_on_commit(previous_poll_id, vote.poll_id)
+
+    def perform_destroy(self, instance):
+        self.check_voting_open(instance.poll)
+        with transaction.atomic():
+            option_id, poll_id = instance.selected_option_id, instance.poll_id
+            instance.delete()
+            record_vote_change(old_option_id=option_id)
+            bump_poll_version_on_commit(poll_id)
+
 
-class VoteViewSet(viewsets.ModelViewSet):
+class VoteViewSet(VoteCounterMixin, viewsets.ModelViewSet):
     """
     Authenticated Votes
-    
+
     Manage votes from authenticated users.
     """
-    queryset = Vote.objects.all()
+    # Guest votes share the table; they are managed through /api/guest-votes/.
+    queryset = Vote.objects.filter(user__isnull=False)
     serializer_class = VoteSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
 
 
-class GuestVoteViewSet(viewsets.ModelViewSet):
+class GuestVoteViewSet(VoteCounterMixin, viewsets.ModelViewSet):
     """
     Guest Votes
 
     Manage votes from unauthenticated users.
     """
-    queryset = GuestVote.objects.select_related('poll', 'selected_option')
+    queryset = GuestVote.objects.all()
     serializer_class = GuestVoteSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = KeysetPagination
 
 
-class PollAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
+class PollAnalyticsViewSet(ReplicaReadsMixin, viewsets.ReadOnlyModelViewSet):
     """
     Poll Analytics
 
     Track poll view statistics and analytics.
     """
-    queryset = PollView.objects.select_related('poll', 'user')
+    queryset = PollView.objects.all()
     serializer_class = PollViewSerializer
-    permission_classes = [permissions.AllowAny]
\ No newline at end of file
+    permission_classes = [permissions.AllowAny]
+    pagination_class = PollViewKeysetPagination
+    replica_actions = ('list', 'retrieve', 'timeseries', 'unique')
+
+    @swagger_auto_schema(
+        method='get',
+        operation_summary="Poll Time Series",
+        operation_description=(
+            "Views, user votes or guest votes per minute/hour/day bucket, served from the pre-aggregated "
+            "rollup tables (refreshed by `manage.py rollup_analytics`), or, for vote metrics, counted from "
+            "the snapshots when every requested poll is closed and has one."
+        ),
+        manual_parameters=[
+            openapi.Parameter('poll', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                              description='Poll id, or comma-separated ids to sum several polls'),
+            openapi.Parameter('metric', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=list(SOURCES), default='views'),
+            openapi.Parameter('granularity', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=list(GRANULARITIES), default='hour'),
+            openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME,
+                              description='Inclusive start (ISO 8601). Defaults to 48 buckets before end.'),
+            openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME,
+                              description='Exclusive end (ISO 8601). Defaults to now.'),
+        ],
+        responses={400: openapi.Response('Invalid parameters')},
+        tags=['Poll Analytics']
+    )
+    @action(detail=False, methods=['get'])
+    def timeseries(self, request):
+        """Serve a time series straight from the rollup tables."""
+        params = self._window_params(request, SOURCES, GRANULARITIES, 'views', 'hour')
+        if isinstance(params, Response):
+            return params
+        poll_ids, metric, granularity, start, end = params
+
+        series = snapshot_time_series(poll_ids, metric, granularity, start, end)
+        if series is None:
+            series = time_series(poll_ids, metric, granularity, start, end)
+        return Response({
+            'polls': poll_ids,
+            'metric': metric,
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'series': [{'bucket': bucket, 'count': count} for bucket, count in series],
+        })
+
+    @swagger_auto_schema(
+        method='get',
+        operation_summary="Unique Viewers / Voters",
+        operation_description=(
+            "Approximate number of distinct viewers or voters (users and guests) of one or "
+            "more polls over a time window, overall and per bucket. Estimated from "
+            "HyperLogLog sketches refreshed by `manage.py rollup_analytics`; the relative "
+            "standard error is reported as `error_rate`. When every requested poll is closed "
+            "and has a snapshot, voter counts are exact and `error_rate` is 0."
+        ),
+        manual_parameters=[
+            openapi.Parameter('poll', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                              description='Poll id, or comma-separated ids to count across several polls'),
+            openapi.Parameter('metric', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=list(SKETCH_SOURCES), default='viewers'),
+            openapi.Parameter('granularity', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=list(SKETCH_GRANULARITIES), default='day'),
+            openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME,
+                              description='Inclusive start (ISO 8601). Defaults to 48 buckets before end.'),
+            openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME,
+                              description='Exclusive end (ISO 8601). Defaults to now.'),
+        ],
+        responses={400: openapi.Response('Invalid parameters')},
+        tags=['Poll Analytics']
+    )
+    @action(detail=False, methods=['get'])
+    def unique(self, request):
+        """Estimate distinct viewers or voters from the HyperLogLog sketches."""
+        from django.conf import settings
+        params = self._window_params(request, SKETCH_SOURCES, SKETCH_GRANULARITIES, 'viewers', 'day')
+        if isinstance(params, Response):
+            return params
+        poll_ids, metric, granularity, start, end = params
+
+        # Snapshotted polls are counted exactly.
+        counts = snapshot_distinct_counts(poll_ids, metric, granularity, start, end)
+        total, series = counts or distinct_counts(poll_ids, metric, granularity, start, end)
+        return Response({
+            'polls': poll_ids,
+            'metric': metric,
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'estimate': total,
+            'error_rate': 0.0 if counts else settings.ANALYTICS_SKETCH_ERROR,
+            'series': [{'bucket': bucket, 'estimate': estimate} for bucket, estimate in series],
+        })
+
+    def _window_params(self, request, metrics, granularities, default_metric, default_granularity):
+        """
+        Parse ``poll``, ``metric``, ``granularity``, ``start`` and ``end``.
+        Returns them as a tuple, or a 400 Response.
+        """
+        from django.utils import timezone
+        from django.utils.dateparse import parse_datetime
+        params = request.query_params
+        try:
+            poll_ids = [int(pk) for pk in params.get('poll', '').split(',')]
+        except ValueError:
+            return Response({'detail': 'poll must be one or more comma-separated poll ids.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        metric = params.get('metric', default_metric)
+        granularity = params.get('granularity', default_granularity)
+        if metric not in metrics or granularity not in granularities:
+            return Response(
+                {'detail': f'metric must be one of {sorted(metrics)} and granularity one of {list(granularities)}.'},
+                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            end = parse_datetime(params['end']) if 'end' in params else timezone.now()
+            start = parse_datetime(params['start']) if 'start' in params else end - 48 * BUCKET_WIDTH[granularity]
+        except (TypeError, ValueError):
+            start = end = None
+        if start is None or end is None:
+            return Response({'detail': 'start and end must be ISO 8601 datetimes.'}, status=status.HTTP_400_BAD_REQUEST)
+        start, end = (timezone.make_aware(value) if timezone.is_naive(value) else value for value in (start, end))
+        if (end - start) / BUCKET_WIDTH[granularity] > MAX_BUCKETS:
+            return Response({'detail': f'Requested range spans more than {MAX_BUCKETS} buckets.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return poll_ids, metric, granularity, start, end
+
+    @swagger_auto_schema(
+        method='get',
+        operation_summary="View Tracking Status",
+        operation_description=(
+            "Buffer occupancy, flush and dropped-event counters of this worker's view tracking pipeline. "
+            "Staff only."
+        ),
+        tags=['Poll Analytics']
+    )
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def tracking(self, request):
+        """Report this worker's view tracking buffer statistics."""
+        tracker = get_view_tracker()
+        return Response({'enabled': tracker is not None, **(tracker.stats() if tracker else {})})
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class PollsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'polls'
+
+    def ready(self):
+        from django.db import connections
+        from polls.expiry import expiry_metrics
+        from polls.ingestion import ingestion_metrics
+        from polls.instrumentation import install_query_wrapper, register_collector
+        from polls.replicas import replica_metrics
+
+        register_collector(expiry_metrics)
+        register_collector(ingestion_metrics)
+        register_collector(replica_metrics)
+        for connection in connections.all(initialized_only=True):
+            install_query_wrapper(None, connection)
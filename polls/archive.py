@@ -0,0 +1,128 @@
+"""
+Archival of long-closed polls.
+
+The vote, ballot and view tables only need the rows that can still
+change. ``manage.py archive_polls`` moves polls that have been closed for
+longer than ``OLDER_THAN_DAYS`` to the cold tier: the poll's columnar
+snapshot (see ``polls.snapshots``), which already holds every vote, ballot
+and view, becomes the only copy of them and the rows are deleted from the
+hot tables in batches of ``BATCH_SIZE``, one short transaction each, so
+their indexes stop growing with the history of the site.
+
+What stays online: the poll and its options, ``Option.vote_count``, the
+analytics rollups and sketches, and the snapshot, from which results,
+exports and analytics of an archived poll are served. ``Poll.archived_at``
+marks archived polls; they cannot be reopened, and ``rebuild_vote_counts``
+and ``rollup_analytics --rebuild`` leave their totals alone.
+
+A poll is only archived once it has a snapshot and every one of its rows
+has been counted into the rollups, so nothing is lost from either.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from polls.counters import compact_counter_shards
+from polls.models import Ballot, Poll, PollView, RollupWatermark, Vote
+from polls.results_cache import bump_poll_version
+from polls.rollups import METRICS, metric_sources
+from polls.snapshots import open_snapshot, snapshot_poll
+
+DEFAULTS = {
+    'OLDER_THAN_DAYS': 365,
+    'BATCH_SIZE': 5000,
+}
+
+
+def archive_settings():
+    return {**DEFAULTS, **getattr(settings, 'POLL_ARCHIVE', {})}
+
+
+def archivable_polls(older_than=None, now=None):
+    """Snapshotted polls closed for more than ``older_than`` (a timedelta) and not yet archived."""
+    if older_than is None:
+        older_than = timedelta(days=archive_settings()['OLDER_THAN_DAYS'])
+    return Poll.objects.filter(
+        is_active=False, archived_at__isnull=True, snapshot_at__isnull=False,
+        updated_at__lte=(now or timezone.now()) - older_than)
+
+
+def _sources():
+    return {watermark: queryset for metric in METRICS for watermark, queryset, _ in metric_sources(metric)}
+
+
+def _watermarks():
+    marks = dict(RollupWatermark.objects.values_list('metric', 'last_id'))
+    return {watermark: marks.get(watermark, 0) for watermark in _sources()}
+
+
+def rolled_up(poll_id, watermarks=None):
+    """Whether every vote, ballot and view of the poll has been counted into the rollups."""
+    sources = _sources()
+    return not any(sources[watermark].filter(poll_id=poll_id, pk__gt=last_id).exists()
+                   for watermark, last_id in (watermarks or _watermarks()).items())
+
+
+def _delete_in_batches(queryset, batch_size):
+    deleted = 0
+    ids = queryset.values_list('pk', flat=True).order_by('pk')
+    while batch := list(ids[:batch_size]):
+        with transaction.atomic():
+            deleted += queryset.model.objects.filter(pk__in=batch).delete()[0]
+    return deleted
+
+
+def archive_poll(poll_id, batch_size=None):
+    """
+    Archive one snapshotted closed poll: mark it and delete its votes,
+    ballots and views. Returns ``{'votes': n, 'ballots': n, 'views': n}``,
+    or None if the poll was reopened or changed since it was picked, or its
+    snapshot file is missing or does not hold all of its votes and ballots.
+    """
+    batch_size = batch_size or archive_settings()['BATCH_SIZE']
+    snapshot = open_snapshot(poll_id)
+    if snapshot is not None and snapshot.header['ballots'] and not snapshot.ballot_voters:
+        # Taken before snapshots kept who cast each ballot, and when: retake it.
+        closed_at = Poll.objects.filter(pk=poll_id).values_list('updated_at', flat=True).first()
+        if closed_at is None or snapshot_poll(poll_id, closed_at) is None:
+            return None
+        snapshot = open_snapshot(poll_id)
+    if snapshot is None or (snapshot.votes, snapshot.header['ballots']) != (
+            Vote.objects.filter(poll_id=poll_id).count(), Ballot.objects.filter(poll_id=poll_id).count()):
+        return None
+    # Shard rows would otherwise outlive the votes they count.
+    compact_counter_shards([poll_id], demote=True)
+    # Marked first, so the poll can no longer be reopened while its rows go.
+    if not Poll.objects.filter(pk=poll_id, is_active=False, archived_at__isnull=True,
+                               snapshot_at__isnull=False).update(archived_at=timezone.now()):
+        return None
+    moved = {
+        'votes': _delete_in_batches(Vote.objects.filter(poll_id=poll_id), batch_size),
+        'ballots': _delete_in_batches(Ballot.objects.filter(poll_id=poll_id), batch_size),
+        'views': _delete_in_batches(PollView.objects.filter(poll_id=poll_id), batch_size),
+    }
+    bump_poll_version(poll_id)
+    return moved
+
+
+def archive_polls(older_than=None, batch_size=None, now=None):
+    """
+    Archive every poll ``archivable_polls`` finds whose rows are all rolled
+    up. Returns ``(archived, skipped, moved)``: the number of polls archived,
+    the number left for a later run because rollups had not caught up, and
+    the total rows deleted per table.
+    """
+    archived, skipped, moved = 0, 0, {'votes': 0, 'ballots': 0, 'views': 0}
+    watermarks = _watermarks()
+    for poll_id in archivable_polls(older_than, now).order_by('updated_at').values_list('pk', flat=True):
+        if not rolled_up(poll_id, watermarks):
+            skipped += 1
+            continue
+        counts = archive_poll(poll_id, batch_size)
+        if counts is not None:
+            archived += 1
+            for table, count in counts.items():
+                moved[table] += count
+    return archived, skipped, moved
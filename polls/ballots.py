@@ -0,0 +1,110 @@
+"""
+Ballots for approval, ranked and weighted polls.
+
+A voter's choices on these polls are kept as one ``Ballot`` row holding a
+packed array of option ids (see ``polls.tallying.pack_choices``) rather
+than a row per choice, and the results are tallied from those arrays on
+demand. Results are cached per poll version like plurality results, so a
+poll is only re-tallied after its ballots change.
+"""
+from django.db import transaction
+
+from polls.models import Ballot, Option, make_voter_key
+from polls.results_cache import bump_poll_version_on_commit
+from polls.tallying import (
+    approval_totals, borda_totals, first_preferences, instant_runoff, load_ballots, pack_choices,
+    weighted_totals)
+
+MAX_WEIGHT = 2 ** 32 - 1
+# Server-side cursor batch when reading a poll's ballots.
+CHUNK_SIZE = 10000
+
+_TOTALS = {
+    'approval': approval_totals,
+    'borda': borda_totals,
+    'plurality': first_preferences,
+    'weighted': weighted_totals,
+}
+
+
+class InvalidBallot(ValueError):
+    pass
+
+
+def clean_choices(poll, option_ids, weights=None):
+    """
+    Check a ballot against the poll's options and voting method and return
+    ``(option_ids, weights)``; raises ``InvalidBallot`` with the reason.
+    """
+    if not isinstance(option_ids, list) or not option_ids:
+        raise InvalidBallot('Choose at least one option.')
+    try:
+        option_ids = [int(option_id) for option_id in option_ids]
+    except (TypeError, ValueError):
+        raise InvalidBallot('Options must be option IDs.')
+    if len(set(option_ids)) != len(option_ids):
+        raise InvalidBallot('Each option can only be chosen once.')
+    known = set(Option.objects.filter(poll_id=poll.id, pk__in=option_ids).values_list('id', flat=True))
+    if len(known) != len(option_ids):
+        raise InvalidBallot('Invalid option for this poll.')
+
+    if poll.ballot_method != 'weighted':
+        return option_ids, None
+    if not isinstance(weights, list) or len(weights) != len(option_ids):
+        raise InvalidBallot('Give one weight per chosen option.')
+    invalid = InvalidBallot(f'Weights must be whole numbers from 1 to {MAX_WEIGHT}.')
+    try:
+        weights = [int(weight) for weight in weights]
+    except (TypeError, ValueError):
+        raise invalid
+    if not all(1 <= weight <= MAX_WEIGHT for weight in weights):
+        raise invalid
+    return option_ids, weights
+
+
+def record_ballot(poll, option_ids, weights=None, user_id=None, session_id=None, ip_address=None):
+    """
+    Create or replace one voter's ballot on an approval, ranked or weighted
+    poll. Returns True if a new ballot was created, False if one was replaced.
+    """
+    option_ids, weights = clean_choices(poll, option_ids, weights)
+    with transaction.atomic():
+        _, created = Ballot.objects.update_or_create(
+            poll_id=poll.id, voter_key=make_voter_key(user_id, session_id, ip_address), defaults={
+                'choices': pack_choices(option_ids, weights), 'user_id': user_id,
+                'session_id': session_id, 'ip_address': ip_address})
+        bump_poll_version_on_commit(poll.id)
+    return created
+
+
+def ballot_results(poll, method, snapshot=None):
+    """
+    Tally the poll's ballots by ``method`` into a results payload, reading
+    them from the poll's ``snapshot`` (see polls.snapshots) if given.
+    """
+    options = list(poll.options.order_by('id').values_list('id', 'option_text'))
+    option_ids, weighted = [option_id for option_id, _ in options], poll.ballot_method == 'weighted'
+    if snapshot is not None:
+        ballots = snapshot.ballots(option_ids, weighted)
+    else:
+        packed = Ballot.objects.filter(poll_id=poll.id).values_list('choices', flat=True)
+        ballots = load_ballots(packed.iterator(chunk_size=CHUNK_SIZE), option_ids, weighted)
+    payload = {'question': poll.question, 'method': method, 'ballots': ballots.count}
+
+    def rows(counts):
+        return [{'option': options[column][1], 'votes': votes} for column, votes in counts]
+
+    if method != 'irv':
+        payload['results'] = rows(enumerate(_TOTALS[method](ballots).tolist()))
+        return payload
+
+    winner, rounds = instant_runoff(ballots)
+    payload['winner'] = options[winner][1] if winner is not None else None
+    payload['rounds'] = [
+        {'results': rows(counts.items()), 'exhausted': exhausted,
+         'eliminated': options[eliminated][1] if eliminated is not None else None}
+        for counts, exhausted, eliminated in rounds
+    ]
+    final = rounds[-1][0] if rounds else dict.fromkeys(range(len(options)), 0)
+    payload['results'] = rows(final.items())
+    return payload
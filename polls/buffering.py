@@ -0,0 +1,60 @@
+"""
+Background flushing for in-process write buffers.
+"""
+import logging
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundFlusher:
+    """
+    Daemon thread that calls ``flush`` every ``interval`` seconds, or sooner
+    when ``wake()`` is called (e.g. because a buffer reached its size
+    threshold).
+    """
+
+    def __init__(self, flush, interval, name='buffer-flusher'):
+        self._flush = flush
+        self.interval = interval
+        self._name = name
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self, timeout=None):
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        # The final pass after stop() drains whatever is still buffered.
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self._flush()
+            except Exception:
+                logger.exception("%s: flush failed", self._name)
+            finally:
+                close_old_connections()
+            if self._stopping.is_set():
+                break
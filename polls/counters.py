@@ -0,0 +1,279 @@
+"""
+Denormalized per-option vote counters.
+
+`Option.vote_count` holds the number of Vote rows pointing at each option
+so that poll results can be read in O(options) rows instead of aggregating
+the vote table on every request. Every code path that creates,
+moves or deletes a vote must report the change here inside the same
+transaction as the vote write.
+
+A single viral poll makes every vote UPDATE the same few option rows, so
+writers queue on their row locks. Polls with ``Poll.counter_shards > 0``
+spread their tallies over that many ``OptionCounterShard`` rows per option
+instead: each change is added to a randomly picked shard, so concurrent
+voters rarely touch the same row. An option's total is always
+
+    Option.vote_count + sum(OptionCounterShard.count)
+
+which lets polls be promoted (by ``VOTE_COUNTER_SHARDS['AUTO_PROMOTE']``
+once an option sees ``PROMOTE_VOTES_PER_SECOND``) or demoted at any time
+without coordinating with writers. ``manage.py compact_counter_shards``
+folds the shards back into ``vote_count``.
+
+The vote rate is measured per process, so with several workers each one
+sees only its share of the traffic; size the threshold accordingly.
+"""
+import logging
+import random
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections, router, transaction
+from django.db.models import Case, Count, F, IntegerField, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from polls.models import Option, OptionCounterShard, Poll, Vote
+from polls.results_cache import bump_poll_version_on_commit
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'SHARDS': 16,
+    'AUTO_PROMOTE': True,
+    'PROMOTE_VOTES_PER_SECOND': 50.0,
+    'WINDOW': 10.0,
+}
+
+
+def shard_settings():
+    return {**DEFAULTS, **getattr(settings, 'VOTE_COUNTER_SHARDS', {})}
+
+
+def _increment_vote_counts(deltas, options=None):
+    """Add ``{option_id: delta}`` to ``vote_count`` in one UPDATE."""
+    increment = Case(
+        *[When(pk=pk, then=Value(delta)) for pk, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    if options is None:
+        options = Option.objects.all()
+    return options.filter(pk__in=deltas).update(vote_count=F('vote_count') + increment)
+
+
+def _increment_shards(deltas, shards):
+    """
+    Add each delta to a random one of its option's ``shards[option_id]``
+    shards with a single upsert. Rows are written in (option, shard) order
+    so concurrent ballots cannot deadlock.
+    """
+    rows = sorted((pk, random.randrange(shards[pk]), delta) for pk, delta in deltas.items())
+    connection = connections[router.db_for_write(OptionCounterShard)]
+    quote = connection.ops.quote_name
+    table = quote(OptionCounterShard._meta.db_table)
+    count = quote('count')
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} ({quote('option_id')}, {quote('shard')}, {count}) "
+            f"VALUES {', '.join(['(%s, %s, %s)'] * len(rows))} "
+            f"ON CONFLICT ({quote('option_id')}, {quote('shard')}) "
+            f"DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count}",
+            [value for row in rows for value in row])
+    return len(rows)
+
+
+def apply_vote_deltas(deltas):
+    """
+    Atomically add ``{option_id: delta}`` to the stored counters.
+
+    Options of unsharded polls are updated with a single UPDATE statement
+    regardless of how many of them changed; only when some options belong
+    to sharded polls does it take a lookup and an upsert more.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if pk and delta}
+    if not deltas:
+        return 0
+    updated = _increment_vote_counts(deltas, Option.objects.filter(poll__counter_shards=0))
+    if updated < len(deltas):
+        shards = dict(
+            Option.objects.filter(pk__in=deltas, poll__counter_shards__gt=0)
+            .values_list('pk', 'poll__counter_shards'))
+        if shards:
+            updated += _increment_shards({pk: deltas[pk] for pk in shards}, shards)
+        unsharded = deltas.keys() - shards.keys()
+    else:
+        unsharded = deltas.keys()
+    _note_votes(unsharded)
+    return updated
+
+
+def record_vote_change(old_option_id=None, new_option_id=None):
+    """
+    Record a single vote being cast, moved or withdrawn.
+
+    Pass only ``new_option_id`` for a new vote, only ``old_option_id`` for a
+    deleted vote and both when a voter changes their choice.
+    """
+    if old_option_id == new_option_id:
+        return 0
+    deltas = Counter()
+    if old_option_id:
+        deltas[old_option_id] -= 1
+    if new_option_id:
+        deltas[new_option_id] += 1
+    return apply_vote_deltas(deltas)
+
+
+class VoteRateTracker:
+    """
+    Counts counter updates per option in fixed windows and reports the
+    options that reached ``rate`` updates per second in the current one.
+    Each option is reported at most once per window.
+    """
+
+    def __init__(self, rate, window):
+        self.threshold = max(int(rate * window), 1)
+        self.window = window
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._counts = Counter()
+
+    def note(self, option_ids):
+        now = time.monotonic()
+        hot = []
+        with self._lock:
+            if now - self._window_start >= self.window:
+                self._window_start = now
+                self._counts.clear()
+            for pk in option_ids:
+                self._counts[pk] += 1
+                if self._counts[pk] == self.threshold:
+                    hot.append(pk)
+        return hot
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_vote_rate_tracker():
+    global _tracker
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                options = shard_settings()
+                _tracker = VoteRateTracker(options['PROMOTE_VOTES_PER_SECOND'], options['WINDOW'])
+    return _tracker
+
+
+def reset_vote_rate_tracker():
+    global _tracker
+    _tracker = None
+
+
+def _note_votes(option_ids):
+    if not option_ids or not shard_settings()['AUTO_PROMOTE']:
+        return
+    hot = get_vote_rate_tracker().note(option_ids)
+    if hot:
+        transaction.on_commit(lambda: promote_polls(
+            Option.objects.filter(pk__in=hot).values('poll_id')))
+
+
+def promote_polls(poll_ids, shards=None):
+    """Start sharding the counters of the given polls; returns how many changed."""
+    shards = shards or shard_settings()['SHARDS']
+    promoted = Poll.objects.filter(pk__in=poll_ids, counter_shards=0).update(counter_shards=shards)
+    if promoted:
+        logger.info("Promoted %d poll(s) to %d vote counter shards.", promoted, shards)
+    return promoted
+
+
+def compact_counter_shards(poll_ids=None, demote=False):
+    """
+    Fold counter shards into ``Option.vote_count`` and delete them.
+
+    With ``demote`` the polls stop sharding first. Shards written by votes
+    that were in flight during compaction survive it and are still counted,
+    so this is safe to run on a live poll. Returns the number of shards
+    folded.
+    """
+    with transaction.atomic():
+        if demote:
+            polls = Poll.objects.filter(counter_shards__gt=0)
+            if poll_ids is not None:
+                polls = polls.filter(pk__in=poll_ids)
+            polls.update(counter_shards=0)
+        rows = OptionCounterShard.objects.all()
+        if poll_ids is not None:
+            rows = rows.filter(option__poll_id__in=poll_ids)
+        rows = list(rows.select_for_update().order_by('option_id', 'shard')
+                    .values_list('pk', 'option_id', 'count'))
+        totals = Counter()
+        for _, option_id, count in rows:
+            totals[option_id] += count
+        totals = {pk: total for pk, total in totals.items() if total}
+        if totals:
+            _increment_vote_counts(totals)
+        OptionCounterShard.objects.filter(pk__in=[pk for pk, _, _ in rows]).delete()
+    return len(rows)
+
+
+def stored_vote_counts(options):
+    """Annotate an Option queryset with ``votes``, its counter plus its shards."""
+    return options.annotate(votes=F('vote_count') + Coalesce(Sum('counter_shards__count'), 0))
+
+
+def actual_vote_counts(poll_ids=None):
+    """Return ``{option_id: votes}`` computed from the vote table."""
+    rows = Vote.objects.all()
+    if poll_ids is not None:
+        rows = rows.filter(poll_id__in=poll_ids)
+    return Counter(dict(
+        rows.order_by().values_list('selected_option').annotate(n=Count('pk'))))
+
+
+def rebuild_vote_counts(poll_ids=None, dry_run=False):
+    """
+    Reconcile stored counters with the vote table. Archived polls (see
+    polls.archive) have no votes left in it and are skipped.
+
+    Returns a list of ``(option_id, stored, actual)`` tuples for every option
+    whose counter (including its shards) had drifted. Unless ``dry_run`` is
+    set, the drifted counters are corrected in one UPDATE.
+    """
+    with transaction.atomic():
+        options = Option.objects.filter(poll__archived_at__isnull=True)
+        shards = OptionCounterShard.objects.filter(option__poll__archived_at__isnull=True)
+        if poll_ids is not None:
+            options = options.filter(poll_id__in=poll_ids)
+            shards = shards.filter(option__poll_id__in=poll_ids)
+        stored = {
+            pk: (poll_id, count)
+            for pk, poll_id, count in options.select_for_update().values_list(
+                'pk', 'poll_id', 'vote_count')
+        }
+        for option_id, count in shards.select_for_update().values_list('option_id', 'count'):
+            poll_id, total = stored[option_id]
+            stored[option_id] = (poll_id, total + count)
+        actual = actual_vote_counts(poll_ids)
+        drift = [
+            (pk, count, actual.get(pk, 0))
+            for pk, (_, count) in sorted(stored.items())
+            if count != actual.get(pk, 0)
+        ]
+        if drift and not dry_run:
+            _increment_vote_counts({pk: real - count for pk, count, real in drift})
+            bump_poll_version_on_commit(*{stored[pk][0] for pk, _, _ in drift})
+    return drift
+
+
+def _settings_changed(setting, **kwargs):
+    if setting == 'VOTE_COUNTER_SHARDS':
+        reset_vote_rate_tracker()
+
+
+setting_changed.connect(_settings_changed)
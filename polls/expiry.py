@@ -0,0 +1,139 @@
+"""
+Scheduled poll expiry.
+
+Voting checks ``expires_at`` itself, but ``Poll.is_active`` only turns False
+when something closes the poll. ``manage.py run_expiry`` does that: every
+``INTERVAL`` seconds it closes the active polls whose ``expires_at`` has
+passed, ``BATCH_SIZE`` at a time, and invalidates their cached results.
+
+Due polls are found through the partial index ``polls_poll_expiry_idx`` on
+``expires_at WHERE is_active``, which holds only the polls still waiting to
+expire, so each tick reads the head of that queue instead of scanning the
+poll table. Batches are claimed with ``SELECT ... FOR UPDATE SKIP LOCKED``
+where the database supports it, so several workers can share a backlog.
+
+After closing, each pass also writes the columnar snapshots of closed
+polls that have settled (see ``polls.snapshots``).
+
+Lag - how long the oldest due poll has been waiting to be closed - is
+logged by the worker and served on ``/metrics/`` as
+``polls_expiry_lag_seconds``.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from polls.models import Poll
+from polls.results_cache import bump_poll_versions, get_poll_versions
+from polls.snapshots import take_snapshots
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BATCH_SIZE': 1000,
+    'INTERVAL': 1.0,
+}
+
+
+def expiry_settings():
+    return {**DEFAULTS, **getattr(settings, 'POLL_EXPIRY', {})}
+
+
+def due_polls(now=None):
+    return Poll.objects.filter(is_active=True, expires_at__lte=now or timezone.now())
+
+
+def expiry_lag(now=None):
+    """Seconds the oldest due poll has been waiting to be closed (0 if none)."""
+    now = now or timezone.now()
+    oldest = due_polls(now).aggregate(oldest=Min('expires_at'))['oldest']
+    return (now - oldest).total_seconds() if oldest else 0.0
+
+
+def _invalidate(poll_ids):
+    # Only polls with a version counter can have cached results, ETags or
+    # live streams; skipping the rest keeps a large batch to a few cache calls.
+    bump_poll_versions(get_poll_versions(poll_ids))
+
+
+def expire_due_polls(now=None, batch_size=None):
+    """
+    Close every poll that was due at ``now``, oldest first, in batches of
+    ``batch_size``. Returns ``(closed, lag)``, where ``lag`` is how many
+    seconds the oldest of them had been due.
+    """
+    now = now or timezone.now()
+    batch_size = batch_size or expiry_settings()['BATCH_SIZE']
+    closed, oldest = 0, None
+    while True:
+        with transaction.atomic():
+            batch = list(
+                due_polls(now).order_by('expires_at')
+                .select_for_update(skip_locked=True)
+                .values_list('pk', 'expires_at')[:batch_size])
+            if not batch:
+                break
+            poll_ids = [pk for pk, _ in batch]
+            closed += Poll.objects.filter(pk__in=poll_ids, is_active=True).update(
+                is_active=False, updated_at=now)
+            transaction.on_commit(lambda poll_ids=poll_ids: _invalidate(poll_ids))
+        if oldest is None:
+            oldest = batch[0][1]
+        if len(batch) < batch_size:
+            break
+    return closed, (now - oldest).total_seconds() if oldest else 0.0
+
+
+class ExpiryWorker:
+    """The ``run_expiry`` loop; ``tick()`` runs one pass."""
+
+    def __init__(self, batch_size=1000, interval=1.0):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.ticks = 0
+        self.closed = 0
+        self.max_lag = 0.0
+        self.snapshots = 0
+
+    def tick(self):
+        started = time.perf_counter()
+        closed, lag = expire_due_polls(batch_size=self.batch_size)
+        self.ticks += 1
+        self.closed += closed
+        self.max_lag = max(self.max_lag, lag)
+        if closed:
+            logger.info("Closed %d expired poll(s) in %.1f ms; lag %.3f s.",
+                        closed, (time.perf_counter() - started) * 1000, lag)
+        snapshots = take_snapshots()
+        self.snapshots += snapshots
+        if snapshots:
+            logger.info("Wrote %d poll snapshot(s).", snapshots)
+        return closed, lag
+
+    def run(self, ticks=None):
+        """Tick every ``interval`` seconds, forever or ``ticks`` times."""
+        while True:
+            started = time.monotonic()
+            self.tick()
+            if ticks is not None and self.ticks >= ticks:
+                return
+            # Between passes, as between requests: drop a connection that is
+            # broken or past DB_CONN_MAX_AGE (or return it to the pool).
+            close_old_connections()
+            time.sleep(max(self.interval - (time.monotonic() - started), 0))
+
+    def stats(self):
+        return {'ticks': self.ticks, 'closed': self.closed, 'max_lag': round(self.max_lag, 3),
+                'snapshots': self.snapshots}
+
+
+def expiry_metrics():
+    """Exposition lines for ``/metrics/``."""
+    name = 'polls_expiry_lag_seconds'
+    return [f'# HELP {name} Seconds the oldest expired but still active poll has been waiting to be closed.',
+            f'# TYPE {name} gauge',
+            f'{name} {expiry_lag():.3f}']
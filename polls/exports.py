@@ -0,0 +1,124 @@
+"""
+Streaming export of raw votes.
+
+Votes are read through a server-side cursor (``QuerySet.iterator``) in
+``(created_at, id)`` order, so memory use stays flat no matter how many
+votes a poll has. Closed polls with a snapshot (see polls.snapshots) are
+exported from its memory-mapped columns instead; archived polls only
+from it. Ballots (approval, ranked and weighted polls) follow the votes,
+one row per chosen option, with its ``rank`` on ranked polls and its
+``weight`` on weighted ones. ``using`` reads from
+that database alias (e.g. a read replica, see polls.replicas) rather than
+the routed one, since the rows are read after the view has returned.
+
+Under ASGI a plain generator handed to ``StreamingHttpResponse`` would be
+read to the end into memory before the first byte is sent, so the view
+streams ``aexport_lines`` instead: the same lines, pulled ``chunk_size``
+at a time on the sync thread, which keeps the server-side cursor (and the
+database connection holding it) on one thread.
+"""
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from polls.models import Ballot, Option, Poll, Vote
+from polls.snapshots import open_snapshot
+from polls.tallying import unpack_choices
+
+EXPORT_COLUMNS = (
+    'vote_id', 'voter_type', 'user_id', 'session_id', 'ip_address',
+    'option_id', 'option_text', 'created_at', 'rank', 'weight',
+)
+EXPORT_FORMATS = ('csv', 'ndjson')
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def iter_vote_rows(poll_id, chunk_size=DEFAULT_CHUNK_SIZE, using=None, archived=False):
+    """
+    Iterate one tuple per vote (and ballot choice) on the poll, in
+    ``EXPORT_COLUMNS`` order.
+    The snapshot is opened right away, so an ``archived`` poll whose
+    snapshot is missing raises SnapshotMissing here, before anything is
+    streamed.
+    """
+    return _vote_rows(poll_id, open_snapshot(poll_id, archived=archived), chunk_size, using)
+
+
+def _vote_rows(poll_id, snapshot, chunk_size, using):
+    option_text = dict(Option.objects.using(using).filter(poll_id=poll_id).values_list('id', 'option_text'))
+    method = Poll.objects.using(using).filter(pk=poll_id).values_list('voting_method', flat=True).first()
+    if snapshot is not None:
+        yield from snapshot.vote_rows(option_text, chunk_size)
+        yield from _ballot_rows(snapshot.ballot_rows(chunk_size), option_text, method)
+        return
+    rows = (Vote.objects.using(using).filter(poll_id=poll_id).order_by('created_at', 'id')
+            .values_list('id', 'user_id', 'session_id', 'ip_address', 'selected_option_id', 'created_at')
+            .iterator(chunk_size=chunk_size))
+    for vote_id, user_id, session_id, ip_address, option_id, created_at in rows:
+        yield (vote_id, 'user' if user_id else 'guest', user_id, session_id, ip_address,
+               option_id, option_text.get(option_id), created_at, None, None)
+    ballots = (Ballot.objects.using(using).filter(poll_id=poll_id).order_by('created_at', 'id')
+               .values_list('id', 'user_id', 'session_id', 'ip_address', 'created_at', 'choices')
+               .iterator(chunk_size=chunk_size))
+    yield from _ballot_rows(
+        (((ballot_id, 'user' if user_id else 'guest', user_id, session_id, ip_address, created_at), bytes(choices))
+         for ballot_id, user_id, session_id, ip_address, created_at, choices in ballots),
+        option_text, method)
+
+
+def _ballot_rows(ballots, option_text, method):
+    """One row per choice on each ``(voter, packed choices)`` ballot."""
+    for voter, choices in ballots:
+        option_ids, weights = unpack_choices(choices, weighted=method == 'weighted')
+        for rank, option_id in enumerate(option_ids, 1):
+            if option_id in option_text:
+                yield (*voter[:5], option_id, option_text[option_id], voter[5],
+                       rank if method == 'ranked' else None, weights[rank - 1] if weights else None)
+
+
+class _Echo:
+    """File-like object whose write() hands back the line for streaming."""
+
+    def write(self, value):
+        return value
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in rows:
+        yield writer.writerow(row[:7] + (_isoformat(row[7]),) + row[8:])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        record = dict(zip(EXPORT_COLUMNS, row))
+        record['created_at'] = _isoformat(record['created_at'])
+        yield json.dumps(record, separators=(',', ':')) + '\n'
+
+
+def export_lines(poll_id, export_format='csv', chunk_size=DEFAULT_CHUNK_SIZE, using=None, archived=False):
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format {export_format!r}.")
+    rows = iter_vote_rows(poll_id, chunk_size=chunk_size, using=using, archived=archived)
+    return csv_lines(rows) if export_format == 'csv' else ndjson_lines(rows)
+
+
+async def aexport_lines(lines, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Async iterator over the ``export_lines`` iterator ``lines``, ``chunk_size``
+    lines (joined) per thread hop, for streaming responses under ASGI.
+    """
+    next_chunk = sync_to_async(lambda: ''.join(islice(lines, chunk_size)))
+    try:
+        while chunk := await next_chunk():
+            yield chunk
+    finally:
+        # Releases the cursor if the client went away mid-export.
+        await sync_to_async(lines.close)()
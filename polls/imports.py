@@ -0,0 +1,123 @@
+"""
+Bulk poll import from CSV or NDJSON.
+
+Records are parsed lazily from any iterable of text lines, validated with
+the same rules as ``POST /api/polls/`` (``PollSerializer``) and written in
+batches: each batch is one transaction holding one multi-row INSERT for
+its polls and one for all of their options.
+
+CSV files have a header row with ``question`` and ``options`` columns, plus
+optional ``expires_at`` (ISO 8601) and ``is_active`` columns; options are
+separated by ``|``. NDJSON records are objects with the same keys, where
+``options`` is a list of strings.
+"""
+import csv
+import json
+import time
+
+from django.db import transaction
+from django.utils.html import escape
+from rest_framework.exceptions import ValidationError
+
+from polls.api.serializers.poll import PollSerializer
+from polls.models import Option, Poll
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+DEFAULT_BATCH_SIZE = 500
+OPTION_SEPARATOR = '|'
+MAX_REPORTED_ERRORS = 100
+
+
+def csv_records(lines):
+    """Yield ``(line_number, record)`` for each CSV data row."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        record = {key: value for key, value in row.items() if key and value not in (None, '')}
+        if 'options' in record:
+            record['options'] = [
+                text.strip() for text in record['options'].split(OPTION_SEPARATOR) if text.strip()]
+        yield reader.line_num, record
+
+
+def ndjson_records(lines):
+    """Yield ``(line_number, record)`` for each non-blank NDJSON line."""
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            record = exc
+        yield line_number, record
+
+
+def parse_records(lines, import_format='csv'):
+    if import_format not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format {import_format!r}.")
+    return csv_records(lines) if import_format == 'csv' else ndjson_records(lines)
+
+
+def validate_record(serializer, record):
+    """
+    Return ``(validated_data, None)`` or ``(None, errors)`` for one record.
+
+    One unbound ``PollSerializer`` is reused for every record, so its
+    fields are only built once per import.
+    """
+    if isinstance(record, ValueError):
+        return None, {'non_field_errors': [f"Invalid JSON: {record}"]}
+    if not isinstance(record, dict):
+        return None, {'non_field_errors': ["Expected a JSON object."]}
+    data = dict(record)
+    data['options_data'] = data.pop('options', None)
+    try:
+        return serializer.run_validation(data), None
+    except ValidationError as exc:
+        return None, exc.detail
+
+
+def _write_batch(batch, created_by):
+    with transaction.atomic():
+        polls = Poll.objects.bulk_create(
+            Poll(created_by=created_by, **{k: v for k, v in data.items() if k != 'options_data'})
+            for data in batch)
+        options = Option.objects.bulk_create(
+            Option(poll=poll, option_text=escape(text))
+            for poll, data in zip(polls, batch) for text in data['options_data'])
+    return len(polls), len(options)
+
+
+def import_polls(records, created_by, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Create polls (and their options) from ``(line_number, record)`` pairs.
+
+    Invalid records are skipped and reported; every valid record is
+    written. Returns a report with the counts, the first
+    ``MAX_REPORTED_ERRORS`` errors and the throughput.
+    """
+    started = time.perf_counter()
+    report = {'polls': 0, 'options': 0, 'invalid': 0, 'errors': []}
+    serializer = PollSerializer()
+    batch = []
+    for line_number, record in records:
+        data, errors = validate_record(serializer, record)
+        if errors:
+            report['invalid'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'line': line_number, 'errors': errors})
+            continue
+        batch.append(data)
+        if len(batch) >= batch_size:
+            polls, options = _write_batch(batch, created_by)
+            report['polls'] += polls
+            report['options'] += options
+            batch = []
+    if batch:
+        polls, options = _write_batch(batch, created_by)
+        report['polls'] += polls
+        report['options'] += options
+
+    elapsed = time.perf_counter() - started
+    report['seconds'] = round(elapsed, 3)
+    report['polls_per_second'] = round(report['polls'] / elapsed) if elapsed else 0
+    return report
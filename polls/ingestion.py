@@ -0,0 +1,422 @@
+"""
+Write-behind vote ingestion.
+
+When ``VOTE_INGESTION['MODE']`` is ``'buffered'`` the vote action validates a
+vote, appends it to a local queue and answers ``202 Accepted``. A background
+flusher drains the queue in batches and upserts them with
+``bulk_create(update_conflicts=True)``, so a burst of votes on one poll costs
+one INSERT ... ON CONFLICT per table per batch instead of a locked
+get-or-create per vote.
+
+Durability levels (``VOTE_INGESTION['DURABILITY']``):
+
+* ``memory``   - acknowledged once queued in process memory; votes still
+                 queued are lost if the process dies.
+* ``local``    - acknowledged once appended to the local SQLite queue file;
+                 survives a process crash.
+* ``fsync``    - like ``local`` but the queue file is fsynced on every
+                 append; survives an OS crash or power loss.
+* ``database`` - the request waits until the batch holding its vote has been
+                 committed to the database (group commit).
+
+A flush first discards votes for options (or polls) deleted while they were
+queued. If a batch still fails with a data error, it is split in halves and
+retried, so only the entries that fail on their own are dropped (and
+logged); connection errors leave the whole batch queued for the next flush.
+
+Each worker's buffer reports its queue depth, batch sizes and flush
+latencies on ``/metrics/`` (``ingestion_metrics``).
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import DatabaseError, InterfaceError, OperationalError
+from django.utils.module_loading import import_string
+
+from polls.buffering import BackgroundFlusher
+from polls.models import Option
+from polls.voting import upsert_votes
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_LEVELS = ('memory', 'local', 'fsync', 'database')
+
+# Reply to a vote ``submit()`` could not confirm (see its docstring).
+VOTE_NOT_CONFIRMED = 'Vote could not be recorded in time; please retry.'
+
+DEFAULTS = {
+    'MODE': 'sync',
+    'BACKEND': 'polls.ingestion.MemoryVoteQueue',
+    'PATH': 'vote_queue.sqlite3',
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 0.5,
+    'DURABILITY': 'memory',
+    'WAIT_TIMEOUT': 5.0,
+    'AUTOSTART': True,
+}
+
+
+def ingestion_settings():
+    return {**DEFAULTS, **getattr(settings, 'VOTE_INGESTION', {})}
+
+
+def buffered_ingestion_enabled():
+    return ingestion_settings()['MODE'] == 'buffered'
+
+
+class MemoryVoteQueue:
+    """In-process FIFO queue. Only supports ``memory`` and ``database`` durability."""
+
+    durability_levels = ('memory', 'database')
+
+    def __init__(self, **options):
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._next_token = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, entry):
+        with self._lock:
+            self._next_token += 1
+            self._items.append((self._next_token, entry))
+            return self._next_token
+
+    def take(self, limit):
+        with self._lock:
+            return [self._items.popleft() for _ in range(min(limit, len(self._items)))]
+
+    def ack(self, items):
+        pass
+
+    def requeue(self, items):
+        with self._lock:
+            self._items.extendleft(reversed(items))
+
+
+class SQLiteVoteQueue:
+    """
+    Append-only queue in a local SQLite file.
+
+    Entries stay in the file until their batch has been committed to the
+    database, so a crash between ``take`` and ``ack`` replays the batch on the
+    next flush. Replays are harmless because the flush is an idempotent
+    upsert keyed by voter.
+
+    Every worker process may share the file: ``take`` claims its rows in the
+    file (``UPDATE ... RETURNING``), so each entry is flushed by one process.
+    Claims older than ``claim_timeout`` seconds, left behind by a process
+    that died mid-flush, can be taken again. ``len()`` is kept in memory,
+    as this process sees the file: the entries found at start plus its
+    own, less what it took, and zero once a ``take`` comes up short. With ``database`` durability a
+    vote flushed by another process is not confirmed to its waiting request,
+    which answers 503; the client's retry is then a no-op upsert.
+    """
+
+    durability_levels = DURABILITY_LEVELS
+
+    def __init__(self, path, durability='local', claim_timeout=60.0, **options):
+        self._lock = threading.Lock()
+        self._owner = f'{os.getpid()}:{uuid.uuid4().hex}'
+        self.claim_timeout = claim_timeout
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'PRAGMA synchronous=%s' % ('FULL' if durability == 'fsync' else 'NORMAL'))
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS pending_votes '
+            '(id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, '
+            'claimed_by TEXT, claimed_at REAL)')
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(pending_votes)')}
+        for column, kind in (('claimed_by', 'TEXT'), ('claimed_at', 'REAL')):
+            if column not in columns:
+                self._conn.execute(f'ALTER TABLE pending_votes ADD COLUMN {column} {kind}')
+        (self._pending,) = self._conn.execute(
+            'SELECT COUNT(*) FROM pending_votes WHERE claimed_by IS NULL OR claimed_at < ?',
+            (time.time() - self.claim_timeout,)).fetchone()
+
+    def __len__(self):
+        """Entries no live process has claimed (as far as this one knows)."""
+        return self._pending
+
+    def put(self, entry):
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO pending_votes (payload) VALUES (?)', (json.dumps(entry),))
+            self._pending += 1
+            return cursor.lastrowid
+
+    def take(self, limit):
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                'UPDATE pending_votes SET claimed_by = ?, claimed_at = ? WHERE id IN ('
+                'SELECT id FROM pending_votes WHERE claimed_by IS NULL OR claimed_at < ? '
+                'ORDER BY id LIMIT ?) RETURNING id, payload',
+                (self._owner, now, now - self.claim_timeout, limit)).fetchall()
+            # Other processes take entries too; a short take means none are left.
+            self._pending = max(self._pending - len(rows), 0) if len(rows) == limit else 0
+        return [(token, json.loads(payload)) for token, payload in sorted(rows)]
+
+    def ack(self, items):
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'DELETE FROM pending_votes WHERE id = ? AND claimed_by = ?',
+                [(token, self._owner) for token, _ in items])
+
+    def requeue(self, items):
+        if not items:
+            return
+        with self._lock:
+            cursor = self._conn.executemany(
+                'UPDATE pending_votes SET claimed_by = NULL, claimed_at = NULL '
+                'WHERE id = ? AND claimed_by = ?',
+                [(token, self._owner) for token, _ in items])
+            self._pending += cursor.rowcount
+
+
+class VoteBuffer:
+    """Queue of validated votes plus the batching flusher that drains it."""
+
+    def __init__(self, queue, batch_size=500, flush_interval=0.5,
+                 durability='memory', wait_timeout=5.0):
+        if durability not in getattr(queue, 'durability_levels', DURABILITY_LEVELS):
+            raise ImproperlyConfigured(
+                f"{type(queue).__name__} does not support {durability!r} durability.")
+        self.queue = queue
+        self.batch_size = batch_size
+        self.durability = durability
+        self.wait_timeout = wait_timeout
+        self.flusher = BackgroundFlusher(self.flush, flush_interval, name='vote-ingestion')
+        self._flush_lock = threading.Lock()
+        self._committed = threading.Condition()
+        # Tokens of ``database`` durability requests still waiting, and
+        # {token: whether the vote was written} once their batch is done.
+        self._waiting = set()
+        self._settled = {}
+        self._stats = Counter()
+        self._last_batch_size = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+
+    def submit(self, poll_id, option_id, user_id=None, session_id=None, ip_address=None):
+        """
+        Queue a validated vote. Returns True once the vote is as durable as
+        the configured level promises (always immediately, except for
+        ``database`` durability, which waits for the flush), and False if
+        that wait timed out or the flush dropped the vote.
+        """
+        token = self.queue.put({
+            'poll': poll_id, 'option': option_id, 'user': user_id,
+            'session_id': session_id, 'ip_address': ip_address,
+        })
+        self._stats['submitted'] += 1
+        if len(self.queue) >= self.batch_size:
+            self.flusher.wake()
+        if self.durability != 'database':
+            return True
+        with self._committed:
+            self._waiting.add(token)
+        try:
+            if not self.flusher.running:
+                try:
+                    self.flush()
+                except Exception:
+                    # The vote stays queued for the next flush; it is just not confirmed.
+                    logger.exception("Flushing queued votes failed")
+                    return False
+            with self._committed:
+                self._committed.wait_for(lambda: token in self._settled, self.wait_timeout)
+                return self._settled.pop(token, False)
+        finally:
+            with self._committed:
+                self._waiting.discard(token)
+
+    def flush(self):
+        """Drain the queue in batches. Returns the number of votes written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                items = self.queue.take(self.batch_size)
+                if not items:
+                    break
+                started = time.perf_counter()
+                done, dropped = [], []
+                try:
+                    live, dropped = self._discard_stale(items)
+                    self._stats['discarded'] += len(dropped)
+                    self._write(live, done, dropped)
+                except Exception:
+                    # Nothing the flush has not finished with is lost.
+                    finished = {token for token, _ in done + dropped}
+                    self.queue.ack([item for item in items if item[0] in finished])
+                    self.queue.requeue([item for item in items if item[0] not in finished])
+                    self._settle(done, dropped)
+                    self._stats['failed_flushes'] += 1
+                    raise
+                self.queue.ack(items)
+                self._settle(done, dropped)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                self._record_flush(len(done), elapsed_ms)
+                written += len(done)
+                logger.debug("Flushed %d votes (%d dropped) in %.1f ms", len(done), len(dropped), elapsed_ms)
+        return written
+
+    @staticmethod
+    def _discard_stale(items):
+        """Split ``items`` into votes for existing options and votes for deleted ones."""
+        option_polls = dict(Option.objects.filter(
+            pk__in={entry['option'] for _, entry in items}).values_list('id', 'poll_id'))
+        live, stale = [], []
+        for item in items:
+            (live if option_polls.get(item[1]['option']) == item[1]['poll'] else stale).append(item)
+        return live, stale
+
+    def _write(self, items, done, dropped):
+        """
+        Upsert ``items``, halving the batch around entries that fail with a
+        data error. Written items go to ``done``, entries that fail alone
+        to ``dropped``; connection errors propagate.
+        """
+        if not items:
+            return
+        try:
+            upsert_votes([entry for _, entry in items])
+        except (OperationalError, InterfaceError):
+            raise
+        except DatabaseError:
+            if len(items) == 1:
+                logger.exception("Dropping queued vote that cannot be written: %r", items[0][1])
+                self._stats['rejected'] += 1
+                dropped.extend(items)
+                return
+            middle = len(items) // 2
+            self._write(items[:middle], done, dropped)
+            self._write(items[middle:], done, dropped)
+            return
+        done.extend(items)
+
+    def _settle(self, done, dropped):
+        if self.durability != 'database' or not (done or dropped):
+            return
+        with self._committed:
+            self._settled.update((token, True) for token, _ in done if token in self._waiting)
+            self._settled.update((token, False) for token, _ in dropped if token in self._waiting)
+            self._committed.notify_all()
+
+    def _record_flush(self, size, elapsed_ms):
+        self._stats['flushes'] += 1
+        self._stats['flushed'] += size
+        self._last_batch_size = size
+        self._last_flush_ms = elapsed_ms
+        self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+        self._stats['flush_ms_total'] += elapsed_ms
+
+    def stats(self):
+        flushes = self._stats['flushes']
+        return {
+            'pending': len(self.queue),
+            'submitted': self._stats['submitted'],
+            'flushed': self._stats['flushed'],
+            'flushes': flushes,
+            'failed_flushes': self._stats['failed_flushes'],
+            'discarded': self._stats['discarded'],
+            'rejected': self._stats['rejected'],
+            'last_batch_size': self._last_batch_size,
+            'avg_batch_size': self._stats['flushed'] / flushes if flushes else 0.0,
+            'last_flush_ms': round(self._last_flush_ms, 3),
+            'avg_flush_ms': round(self._stats['flush_ms_total'] / flushes, 3) if flushes else 0.0,
+            'max_flush_ms': round(self._max_flush_ms, 3),
+            'durability': self.durability,
+        }
+
+    def start(self):
+        self.flusher.start()
+
+    def stop(self):
+        self.flusher.stop()
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def build_vote_buffer(options=None):
+    options = options or ingestion_settings()
+    queue = import_string(options['BACKEND'])(
+        path=str(options['PATH']), durability=options['DURABILITY'])
+    return VoteBuffer(
+        queue,
+        batch_size=options['BATCH_SIZE'],
+        flush_interval=options['FLUSH_INTERVAL'],
+        durability=options['DURABILITY'],
+        wait_timeout=options['WAIT_TIMEOUT'],
+    )
+
+
+def get_vote_buffer():
+    """Return the process-wide vote buffer, starting its flusher on first use."""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                options = ingestion_settings()
+                _buffer = build_vote_buffer(options)
+                if options['AUTOSTART']:
+                    _buffer.start()
+    return _buffer
+
+
+def reset_vote_buffer(**kwargs):
+    """Stop and drop the process-wide buffer (flushing what it holds)."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is not None:
+            _buffer.stop()
+            _buffer = None
+
+
+def ingestion_metrics():
+    """Exposition lines for ``/metrics/``: this worker's vote buffer, if it has one."""
+    if _buffer is None:
+        return []
+    stats = _buffer.stats()
+    lines = []
+    for name, kind, help_text, samples in (
+        ('polls_vote_ingestion_pending', 'gauge', 'Votes queued and not yet taken by a flush.',
+         [('', stats['pending'])]),
+        ('polls_vote_ingestion_votes_total', 'counter', 'Queued votes by outcome.',
+         [(f'{{outcome="{outcome}"}}', stats[outcome])
+          for outcome in ('submitted', 'flushed', 'discarded', 'rejected')]),
+        ('polls_vote_ingestion_flushes_total', 'counter', 'Batches written, and batches that failed.',
+         [('{result="ok"}', stats['flushes']), ('{result="failed"}', stats['failed_flushes'])]),
+        ('polls_vote_ingestion_batch_size', 'gauge', 'Votes in the last and the average batch.',
+         [('{batch="last"}', stats['last_batch_size']), ('{batch="avg"}', f"{stats['avg_batch_size']:.1f}")]),
+        ('polls_vote_ingestion_flush_seconds', 'gauge', 'Last, average and slowest batch write.',
+         [(f'{{batch="{batch}"}}', f"{stats[f'{batch}_flush_ms'] / 1000:.6f}") for batch in ('last', 'avg', 'max')]),
+    ):
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        lines += [f'{name}{labels} {value}' for labels, value in samples]
+    return lines
+
+
+def _settings_changed(setting, **kwargs):
+    if setting == 'VOTE_INGESTION':
+        reset_vote_buffer()
+
+
+setting_changed.connect(_settings_changed)
+atexit.register(reset_vote_buffer)
@@ -0,0 +1,303 @@
+"""
+Per-request latency and query instrumentation.
+
+``RequestMetricsMiddleware`` measures every request's wall time, time spent
+in the database, query count, duplicate queries (the same SQL with the same
+parameters run more than once, the usual sign of an N+1) and time spent
+producing the app's DRF serializer output. It adds them to per-route
+histograms, which ``/metrics/`` serves in the Prometheus text format, and, with
+``SERVER_TIMING`` on (off by default: it tells any client how long its
+queries took), reports them in a ``Server-Timing`` header.
+
+``/metrics/`` only answers clients with the ``TOKEN`` bearer token (if set)
+from an ``ALLOWED_IPS`` address or network (if set). With neither set it
+is only served while ``DEBUG`` is on.
+
+Queries are observed by one ``execute_wrapper`` installed on each database
+connection when it is opened; the wrapper finds the current request via a
+context variable, so it also follows async views into ``sync_to_async``
+threads and costs a single lookup for queries made outside requests.
+
+Requests slower than ``SLOW_REQUEST_MS`` are logged with their full query
+list (SQL and timings, no parameters) for a ``SLOW_REQUEST_SAMPLE_RATE``
+fraction of them.
+
+Histograms live in process memory: with several workers each scrape sees
+one worker, so aggregate with ``sum by (...)`` over scrapes or scrape the
+workers individually. Other modules add their own gauges to the scrape
+with ``register_collector``.
+"""
+import ipaddress
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'SERVER_TIMING': False,
+    'SLOW_REQUEST_MS': 1000,
+    'SLOW_REQUEST_SAMPLE_RATE': 1.0,
+    'TOKEN': '',
+    'ALLOWED_IPS': [],
+}
+
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+_current = ContextVar('polls_request_metrics', default=None)
+
+
+def metrics_settings():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+class RequestMetrics:
+    """What one request spent, filled in while it runs."""
+    __slots__ = ('started', 'db_time', 'serializer_time', 'queries', 'seen', 'duplicates')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.queries = []
+        self.seen = set()
+        self.duplicates = 0
+
+
+def record_query(execute, sql, params, many, context):
+    """``execute_wrapper`` that charges the query to the current request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        metrics.db_time += elapsed
+        metrics.queries.append((sql, elapsed))
+        try:
+            key = hash((sql, tuple(params) if isinstance(params, list) else params))
+        except TypeError:
+            key = hash((sql, repr(params)))
+        if key in metrics.seen:
+            metrics.duplicates += 1
+        else:
+            metrics.seen.add(key)
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    # First in the list, so connection.execute_wrapper() blocks that are
+    # open when the connection is created still pop their own wrapper.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+@contextmanager
+def serializer_timer():
+    """
+    Charge the block to the current request's serializer time; app
+    serializers wrap ``.data`` in it (polls.api.serializers.timing).
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - started
+
+
+class Histogram:
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+
+class MetricsRegistry:
+    """Per-route histograms, shared by every request in the process."""
+    HISTOGRAMS = {
+        'polls_request_duration_seconds': ('Request wall time.', SECONDS_BUCKETS),
+        'polls_request_db_seconds': ('Time spent in database queries per request.', SECONDS_BUCKETS),
+        'polls_request_serializer_seconds': ('Time spent in DRF serializers per request.', SECONDS_BUCKETS),
+        'polls_request_queries': ('Database queries per request.', QUERY_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._duplicates = {}
+
+    def observe(self, route, method, metrics, wall_time):
+        labels = (route, method)
+        values = (wall_time, metrics.db_time, metrics.serializer_time, len(metrics.queries))
+        with self._lock:
+            for (name, (_, buckets)), value in zip(self.HISTOGRAMS.items(), values):
+                histogram = self._histograms.get((name, labels))
+                if histogram is None:
+                    histogram = self._histograms[name, labels] = Histogram(buckets)
+                histogram.counts[bisect_left(buckets, value)] += 1
+                histogram.total += value
+                histogram.count += 1
+            self._duplicates[labels] = self._duplicates.get(labels, 0) + metrics.duplicates
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            histograms = {key: (list(h.counts), h.total, h.count) for key, h in self._histograms.items()}
+            duplicates = dict(self._duplicates)
+        lines = []
+        for name, (help_text, buckets) in self.HISTOGRAMS.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for (metric, (route, method)), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                labels = f'route="{_escape(route)}",method="{method}"'
+                cumulative = 0
+                for bound, n in zip(buckets, counts):
+                    cumulative += n
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+                lines.append(f'{name}_sum{{{labels}}} {total:.6f}')
+                lines.append(f'{name}_count{{{labels}}} {count}')
+        name = 'polls_request_duplicate_queries_total'
+        lines += [f'# HELP {name} Queries repeated with identical SQL and parameters within a request.',
+                  f'# TYPE {name} counter']
+        for (route, method), total in sorted(duplicates.items()):
+            lines.append(f'{name}{{route="{_escape(route)}",method="{method}"}} {total}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+_registry = MetricsRegistry()
+_collectors = []
+
+
+def register_collector(collect):
+    """Append the exposition lines returned by ``collect()`` to every ``/metrics/`` scrape."""
+    if collect not in _collectors:
+        _collectors.append(collect)
+
+
+def get_metrics_registry():
+    return _registry
+
+
+def reset_metrics_registry():
+    global _registry
+    _registry = MetricsRegistry()
+
+
+def _reset_on_settings_change(setting, **kwargs):
+    if setting == 'REQUEST_METRICS':
+        reset_metrics_registry()
+
+
+setting_changed.connect(_reset_on_settings_change)
+
+
+def _route(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'unmatched'
+
+
+class RequestMetricsMiddleware:
+    """See the module docstring; place it first in ``MIDDLEWARE``."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not metrics_settings()['ENABLED']:
+            return self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        if not metrics_settings()['ENABLED']:
+            return await self.get_response(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        config = metrics_settings()
+        wall_time = time.perf_counter() - metrics.started
+        route = _route(request)
+        _registry.observe(route, request.method, metrics, wall_time)
+        if config['SERVER_TIMING']:
+            response['Server-Timing'] = (
+                f'total;dur={wall_time * 1000:.2f}, '
+                f'db;dur={metrics.db_time * 1000:.2f};'
+                f'desc="{len(metrics.queries)} queries ({metrics.duplicates} duplicate)", '
+                f'serializer;dur={metrics.serializer_time * 1000:.2f}'
+            )
+        if (wall_time * 1000 >= config['SLOW_REQUEST_MS']
+                and random.random() < config['SLOW_REQUEST_SAMPLE_RATE']):
+            logger.warning(
+                "Slow request %s %s (%s): %.1f ms, %d queries (%d duplicate) in %.1f ms\n%s",
+                request.method, request.get_full_path(), route, wall_time * 1000,
+                len(metrics.queries), metrics.duplicates, metrics.db_time * 1000,
+                '\n'.join(f'  {elapsed * 1000:8.2f} ms  {sql}' for sql, elapsed in metrics.queries))
+        return response
+
+
+def _address_allowed(address, allowed):
+    try:
+        address = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False) for network in allowed)
+
+
+def metrics_view(request):
+    """Serve the histograms in Prometheus text format."""
+    config = metrics_settings()
+    token, allowed = config['TOKEN'], config['ALLOWED_IPS']
+    if not (token or allowed or settings.DEBUG):
+        return HttpResponseForbidden()
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    if allowed and not _address_allowed(request.META.get('REMOTE_ADDR', ''), allowed):
+        return HttpResponseForbidden()
+    body = _registry.render() + ''.join(line + '\n' for collect in _collectors for line in collect())
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+connection_created.connect(install_query_wrapper)
@@ -0,0 +1,292 @@
+"""
+Live poll results over Server-Sent Events.
+
+Every process runs at most one ``ResultsHub``. Its background thread ticks
+``MAX_UPDATES_PER_SECOND`` times a second; on each tick it asks the pub/sub
+backend which watched polls changed since the previous tick, computes each
+changed poll's results once (through the version-stamped results cache) and
+hands the payload to every subscriber of that poll. Any number of votes
+between two ticks therefore cost one computation, and any number of
+watchers share it. A slow subscriber only ever sees the latest payload.
+
+Backends (``POLL_RESULTS_STREAM['BACKEND']``):
+
+* ``CacheVersionPubSub`` - compares the polls' results versions in the
+  shared cache on every tick. Works across processes with any shared cache
+  backend (one ``get_many`` per tick) and needs no extra infrastructure.
+* ``InProcessPubSub``    - relies on ``poll_results_changed`` signals sent in
+  this process, so it only sees votes handled by the same process. Meant for
+  tests and single-process deployments.
+"""
+import asyncio
+import atexit
+import json
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.utils.module_loading import import_string
+
+from polls.buffering import BackgroundFlusher
+from polls.models import Poll
+from polls.results_cache import (
+    get_cached_results, get_poll_version, get_poll_versions, poll_results_changed)
+from polls.snapshots import SnapshotMissing
+from polls.voting import compute_results
+
+DEFAULTS = {
+    'BACKEND': 'polls.live.CacheVersionPubSub',
+    'MAX_UPDATES_PER_SECOND': 2.0,
+    'HEARTBEAT': 15.0,
+    'AUTOSTART': True,
+}
+
+
+def stream_settings():
+    return {**DEFAULTS, **getattr(settings, 'POLL_RESULTS_STREAM', {})}
+
+
+class InProcessPubSub:
+    def __init__(self):
+        self._changed = set()
+        self._lock = threading.Lock()
+
+    def publish(self, poll_id):
+        with self._lock:
+            self._changed.add(poll_id)
+
+    def changed(self, poll_ids):
+        with self._lock:
+            changed = self._changed.intersection(poll_ids)
+            self._changed -= changed
+        return changed
+
+
+class CacheVersionPubSub:
+    def __init__(self):
+        self._seen = {}
+
+    def publish(self, poll_id):
+        # The version bump that triggered this is already in the shared cache.
+        pass
+
+    def changed(self, poll_ids):
+        versions = get_poll_versions(poll_ids)
+        changed = {
+            poll_id for poll_id in poll_ids
+            if poll_id not in versions or versions[poll_id] != self._seen.get(poll_id)
+        }
+        self._seen = {poll_id: versions.get(poll_id) for poll_id in poll_ids}
+        return changed
+
+
+def results_snapshot(poll_id):
+    """Current results payload for the poll, tagged with its version."""
+    version = get_poll_version(poll_id)
+    results = get_cached_results(
+        poll_id, version, lambda: compute_results(Poll.objects.get(pk=poll_id)))
+    return {'poll': poll_id, 'version': version, **results}
+
+
+class Subscriber:
+    """
+    One stream's mailbox. Holds only the newest undelivered payload; ``None``
+    means the poll is gone and the stream should end.
+    """
+
+    def __init__(self, poll_id, loop=None):
+        self.poll_id = poll_id
+        self.version = None
+        self._payload = None
+        self._pending = False
+        self._cond = threading.Condition()
+        self._loop = loop
+        self._event = asyncio.Event() if loop is not None else None
+
+    def push(self, payload):
+        with self._cond:
+            if payload is not None and payload['version'] == self.version:
+                return False
+            self.version = payload['version'] if payload is not None else None
+            self._payload, self._pending = payload, True
+            self._cond.notify_all()
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._event.set)
+        return True
+
+    def _take(self):
+        payload, self._pending = self._payload, False
+        return True, payload
+
+    def get(self, timeout):
+        """Wait for the next payload. Returns ``(delivered, payload)``."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._pending, timeout):
+                return False, None
+            return self._take()
+
+    async def aget(self, timeout):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            # Clear before checking so a push landing in between still wakes us.
+            self._event.clear()
+            with self._cond:
+                if self._pending:
+                    return self._take()
+            try:
+                await asyncio.wait_for(self._event.wait(), deadline - loop.time())
+            except asyncio.TimeoutError:
+                return False, None
+
+
+class ResultsHub:
+    def __init__(self, pubsub, max_updates_per_second=2.0):
+        self.pubsub = pubsub
+        self.flusher = BackgroundFlusher(
+            self.tick, 1.0 / max_updates_per_second, name='results-stream')
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._stats = Counter()
+
+    def subscribe(self, poll_id, loop=None):
+        """Register a subscriber, primed with the poll's current results."""
+        subscriber = Subscriber(poll_id, loop=loop)
+        with self._lock:
+            self._channels.setdefault(poll_id, set()).add(subscriber)
+        subscriber.push(results_snapshot(poll_id))
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            channel = self._channels.get(subscriber.poll_id)
+            if channel is not None:
+                channel.discard(subscriber)
+                if not channel:
+                    del self._channels[subscriber.poll_id]
+
+    def publish(self, poll_id):
+        self.pubsub.publish(poll_id)
+
+    def tick(self):
+        """Compute each changed, watched poll once and fan it out."""
+        with self._lock:
+            poll_ids = list(self._channels)
+        if not poll_ids:
+            return
+        for poll_id in self.pubsub.changed(poll_ids):
+            try:
+                payload = results_snapshot(poll_id)
+            except Poll.DoesNotExist:
+                payload = None
+            except SnapshotMissing:
+                # Archived and unreadable; subscribers keep the last results.
+                continue
+            self._stats['computations'] += 1
+            with self._lock:
+                subscribers = list(self._channels.get(poll_id, ()))
+            for subscriber in subscribers:
+                if subscriber.push(payload):
+                    self._stats['deliveries'] += 1
+
+    def stats(self):
+        with self._lock:
+            polls, subscribers = len(self._channels), sum(map(len, self._channels.values()))
+        return {
+            'polls': polls,
+            'subscribers': subscribers,
+            'computations': self._stats['computations'],
+            'deliveries': self._stats['deliveries'],
+        }
+
+    def start(self):
+        self.flusher.start()
+
+    def stop(self):
+        self.flusher.stop()
+
+
+def format_event(payload):
+    if payload is None:
+        return 'event: closed\ndata: {}\n\n'
+    return f"event: results\nid: {payload['version']}\ndata: {json.dumps(payload)}\n\n"
+
+
+HEARTBEAT_EVENT = ': keep-alive\n\n'
+
+
+def event_stream(hub, poll_id, heartbeat):
+    """Blocking SSE generator, for WSGI workers."""
+    subscriber = hub.subscribe(poll_id)
+    try:
+        while True:
+            delivered, payload = subscriber.get(heartbeat)
+            if not delivered:
+                yield HEARTBEAT_EVENT
+                continue
+            yield format_event(payload)
+            if payload is None:
+                return
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+async def aevent_stream(hub, poll_id, heartbeat):
+    """Async SSE generator; an idle stream costs no thread under ASGI."""
+    from asgiref.sync import sync_to_async
+    subscriber = await sync_to_async(hub.subscribe)(poll_id, loop=asyncio.get_running_loop())
+    try:
+        while True:
+            delivered, payload = await subscriber.aget(heartbeat)
+            if not delivered:
+                yield HEARTBEAT_EVENT
+                continue
+            yield format_event(payload)
+            if payload is None:
+                return
+    finally:
+        hub.unsubscribe(subscriber)
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_results_hub():
+    """Return the process-wide hub, starting its ticker on first use."""
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                options = stream_settings()
+                _hub = ResultsHub(
+                    import_string(options['BACKEND'])(),
+                    max_updates_per_second=options['MAX_UPDATES_PER_SECOND'],
+                )
+                if options['AUTOSTART']:
+                    _hub.start()
+    return _hub
+
+
+def reset_results_hub(**kwargs):
+    global _hub
+    with _hub_lock:
+        if _hub is not None:
+            _hub.stop()
+            _hub = None
+
+
+def _results_changed(poll_id, **kwargs):
+    if _hub is not None:
+        _hub.publish(poll_id)
+
+
+def _settings_changed(setting, **kwargs):
+    if setting == 'POLL_RESULTS_STREAM':
+        reset_results_hub()
+
+
+poll_results_changed.connect(_results_changed)
+setting_changed.connect(_settings_changed)
+atexit.register(reset_results_hub)
@@ -0,0 +1,42 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from polls.archive import archive_polls, archive_settings
+from polls.rollups import METRICS, rollup_metric
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the votes, ballots and views of polls closed for longer than "
+        "--older-than days out of the hot tables; their snapshots keep them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--older-than', type=float, metavar='DAYS',
+            help="Override POLL_ARCHIVE['OLDER_THAN_DAYS'] for this run.")
+        parser.add_argument(
+            '--batch-size', type=int,
+            help="Override POLL_ARCHIVE['BATCH_SIZE'] (rows deleted per transaction).")
+        parser.add_argument(
+            '--skip-rollup', action='store_true',
+            help="Do not run a rollup_analytics pass first; polls with rows it has not counted are skipped.")
+
+    def handle(self, *args, **options):
+        if not options['skip_rollup']:
+            for metric in sorted(METRICS):
+                rollup_metric(metric)
+        started = time.perf_counter()
+        days = options['older_than']
+        archived, skipped, moved = archive_polls(
+            timedelta(days=archive_settings()['OLDER_THAN_DAYS'] if days is None else days),
+            batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} poll(s) in {elapsed:.1f}s: {moved['votes']} vote(s), "
+            f"{moved['ballots']} ballot(s) and {moved['views']} view(s) moved out of the hot tables."))
+        if skipped:
+            self.stdout.write(self.style.WARNING(
+                f"{skipped} poll(s) skipped until rollup_analytics has counted all of their rows."))
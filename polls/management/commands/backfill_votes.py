@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from polls.counters import rebuild_vote_counts
+from polls.models import LegacyGuestVote, Vote, make_voter_key
+
+
+class Command(BaseCommand):
+    help = (
+        "Finish the move to unified vote storage after a rolling deploy: copy guest "
+        "votes that workers on the previous release wrote to the legacy guest table "
+        "and key Vote rows they inserted without a voter_key."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since-id', type=int, default=0,
+                            help="Only copy legacy guest votes with a greater id.")
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        touched = set()
+        keyed, removed = self.key_votes(batch_size, touched)
+        copied, last_id = self.copy_legacy_guest_votes(options['since_id'], batch_size, touched)
+        drift = rebuild_vote_counts(touched) if touched else []
+        self.stdout.write(
+            f"keyed={keyed} duplicates_removed={removed} legacy_rows_scanned={copied} "
+            f"counters_fixed={len(drift)}")
+        self.stdout.write(self.style.SUCCESS(f"Done; next run can use --since-id {last_id}."))
+
+    def key_votes(self, batch_size, touched):
+        keyed = removed = 0
+        while True:
+            with transaction.atomic():
+                votes = list(Vote.objects.select_for_update().filter(voter_key__isnull=True)
+                             .order_by('pk')[:batch_size])
+                if not votes:
+                    return keyed, removed
+                for vote in votes:
+                    vote.voter_key = make_voter_key(vote.user_id, vote.session_id, vote.ip_address)
+                    touched.add(vote.poll_id)
+                # A voter may already have a keyed vote (or two unkeyed ones):
+                # keep their newest row, drop the rest.
+                newest = {}
+                for vote in votes:
+                    newest[vote.poll_id, vote.voter_key] = vote
+                existing = {
+                    (poll_id, key): pk for pk, poll_id, key in Vote.objects.select_for_update().filter(
+                        poll_id__in={poll_id for poll_id, _ in newest},
+                        voter_key__in={key for _, key in newest},
+                    ).values_list('pk', 'poll_id', 'voter_key')
+                }
+                keep, drop = [], [vote.pk for vote in votes if newest[vote.poll_id, vote.voter_key] is not vote]
+                for key, vote in newest.items():
+                    if existing.get(key, 0) > vote.pk:
+                        drop.append(vote.pk)
+                        continue
+                    if key in existing:
+                        drop.append(existing[key])
+                    keep.append(vote)
+                Vote.objects.filter(pk__in=drop).delete()
+                Vote.objects.bulk_update(keep, ['voter_key'])
+                keyed += len(keep)
+                removed += len(drop)
+
+    def copy_legacy_guest_votes(self, since_id, batch_size, touched):
+        # Raw INSERT so created_at is copied rather than reset by auto_now_add.
+        # Guests who already have a vote in the Vote table keep that one.
+        insert = (
+            f"INSERT INTO {connection.ops.quote_name(Vote._meta.db_table)} "
+            "(poll_id, selected_option_id, session_id, ip_address, voter_key, created_at) "
+            "VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (poll_id, voter_key) DO NOTHING"
+        )
+        scanned, last_id = 0, since_id
+        while True:
+            rows = list(
+                LegacyGuestVote.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+                    'pk', 'poll_id', 'selected_option_id', 'session_id', 'ip_address', 'created_at'
+                )[:batch_size])
+            if not rows:
+                return scanned, last_id
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.executemany(insert, [
+                    (poll_id, option_id, session_id, connection.ops.adapt_ipaddressfield_value(ip_address),
+                     make_voter_key(None, session_id, ip_address),
+                     connection.ops.adapt_datetimefield_value(created_at))
+                    for _, poll_id, option_id, session_id, ip_address, created_at in rows
+                ])
+            touched.update(row[1] for row in rows)
+            scanned += len(rows)
+            last_id = rows[-1][0]
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from polls.counters import compact_counter_shards
+
+
+class Command(BaseCommand):
+    help = "Fold sharded vote counters back into Option.vote_count."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll', type=int, action='append', dest='polls',
+            help="Only compact this poll (may be given several times).")
+        parser.add_argument(
+            '--demote', action='store_true',
+            help="Also stop sharding the polls' counters; without it new votes keep using shards.")
+
+    def handle(self, *args, **options):
+        folded = compact_counter_shards(options['polls'], demote=options['demote'])
+        self.stdout.write(self.style.SUCCESS(f"{folded} counter shard(s) folded."))
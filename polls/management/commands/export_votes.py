@@ -0,0 +1,56 @@
+import resource
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from polls.exports import DEFAULT_CHUNK_SIZE, EXPORT_FORMATS, export_lines
+from polls.models import Poll
+from polls.snapshots import SnapshotMissing
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every vote on a poll to CSV or NDJSON. Reports rows/sec and "
+        "peak RSS on stderr, so it doubles as an export benchmark."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('poll_id', type=int)
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument(
+            '--output', '-o',
+            help="File to write to (defaults to stdout; use /dev/null to benchmark).")
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help="Rows fetched per server-side cursor round trip.")
+
+    def handle(self, *args, **options):
+        poll_id = options['poll_id']
+        archived_at = Poll.objects.filter(pk=poll_id).values_list('archived_at', flat=True)
+        if not archived_at:
+            raise CommandError(f"Poll {poll_id} does not exist.")
+
+        try:
+            lines = export_lines(poll_id, options['format'], chunk_size=options['chunk_size'],
+                                 archived=archived_at[0] is not None)
+        except SnapshotMissing as exc:
+            raise CommandError(str(exc))
+        output = open(options['output'], 'w', newline='') if options['output'] else sys.stdout
+        started = time.perf_counter()
+        rows = 0
+        try:
+            for line in lines:
+                output.write(line)
+                rows += 1
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = time.perf_counter() - started
+
+        if options['format'] == 'csv':
+            rows -= 1  # header
+        # ru_maxrss is reported in kilobytes on Linux.
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        self.stderr.write(
+            f"exported {rows} rows in {elapsed:.2f}s "
+            f"({rows / elapsed if elapsed else 0:.0f} rows/sec), peak RSS {peak_rss_mb:.1f} MB")
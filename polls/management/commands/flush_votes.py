@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from polls.ingestion import build_vote_buffer, ingestion_settings
+
+
+class Command(BaseCommand):
+    help = ("Drain the persisted vote ingestion queue (e.g. SQLiteVoteQueue) into the database "
+            "and report batch statistics.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            help="Override VOTE_INGESTION['BATCH_SIZE'] for this run.")
+
+    def handle(self, *args, **options):
+        settings = ingestion_settings()
+        if options['batch_size']:
+            settings['BATCH_SIZE'] = options['batch_size']
+        buffer = build_vote_buffer(settings)
+        written = buffer.flush()
+        stats = buffer.stats()
+        self.stdout.write(
+            f"batches={stats['flushes']} avg_batch_size={stats['avg_batch_size']:.1f} "
+            f"avg_flush_ms={stats['avg_flush_ms']} max_flush_ms={stats['max_flush_ms']}")
+        self.stdout.write(self.style.SUCCESS(f"Flushed {written} vote(s)."))
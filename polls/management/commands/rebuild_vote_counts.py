@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from polls.counters import rebuild_vote_counts
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized Option.vote_count counters from the Vote table."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll', type=int, action='append', dest='polls',
+            help="Only reconcile this poll (may be given several times).")
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report drifted counters without fixing them.")
+
+    def handle(self, *args, **options):
+        drift = rebuild_vote_counts(options['polls'], dry_run=options['dry_run'])
+        for option_id, stored, actual in drift:
+            self.stdout.write(f"option {option_id}: stored={stored} actual={actual}")
+        verb = "found" if options['dry_run'] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{len(drift)} drifted counter(s) {verb}."))
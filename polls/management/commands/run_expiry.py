@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from polls.expiry import ExpiryWorker, expiry_settings
+
+
+class Command(BaseCommand):
+    help = "Close polls whose expires_at has passed, in batches, every INTERVAL seconds."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Run a single pass (e.g. from cron) instead of looping.")
+        parser.add_argument(
+            '--batch-size', type=int,
+            help="Override POLL_EXPIRY['BATCH_SIZE'] for this run.")
+        parser.add_argument(
+            '--interval', type=float,
+            help="Override POLL_EXPIRY['INTERVAL'] (seconds between passes).")
+
+    def handle(self, *args, **options):
+        settings = expiry_settings()
+        worker = ExpiryWorker(
+            batch_size=options['batch_size'] or settings['BATCH_SIZE'],
+            interval=options['interval'] or settings['INTERVAL'])
+        try:
+            worker.run(ticks=1 if options['once'] else None)
+        except KeyboardInterrupt:
+            pass
+        stats = worker.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f"Closed {stats['closed']} poll(s) in {stats['ticks']} pass(es); max lag {stats['max_lag']}s; "
+            f"{stats['snapshots']} snapshot(s) written."))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from polls.models import Poll
+from polls.snapshots import snapshot_poll, take_snapshots
+
+
+class Command(BaseCommand):
+    help = "Write the columnar snapshots of closed polls (run_expiry also does this every pass)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll', type=int, action='append', dest='polls',
+            help="Snapshot this closed poll now, without waiting for SETTLE (may be given several times).")
+        parser.add_argument(
+            '--batch-size', type=int,
+            help="Override POLL_SNAPSHOTS['BATCH_SIZE'] for this run.")
+
+    def handle(self, *args, **options):
+        written = 0
+        if options['polls']:
+            closed = Poll.objects.filter(pk__in=options['polls'], is_active=False, archived_at__isnull=True)
+            for poll_id, closed_at in closed.values_list('pk', 'updated_at'):
+                written += snapshot_poll(poll_id, closed_at) is not None
+        else:
+            while taken := take_snapshots(batch_size=options['batch_size']):
+                written += taken
+        self.stdout.write(self.style.SUCCESS(f"{written} poll snapshot(s) written."))
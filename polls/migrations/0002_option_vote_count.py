@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:21
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def populate_vote_counts(apps, schema_editor):
+    Option = apps.get_model('polls', 'Option')
+    Vote = apps.get_model('polls', 'Vote')
+    GuestVote = apps.get_model('polls', 'GuestVote')
+
+    def tally(model):
+        counts = (model.objects.filter(selected_option=OuterRef('pk'))
+                  .order_by().values('selected_option')
+                  .annotate(n=Count('pk')).values('n'))
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    Option.objects.update(vote_count=tally(Vote) + tally(GuestVote))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='option',
+            name='vote_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_vote_counts, migrations.RunPython.noop),
+    ]
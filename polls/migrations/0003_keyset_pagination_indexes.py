@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0002_option_vote_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guestvote',
+            index=models.Index(fields=['created_at', 'id'], name='polls_guestvote_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(fields=['created_at', 'id'], name='polls_poll_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pollview',
+            index=models.Index(fields=['viewed_at', 'id'], name='polls_pollview_viewed_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['created_at', 'id'], name='polls_vote_created_id_idx'),
+        ),
+    ]
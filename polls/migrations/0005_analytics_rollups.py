@@ -0,0 +1,60 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0004_pollview_viewed_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=16, unique=True)),
+                ('last_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnalyticsRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                (
+                    'metric',
+                    models.CharField(
+                        choices=[
+                            ('views', 'Poll views'),
+                            ('votes', 'Votes by authenticated users'),
+                            ('guest_votes', 'Guest votes'),
+                        ],
+                        max_length=16,
+                    ),
+                ),
+                (
+                    'granularity',
+                    models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=8),
+                ),
+                ('bucket_start', models.DateTimeField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                (
+                    'poll',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='rollups',
+                        to='polls.poll',
+                    ),
+                ),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(
+                    fields=('poll', 'metric', 'granularity', 'bucket_start'),
+                    name='polls_rollup_bucket_uniq',
+                )],
+            },
+        ),
+    ]
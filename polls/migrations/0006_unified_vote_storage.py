@@ -0,0 +1,170 @@
+"""
+Move guest votes into the Vote table, keyed by a single (poll, voter_key)
+unique constraint.
+
+The old guest table is only renamed in Django's state (LegacyGuestVote,
+still ``polls_guestvote``), so workers running the previous release keep
+working while the new one rolls out; `manage.py backfill_votes` copies
+anything they write in the meantime. The migration is not atomic, so
+existing votes are keyed and guest votes copied in short batches, and the
+(poll, voter_key) unique index is built CONCURRENTLY on Postgres before the
+old constraints are dropped; polls_vote is never locked for the backfill.
+"""
+import hashlib
+
+from django.db import migrations, models, transaction
+from django.db.models.functions import Coalesce
+
+BATCH_SIZE = 2000
+VOTER_CONSTRAINT = models.UniqueConstraint(fields=('poll', 'voter_key'), name='polls_vote_poll_voter_uniq')
+
+
+def voter_key(pk, user_id, session_id, ip_address):
+    # Same scheme as polls.models.make_voter_key. Keyless legacy rows (no
+    # user and no session/IP, never written by the API) keep a unique key.
+    if user_id:
+        return f'u:{user_id}'
+    if not (session_id and ip_address):
+        return f'r:{pk}'
+    digest = hashlib.blake2b(f'{session_id}|{ip_address}'.encode(), digest_size=16)
+    return f'g:{digest.hexdigest()}'
+
+
+def key_votes(apps, schema_editor):
+    Vote = apps.get_model('polls', 'Vote')
+    alias = schema_editor.connection.alias
+
+    last_id = 0
+    while True:
+        with transaction.atomic(using=alias):
+            votes = list(Vote.objects.filter(pk__gt=last_id, voter_key__isnull=True).order_by('pk')
+                         .only('pk', 'user_id', 'session_id', 'ip_address')[:BATCH_SIZE])
+            if not votes:
+                break
+            for vote in votes:
+                vote.voter_key = voter_key(vote.pk, vote.user_id, vote.session_id, vote.ip_address)
+            Vote.objects.bulk_update(votes, ['voter_key'])
+        last_id = votes[-1].pk
+
+
+def add_voter_constraint(apps, schema_editor):
+    Vote = apps.get_model('polls', 'Vote')
+    table = schema_editor.quote_name(Vote._meta.db_table)
+    name = schema_editor.quote_name(VOTER_CONSTRAINT.name)
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.execute(f"CREATE UNIQUE INDEX {name} ON {table} (poll_id, voter_key)")
+        return
+    # Built without blocking writes, then attached as the constraint, which
+    # only takes a brief lock.
+    schema_editor.execute(
+        f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} (poll_id, voter_key)")
+    schema_editor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} UNIQUE USING INDEX {name}")
+
+
+def remove_voter_constraint(apps, schema_editor):
+    Vote = apps.get_model('polls', 'Vote')
+    name = schema_editor.quote_name(VOTER_CONSTRAINT.name)
+    if schema_editor.connection.vendor != 'postgresql':
+        schema_editor.execute(f"DROP INDEX {name}")
+    else:
+        schema_editor.execute(f"ALTER TABLE {schema_editor.quote_name(Vote._meta.db_table)} DROP CONSTRAINT {name}")
+
+
+def copy_guest_votes(apps, schema_editor):
+    Vote = apps.get_model('polls', 'Vote')
+    LegacyGuestVote = apps.get_model('polls', 'LegacyGuestVote')
+    Option = apps.get_model('polls', 'Option')
+    AnalyticsRollup = apps.get_model('polls', 'AnalyticsRollup')
+    RollupWatermark = apps.get_model('polls', 'RollupWatermark')
+    connection = schema_editor.connection
+    quote = schema_editor.quote_name
+
+    # Raw INSERT so created_at is copied rather than reset by auto_now_add.
+    insert = (
+        f"INSERT INTO {quote(Vote._meta.db_table)} "
+        "(poll_id, selected_option_id, session_id, ip_address, voter_key, created_at) "
+        "VALUES (%s, %s, %s, %s, %s, %s) ON CONFLICT (poll_id, voter_key) DO NOTHING"
+    )
+    last_id = 0
+    while True:
+        rows = list(
+            LegacyGuestVote.objects.filter(pk__gt=last_id).order_by('pk').values_list(
+                'pk', 'poll_id', 'selected_option_id', 'session_id', 'ip_address', 'created_at'
+            )[:BATCH_SIZE])
+        if not rows:
+            break
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.executemany(insert, [
+                (poll_id, option_id, session_id, connection.ops.adapt_ipaddressfield_value(ip_address),
+                 voter_key(pk, None, session_id, ip_address),
+                 connection.ops.adapt_datetimefield_value(created_at))
+                for pk, poll_id, option_id, session_id, ip_address, created_at in rows
+            ])
+        last_id = rows[-1][0]
+
+    # Guests present in both tables were merged, so recount every option.
+    tally = (Vote.objects.filter(selected_option=models.OuterRef('pk')).order_by()
+             .values('selected_option').annotate(n=models.Count('pk')).values('n'))
+    Option.objects.update(vote_count=Coalesce(models.Subquery(tally), 0))
+
+    # Guest vote ids changed; recount vote rollups on the next pass.
+    AnalyticsRollup.objects.filter(metric__in=['votes', 'guest_votes']).delete()
+    RollupWatermark.objects.filter(metric__in=['votes', 'guest_votes']).delete()
+
+
+class Migration(migrations.Migration):
+    # Not one transaction: the backfill commits batch by batch and, on
+    # Postgres, the unique index is built CONCURRENTLY, so polls_vote stays
+    # writable while existing rows are keyed and guest votes are copied.
+    atomic = False
+
+    dependencies = [
+        ('polls', '0005_analytics_rollups'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.RenameModel('GuestVote', 'LegacyGuestVote'),
+                migrations.AlterModelTable('LegacyGuestVote', 'polls_guestvote'),
+            ],
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='voter_key',
+            field=models.CharField(editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(key_votes, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(add_voter_constraint, remove_voter_constraint),
+            ],
+            state_operations=[
+                migrations.AddConstraint(model_name='vote', constraint=VOTER_CONSTRAINT),
+            ],
+        ),
+        migrations.RunPython(copy_guest_votes, migrations.RunPython.noop),
+        # The old unique and indexes only go once the new constraint holds.
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together=set(),
+        ),
+        migrations.RemoveIndex(
+            model_name='vote',
+            name='polls_vote_poll_id_cfe401_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='vote',
+            name='polls_vote_session_5f3e2d_idx',
+        ),
+        migrations.CreateModel(
+            name='GuestVote',
+            fields=[],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('polls.vote',),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_unified_vote_storage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                (
+                    'metric',
+                    models.CharField(
+                        choices=[('viewers', 'Unique viewers'), ('voters', 'Unique voters (users and guests)')],
+                        max_length=16,
+                    ),
+                ),
+                (
+                    'granularity',
+                    models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour'), ('day', 'Day')], max_length=8),
+                ),
+                ('bucket_start', models.DateTimeField()),
+                ('sketch', models.BinaryField()),
+                (
+                    'poll',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='sketches',
+                        to='polls.poll',
+                    ),
+                ),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(
+                    fields=('poll', 'metric', 'granularity', 'bucket_start'),
+                    name='polls_sketch_bucket_uniq',
+                )],
+            },
+        ),
+    ]
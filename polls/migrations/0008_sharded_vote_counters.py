@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0007_analytics_sketches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='counter_shards',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='OptionCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                (
+                    'option',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='counter_shards',
+                        to='polls.option',
+                    ),
+                ),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('option', 'shard'), name='polls_counter_shard_uniq')],
+            },
+        ),
+    ]
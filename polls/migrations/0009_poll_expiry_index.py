@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0008_sharded_vote_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(
+                condition=models.Q(('is_active', True)),
+                fields=['expires_at'],
+                name='polls_poll_expiry_idx',
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+# Full-text search indexes for polls.search. Postgres only, so they live
+# outside the model state; the expressions must match polls.search exactly.
+SEARCH_INDEXES = (
+    ('Poll', 'question', 'polls_poll_question_fts_idx'),
+    ('Option', 'option_text', 'polls_option_text_fts_idx'),
+)
+SEARCH_CONFIG = 'english'
+
+
+def search_indexes(apps):
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    for model_name, field, name in SEARCH_INDEXES:
+        yield apps.get_model('polls', model_name), GinIndex(SearchVector(field, config=SEARCH_CONFIG), name=name)
+
+
+def add_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for model, index in search_indexes(apps):
+            schema_editor.add_index(model, index)
+
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for model, index in search_indexes(apps):
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0009_poll_expiry_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(fields=['is_active', 'created_at', 'id'], name='polls_poll_active_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(fields=['created_by', 'created_at', 'id'], name='polls_poll_creator_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(fields=['expires_at', 'id'], name='polls_poll_expires_id_idx'),
+        ),
+        migrations.RunPython(add_search_indexes, remove_search_indexes),
+    ]
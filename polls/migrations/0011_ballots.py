@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-18 05:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0010_poll_list_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='voting_method',
+            field=models.CharField(
+                choices=[
+                    ('plurality', 'Single choice'),
+                    ('approval', 'Approval (any number of options)'),
+                    ('ranked', 'Ranked choice'),
+                    ('weighted', 'Weighted points'),
+                ],
+                default='plurality',
+                max_length=16,
+            ),
+        ),
+        migrations.CreateModel(
+            name='Ballot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('ip_address', models.GenericIPAddressField(blank=True, null=True)),
+                ('voter_key', models.CharField(editable=False, max_length=64)),
+                ('choices', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                (
+                    'poll',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='ballots',
+                        to='polls.poll',
+                    ),
+                ),
+                (
+                    'user',
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(
+                    fields=('poll', 'voter_key'),
+                    name='polls_ballot_poll_voter_uniq',
+                )],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0011_ballots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='snapshot_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(
+                condition=models.Q(('is_active', False), ('snapshot_at__isnull', True)),
+                fields=['updated_at'],
+                name='polls_poll_snapshot_due_idx',
+            ),
+        ),
+    ]
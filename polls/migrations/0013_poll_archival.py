@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0012_poll_snapshots'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='poll',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='poll',
+            index=models.Index(
+                condition=models.Q(('archived_at__isnull', True), ('is_active', False), ('snapshot_at__isnull', False)),
+                fields=['updated_at'],
+                name='polls_poll_archive_due_idx',
+            ),
+        ),
+    ]
@@ -1,28 +1,80 @@
+import hashlib
+
 from django.db import models
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
 
 class Poll(models.Model):
+    VOTING_METHOD_CHOICES = [
+        ('plurality', 'Single choice'),
+        ('approval', 'Approval (any number of options)'),
+        ('ranked', 'Ranked choice'),
+        ('weighted', 'Weighted points'),
+    ]
+
     question = models.CharField(max_length=255)
     expires_at = models.DateTimeField(null=True, blank=True)
     allow_multiple_votes = models.BooleanField(default=False)
+    # Non-plurality polls collect a Ballot per voter instead of a Vote.
+    voting_method = models.CharField(max_length=16, choices=VOTING_METHOD_CHOICES, default='plurality')
     is_active = models.BooleanField(default=True)
+    # Number of OptionCounterShard rows per option that votes are spread
+    # over; 0 keeps the tally on Option.vote_count (see polls.counters).
+    counter_shards = models.PositiveSmallIntegerField(default=0, editable=False)
+    # When the closed poll's columnar snapshot was written (see polls.snapshots);
+    # cleared when the poll is reopened.
+    snapshot_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # When the poll's votes, ballots and views were moved out of the hot
+    # tables into its snapshot (see polls.archive); archived polls stay closed.
+    archived_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_by = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='created_polls')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination: (created_at, id) range scans
+            models.Index(fields=['created_at', 'id'], name='polls_poll_created_id_idx'),
+            # List filters (polls/api/filters.py), each followed by the keyset ordering
+            models.Index(fields=['is_active', 'created_at', 'id'], name='polls_poll_active_created_idx'),
+            models.Index(fields=['created_by', 'created_at', 'id'], name='polls_poll_creator_created_idx'),
+            models.Index(fields=['expires_at', 'id'], name='polls_poll_expires_id_idx'),
+            # Expiry queue for polls/expiry.py: only polls still waiting to close
+            models.Index(fields=['expires_at'], condition=models.Q(is_active=True),
+                         name='polls_poll_expiry_idx'),
+            # Snapshot queue for polls/snapshots.py: closed polls without one yet
+            models.Index(fields=['updated_at'], condition=models.Q(is_active=False, snapshot_at__isnull=True),
+                         name='polls_poll_snapshot_due_idx'),
+            # Archive candidates for polls/archive.py: snapshotted closed polls not yet archived
+            models.Index(fields=['updated_at'],
+                         condition=models.Q(is_active=False, archived_at__isnull=True, snapshot_at__isnull=False),
+                         name='polls_poll_archive_due_idx'),
+        ]
+
     def __str__(self):
         from django.utils.html import escape
         return escape(self.question)
 
+    @property
+    def ballot_method(self):
+        """The voting method in force; allow_multiple_votes makes a single-choice poll approval voting."""
+        if self.voting_method == 'plurality' and self.allow_multiple_votes:
+            return 'approval'
+        return self.voting_method
+
 
 class Option(models.Model):
     poll = models.ForeignKey(
         Poll, on_delete=models.CASCADE, related_name='options')
     option_text = models.CharField(max_length=255)
+    # Denormalized tally of Vote rows pointing at this option,
+    # maintained on write by polls.counters and rebuilt by
+    # `manage.py rebuild_vote_counts`.
+    vote_count = models.IntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -30,35 +82,118 @@ class Option(models.Model):
         return escape(self.option_text)
 
 
+class OptionCounterShard(models.Model):
+    """
+    One slice of a hot option's tally. The option's total is its
+    vote_count plus the count of all of its shards; shards may go negative.
+    """
+    option = models.ForeignKey(Option, on_delete=models.CASCADE, related_name='counter_shards')
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['option', 'shard'], name='polls_counter_shard_uniq'),
+        ]
+
+
+def make_voter_key(user_id=None, session_id=None, ip_address=None):
+    """
+    Identify a voter within a poll: ``u:<user id>`` for authenticated users,
+    ``g:<hash of session and IP>`` for guests. Fits in 34 characters.
+    """
+    if user_id:
+        return f'u:{user_id}'
+    digest = hashlib.blake2b(f'{session_id}|{ip_address}'.encode(), digest_size=16)
+    return f'g:{digest.hexdigest()}'
+
+
 class Vote(models.Model):
+    """
+    Every vote, authenticated or guest, one row per (poll, voter_key).
+    ``GuestVote`` is a proxy over the guest rows.
+    """
     poll = models.ForeignKey(Poll, on_delete=models.CASCADE)
     selected_option = models.ForeignKey(Option, on_delete=models.CASCADE)
     user = models.ForeignKey(
         User, on_delete=models.CASCADE, null=True, blank=True)
     session_id = models.CharField(max_length=255, null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
+    # Set by save() and every bulk writer. Nullable only so that workers
+    # still running the pre-unification code can insert during a rollout;
+    # `manage.py backfill_votes` fills those rows in afterwards.
+    voter_key = models.CharField(max_length=64, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        unique_together = (
-            ('poll', 'user'),  # One vote per user per poll
-            ('poll', 'session_id', 'ip_address'),  # One vote per guest per poll
-        )
+        constraints = [
+            models.UniqueConstraint(fields=['poll', 'voter_key'], name='polls_vote_poll_voter_uniq'),
+        ]
         indexes = [
-            models.Index(fields=['poll', 'user']),
             models.Index(fields=['poll', 'selected_option']),
-            models.Index(fields=['session_id', 'ip_address']),
+            models.Index(fields=['created_at', 'id'], name='polls_vote_created_id_idx'),
         ]
 
+    def save(self, *args, **kwargs):
+        self.voter_key = make_voter_key(self.user_id, self.session_id, self.ip_address)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         from django.utils.html import escape
         if self.user:
             return f"{escape(str(self.user))} voted {escape(str(self.selected_option))} on {escape(str(self.poll))}"
-        return f"Guest {escape(str(self.ip_address or self.session_id))} voted {escape(str(self.selected_option))} on {escape(str(self.poll))}"
+        return (f"Guest {escape(str(self.ip_address or self.session_id))} voted "
+                f"{escape(str(self.selected_option))} on {escape(str(self.poll))}")
+
+
+class Ballot(models.Model):
+    """
+    A voter's whole ballot on an approval, ranked or weighted poll, one row
+    per (poll, voter_key). ``choices`` packs the chosen option ids as
+    little-endian uint32, in preference order on ranked polls and each
+    followed by its weight on weighted polls (see polls.tallying).
+    """
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='ballots')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    session_id = models.CharField(max_length=255, null=True, blank=True)
+    ip_address = models.GenericIPAddressField(null=True, blank=True)
+    voter_key = models.CharField(max_length=64, editable=False)
+    choices = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['poll', 'voter_key'], name='polls_ballot_poll_voter_uniq'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.voter_key = make_voter_key(self.user_id, self.session_id, self.ip_address)
+        super().save(*args, **kwargs)
+
 
+class GuestVoteManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(user__isnull=True)
 
-# Optionally, if you want a separate GuestVote model (as in docs):
-class GuestVote(models.Model):
+
+class GuestVote(Vote):
+    """Guest (session + IP) votes, stored in the Vote table."""
+    objects = GuestVoteManager()
+
+    class Meta:
+        proxy = True
+
+    def save(self, *args, **kwargs):
+        self.user = None
+        super().save(*args, **kwargs)
+
+
+class LegacyGuestVote(models.Model):
+    """
+    The former separate guest vote table, kept read-only until every worker
+    writes to Vote. Its rows were copied into Vote by migration 0006.
+    """
     poll = models.ForeignKey(Poll, on_delete=models.CASCADE)
     selected_option = models.ForeignKey(Option, on_delete=models.CASCADE)
     ip_address = models.GenericIPAddressField()
@@ -66,7 +201,11 @@ class GuestVote(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
+        db_table = 'polls_guestvote'
         unique_together = (('poll', 'ip_address', 'session_id'),)
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='polls_guestvote_created_id_idx'),
+        ]
 
 
 class PollView(models.Model):
@@ -75,4 +214,72 @@ class PollView(models.Model):
         User, on_delete=models.SET_NULL, null=True, blank=True)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     session_id = models.CharField(max_length=255, null=True, blank=True)
-    viewed_at = models.DateTimeField(auto_now_add=True)
+    # Set when the view happens, not when the tracking buffer is flushed.
+    viewed_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['viewed_at', 'id'], name='polls_pollview_viewed_id_idx'),
+        ]
+
+
+class AnalyticsRollup(models.Model):
+    """
+    Per-poll event counts in fixed time buckets, maintained incrementally by
+    `manage.py rollup_analytics` so time series never scan the raw tables.
+    """
+    METRIC_CHOICES = [
+        ('views', 'Poll views'),
+        ('votes', 'Votes by authenticated users'),
+        ('guest_votes', 'Guest votes'),
+    ]
+    GRANULARITY_CHOICES = [
+        ('minute', 'Minute'),
+        ('hour', 'Hour'),
+        ('day', 'Day'),
+    ]
+
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='rollups')
+    metric = models.CharField(max_length=16, choices=METRIC_CHOICES)
+    granularity = models.CharField(max_length=8, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['poll', 'metric', 'granularity', 'bucket_start'],
+                name='polls_rollup_bucket_uniq'),
+        ]
+
+
+class AnalyticsSketch(models.Model):
+    """
+    HyperLogLog sketch of the distinct viewers or voters of a poll in one
+    time bucket (see polls.sketches), maintained by `manage.py rollup_analytics`.
+    """
+    METRIC_CHOICES = [
+        ('viewers', 'Unique viewers'),
+        ('voters', 'Unique voters (users and guests)'),
+    ]
+
+    poll = models.ForeignKey(Poll, on_delete=models.CASCADE, related_name='sketches')
+    metric = models.CharField(max_length=16, choices=METRIC_CHOICES)
+    granularity = models.CharField(max_length=8, choices=AnalyticsRollup.GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    # Precision byte followed by the zlib-compressed registers.
+    sketch = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['poll', 'metric', 'granularity', 'bucket_start'],
+                name='polls_sketch_bucket_uniq'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """Highest source row id already folded into AnalyticsRollup or AnalyticsSketch, per metric."""
+    metric = models.CharField(max_length=16, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,200 @@
+"""
+Read replica routing.
+
+``ReplicaRouter`` sends every write, and by default every read, to the
+``default`` (primary) database. Read-only endpoints - the poll list and
+detail, results, analytics and the vote export - run their queries inside
+``replica_reads(request)``, which sends reads of this app's models to one
+of the ``ALIASES`` replicas instead. Auth, sessions and anything else
+outside the app always read from the primary, and so does every query
+inside a transaction on it.
+
+A replica is only used while it is healthy: its lag (seconds behind the
+primary on Postgres) is measured at most every ``LAG_CHECK_INTERVAL``
+seconds per process, and a replica more than ``MAX_LAG`` behind, or one
+that cannot be reached, is skipped until the next check. With no healthy
+replica, reads fall back to the primary.
+
+Reads that must see a recent write stay on the primary for
+``PIN_SECONDS`` (keep it above ``MAX_LAG``):
+
+* a client that made a write request (POST, PUT, PATCH, DELETE) gets a
+  short-lived cookie from ``ReplicaPinningMiddleware``, so it reads its
+  own writes, e.g. the results right after its vote;
+* a poll whose results changed (``poll_results_changed``) is marked in the
+  cache, so its results are recomputed on the primary. Results cached per
+  poll version (see ``polls.results_cache``) are therefore never computed
+  from a replica that may not have that version's votes yet.
+"""
+import math
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils.deprecation import MiddlewareMixin
+
+from polls.results_cache import poll_results_changed
+
+DEFAULTS = {
+    'ALIASES': [],
+    'MAX_LAG': 2.0,
+    'LAG_CHECK_INTERVAL': 5.0,
+    'PIN_SECONDS': 5.0,
+    # Atomic blocks already open around every request that do not make it a
+    # transaction: none in production, the class and test blocks TestCase
+    # opens in the test suite.
+    'OUTER_ATOMIC_BLOCKS': 0,
+}
+
+PIN_COOKIE = 'db_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# Zero when the replica has replayed everything it received, so an idle
+# primary does not look like lag.
+LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+# The replica this context reads from, if any.
+_replica = ContextVar('polls_read_replica', default=None)
+# {alias: (checked at (monotonic), lag in seconds or None if unreachable)}
+_health = {}
+
+
+def replica_settings():
+    return {**DEFAULTS, **getattr(settings, 'POLL_READ_REPLICAS', {})}
+
+
+def replica_lag(alias):
+    """Seconds the replica is behind the primary, or None if it cannot be reached."""
+    connection = connections[alias]
+    try:
+        if connection.vendor != 'postgresql':
+            connection.ensure_connection()
+            return 0.0
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_SQL)
+            return float(cursor.fetchone()[0])
+    except DatabaseError:
+        connection.close()
+        return None
+
+
+def healthy_replicas():
+    """The configured replicas that are reachable and within ``MAX_LAG``."""
+    config = replica_settings()
+    now = time.monotonic()
+    healthy = []
+    for alias in config['ALIASES']:
+        checked = _health.get(alias)
+        if checked is None or now - checked[0] >= config['LAG_CHECK_INTERVAL']:
+            checked = _health[alias] = (now, replica_lag(alias))
+        if checked[1] is not None and checked[1] <= config['MAX_LAG']:
+            healthy.append(alias)
+    return healthy
+
+
+def reset_replica_health():
+    _health.clear()
+
+
+def _written_key(poll_id):
+    return f'polls:replicas:written:{poll_id}'
+
+
+def read_replica(request=None, poll_id=None):
+    """
+    The replica to read from for this request (and poll), or None to read
+    from the primary.
+    """
+    if not replica_settings()['ALIASES']:
+        return None
+    if request is not None and request.COOKIES.get(PIN_COOKIE):
+        return None
+    if poll_id is not None and cache.get(_written_key(poll_id)):
+        return None
+    healthy = healthy_replicas()
+    return random.choice(healthy) if healthy else None
+
+
+@contextmanager
+def reading_from(alias):
+    """Send this app's reads in the block to ``alias`` (None: the primary)."""
+    token = _replica.set(alias)
+    try:
+        yield alias
+    finally:
+        _replica.reset(token)
+
+
+def replica_reads(request=None, poll_id=None):
+    """``reading_from(read_replica(request, poll_id))``."""
+    return reading_from(read_replica(request, poll_id))
+
+
+def _in_transaction():
+    connection = connections[DEFAULT_DB_ALIAS]
+    return connection.in_atomic_block and (
+        len(connection.atomic_blocks) > replica_settings()['OUTER_ATOMIC_BLOCKS'])
+
+
+class ReplicaRouter:
+    """See the module docstring; listed in ``DATABASE_ROUTERS``."""
+
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is None or model._meta.app_label != 'polls' or _in_transaction():
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """Pin a client to the primary for ``PIN_SECONDS`` after each of its write requests."""
+
+    def process_response(self, request, response):
+        config = replica_settings()
+        if config['ALIASES'] and request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=math.ceil(config['PIN_SECONDS']),
+                                httponly=True, samesite='Lax')
+        return response
+
+
+def _results_changed(sender, poll_id, **kwargs):
+    config = replica_settings()
+    if config['ALIASES']:
+        cache.set(_written_key(poll_id), 1, math.ceil(config['PIN_SECONDS']))
+
+
+def replica_metrics():
+    """Exposition lines for ``/metrics/``."""
+    name = 'polls_replica_lag_seconds'
+    lines = [f'# HELP {name} Seconds each read replica was behind the primary when last checked (NaN: unreachable).',
+             f'# TYPE {name} gauge']
+    for alias, (_, lag) in sorted(_health.items()):
+        lines.append(f'{name}{{alias="{alias}"}} {"NaN" if lag is None else f"{lag:.3f}"}')
+    return lines
+
+
+def _settings_changed(setting, **kwargs):
+    if setting == 'POLL_READ_REPLICAS':
+        reset_replica_health()
+
+
+poll_results_changed.connect(_results_changed)
+setting_changed.connect(_settings_changed)
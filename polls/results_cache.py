@@ -0,0 +1,172 @@
+"""
+Version-stamped cache for poll results.
+
+Each poll has a version counter in the cache. Cached results are keyed by
+``(poll id, version)``, so invalidating a poll is a single ``incr`` and stale
+entries simply age out. Writers that change a poll's outcome call
+``bump_poll_version`` once their transaction commits.
+
+Deleting a poll bumps its version too, so a results payload cached under
+the current version also shows that the poll still exists.
+
+Version counters are seeded from the clock rather than starting at 1, so a
+counter that has been evicted never comes back with a number that an old
+cached payload or client ETag already uses.
+"""
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import Signal
+
+DEFAULTS = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCK_TIMEOUT': 10,
+    'LOCK_WAIT': 2.0,
+}
+
+# Sent after a poll's version is bumped, i.e. whenever its results may have
+# changed. Arguments: poll_id, version.
+poll_results_changed = Signal()
+
+# Striped locks give single-flight recomputation within a process; the
+# cache-level lock below extends that across processes.
+_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'POLL_RESULTS_CACHE', {})}
+
+
+def _cache():
+    return caches[cache_settings()['ALIAS']]
+
+
+def _version_key(poll_id):
+    return f'polls:results:version:{poll_id}'
+
+
+def _results_key(poll_id, version, variant=''):
+    return f'polls:results:{poll_id}:{version}{variant}'
+
+
+def _seed():
+    return time.time_ns() // 1000
+
+
+def get_poll_version(poll_id):
+    cache = _cache()
+    key = _version_key(poll_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _seed(), None)
+        version = cache.get(key)
+    return version
+
+
+def get_poll_versions(poll_ids):
+    """Return ``{poll_id: version}`` for the polls that have a version counter."""
+    keys = {_version_key(poll_id): poll_id for poll_id in poll_ids}
+    return {keys[key]: version for key, version in _cache().get_many(keys).items()}
+
+
+def bump_poll_version(poll_id):
+    cache = _cache()
+    key = _version_key(poll_id)
+    try:
+        version = cache.incr(key)
+    except ValueError:
+        # No counter yet: nothing can be cached under it either.
+        cache.add(key, _seed(), None)
+        version = cache.get(key)
+    poll_results_changed.send(sender=None, poll_id=poll_id, version=version)
+    return version
+
+
+def bump_poll_versions(poll_ids):
+    for poll_id in set(poll_ids):
+        bump_poll_version(poll_id)
+
+
+def bump_poll_version_on_commit(*poll_ids):
+    """Invalidate the given polls' results once the current transaction commits."""
+    transaction.on_commit(lambda: bump_poll_versions(poll_ids))
+
+
+def results_etag(poll_id, version, variant=''):
+    return f'"poll-{poll_id}-{version}{variant}"'
+
+
+def has_cached_results(poll_id, version, variant=''):
+    return _cache().has_key(_results_key(poll_id, version, variant))
+
+
+def get_cached_results(poll_id, version, compute, variant=''):
+    """
+    Return the cached results payload for this poll version, calling
+    ``compute()`` at most once across concurrent misses.
+    """
+    options = cache_settings()
+    cache = _cache()
+    key = _results_key(poll_id, version, variant)
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    with _LOCKS[hash(key) % len(_LOCKS)]:
+        payload = cache.get(key)
+        if payload is not None:
+            return payload
+        lock_key = f'{key}:lock'
+        if cache.add(lock_key, 1, options['LOCK_TIMEOUT']):
+            try:
+                payload = compute()
+                cache.set(key, payload, options['TIMEOUT'])
+            finally:
+                cache.delete(lock_key)
+            return payload
+
+        # Another process is recomputing; wait for its result before
+        # falling back to computing it ourselves.
+        deadline = time.monotonic() + options['LOCK_WAIT']
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            payload = cache.get(key)
+            if payload is not None:
+                return payload
+        return compute()
+
+
+async def aget_poll_version(poll_id):
+    version = await _cache().aget(_version_key(poll_id))
+    if version is None:
+        version = await sync_to_async(get_poll_version)(poll_id)
+    return version
+
+
+async def ahas_cached_results(poll_id, version, variant=''):
+    return await _cache().ahas_key(_results_key(poll_id, version, variant))
+
+
+async def aget_cached_results(poll_id, version, compute, variant=''):
+    """
+    Async counterpart of ``get_cached_results``. A hit costs one async cache
+    read; a miss runs the sync single-flight path, and ``compute`` with it,
+    through ``sync_to_async``.
+    """
+    payload = await _cache().aget(_results_key(poll_id, version, variant))
+    if payload is None:
+        payload = await sync_to_async(get_cached_results)(poll_id, version, compute, variant)
+    return payload
+
+
+def _poll_deleted(sender, instance, **kwargs):
+    bump_poll_version_on_commit(instance.pk)
+
+
+post_delete.connect(_poll_deleted, sender='polls.Poll')
@@ -0,0 +1,249 @@
+"""
+Incremental time-bucketed rollups of views and votes.
+
+Each metric keeps a watermark: the highest source row id already counted.
+A rollup pass aggregates only rows above the watermark (one GROUP BY per
+batch at minute resolution; hour and day buckets are derived from the
+minute buckets in Python), merges the counts into AnalyticsRollup and
+advances the watermark in the same transaction, so passes can be
+interrupted and re-run safely.
+
+Rows are counted once, when they are inserted: a vote whose option changes
+later is not recounted, and deleting raw rows does not shrink the rollups.
+
+The ``viewers`` and ``voters`` metrics use the same watermarks to fold each
+row's viewer/voter identity into per-poll hourly and daily HyperLogLog
+sketches (AnalyticsSketch), from which distinct counts over any window and
+set of polls are estimated without COUNT(DISTINCT ...) over the raw tables.
+
+Ballots on approval, ranked and weighted polls count as votes (one per
+ballot) and their voters as voters. They live in their own table, so each
+vote metric folds them in from ``BALLOT_SOURCES`` under a watermark of
+their own.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.db.models.functions import TruncMinute
+from django.utils import timezone
+
+from polls.models import (
+    AnalyticsRollup, AnalyticsSketch, Ballot, PollView, RollupWatermark, Vote, make_voter_key)
+from polls.sketches import HyperLogLog, merge_all, precision_for_error
+
+# metric -> (queryset, timestamp field)
+SOURCES = {
+    'views': (PollView.objects.all(), 'viewed_at'),
+    'votes': (Vote.objects.filter(user__isnull=False), 'created_at'),
+    'guest_votes': (Vote.objects.filter(user__isnull=True), 'created_at'),
+}
+# metric -> (queryset, timestamp field); identities are voter keys.
+SKETCH_SOURCES = {
+    'viewers': (PollView.objects.all(), 'viewed_at'),
+    'voters': (Vote.objects.all(), 'created_at'),
+}
+# watermark -> (metric, queryset, timestamp field)
+BALLOT_SOURCES = {
+    'ballots': ('votes', Ballot.objects.filter(user__isnull=False), 'created_at'),
+    'guest_ballots': ('guest_votes', Ballot.objects.filter(user__isnull=True), 'created_at'),
+    'ballot_voters': ('voters', Ballot.objects.all(), 'created_at'),
+}
+METRICS = (*SOURCES, *SKETCH_SOURCES)
+GRANULARITIES = ('minute', 'hour', 'day')
+# Minute sketches would cost more to store than they are worth.
+SKETCH_GRANULARITIES = ('hour', 'day')
+# Largest number of buckets a single time-series request may span.
+MAX_BUCKETS = 1500
+BUCKET_WIDTH = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+
+def truncate(moment, granularity):
+    if granularity == 'minute':
+        return moment.replace(second=0, microsecond=0)
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _merge(metric, counts):
+    """Add ``{(poll_id, granularity, bucket_start): n}`` to the stored rollups."""
+    if not counts:
+        return
+    existing = {
+        (row.poll_id, row.granularity, row.bucket_start): row
+        for row in AnalyticsRollup.objects.select_for_update().filter(
+            metric=metric,
+            poll_id__in={poll_id for poll_id, _, _ in counts},
+            bucket_start__in={bucket for _, _, bucket in counts},
+        )
+    }
+    changed, created = [], []
+    for key, n in counts.items():
+        row = existing.get(key)
+        if row is None:
+            poll_id, granularity, bucket = key
+            created.append(AnalyticsRollup(
+                poll_id=poll_id, metric=metric, granularity=granularity,
+                bucket_start=bucket, count=n))
+        else:
+            row.count += n
+            changed.append(row)
+    AnalyticsRollup.objects.bulk_update(changed, ['count'], batch_size=1000)
+    AnalyticsRollup.objects.bulk_create(created, batch_size=1000)
+
+
+def _count_batch(metric, batch, field):
+    minute_counts = (
+        batch.annotate(bucket=TruncMinute(field)).order_by()
+        .values('poll_id', 'bucket').annotate(n=Count('pk'))
+    )
+    counts = Counter()
+    processed = 0
+    for row in minute_counts:
+        for granularity in GRANULARITIES:
+            counts[row['poll_id'], granularity, truncate(row['bucket'], granularity)] += row['n']
+        processed += row['n']
+    _merge(metric, counts)
+    return processed
+
+
+def _sketch_batch(metric, batch, field):
+    identities = defaultdict(set)
+    processed = 0
+    rows = batch.order_by().values_list('poll_id', field, 'user_id', 'session_id', 'ip_address')
+    for poll_id, moment, user_id, session_id, ip_address in rows.iterator():
+        identity = make_voter_key(user_id, session_id, ip_address)
+        for granularity in SKETCH_GRANULARITIES:
+            identities[poll_id, granularity, truncate(moment, granularity)].add(identity)
+        processed += 1
+    if not identities:
+        return 0
+
+    existing = {
+        (row.poll_id, row.granularity, row.bucket_start): row
+        for row in AnalyticsSketch.objects.select_for_update().filter(
+            metric=metric,
+            poll_id__in={poll_id for poll_id, _, _ in identities},
+            bucket_start__in={bucket for _, _, bucket in identities},
+        )
+    }
+    precision = precision_for_error(settings.ANALYTICS_SKETCH_ERROR)
+    changed, created = [], []
+    for key, values in identities.items():
+        row = existing.get(key)
+        # Existing sketches keep their precision; values can be added at any.
+        sketch = HyperLogLog.from_bytes(row.sketch) if row else HyperLogLog(precision)
+        sketch.update(values)
+        if row is None:
+            poll_id, granularity, bucket = key
+            created.append(AnalyticsSketch(
+                poll_id=poll_id, metric=metric, granularity=granularity,
+                bucket_start=bucket, sketch=sketch.to_bytes()))
+        else:
+            row.sketch = sketch.to_bytes()
+            changed.append(row)
+    AnalyticsSketch.objects.bulk_update(changed, ['sketch'], batch_size=500)
+    AnalyticsSketch.objects.bulk_create(created, batch_size=500)
+    return processed
+
+
+def metric_sources(metric):
+    """``[(watermark, queryset, timestamp field), ...]`` folded into ``metric``."""
+    queryset, field = {**SOURCES, **SKETCH_SOURCES}[metric]
+    return [(metric, queryset, field)] + [
+        (watermark, queryset, field)
+        for watermark, (target, queryset, field) in BALLOT_SOURCES.items() if target == metric]
+
+
+def rollup_metric(metric, batch_size=10000, settle_seconds=5):
+    """
+    Fold every settled row above the watermarks into the rollups (or, for
+    sketch metrics, the sketches).
+
+    Rows younger than ``settle_seconds`` are left for the next pass so that
+    transactions still in flight with lower ids are not skipped over.
+    Returns the number of source rows processed.
+    """
+    fold = _sketch_batch if metric in SKETCH_SOURCES else _count_batch
+    cutoff = timezone.now() - timedelta(seconds=settle_seconds)
+    return sum(_rollup_source(metric, watermark, queryset, field, fold, batch_size, cutoff)
+               for watermark, queryset, field in metric_sources(metric))
+
+
+def _rollup_source(metric, name, queryset, field, fold, batch_size, cutoff):
+    watermark, _ = RollupWatermark.objects.get_or_create(metric=name)
+    upper = queryset.filter(
+        pk__gt=watermark.last_id, **{f'{field}__lte': cutoff}
+    ).aggregate(upper=Max('pk'))['upper']
+    if upper is None:
+        return 0
+
+    processed = 0
+    start = watermark.last_id
+    while start < upper:
+        end = min(start + batch_size, upper)
+        with transaction.atomic():
+            # Locking the watermark serialises concurrent passes.
+            watermark = RollupWatermark.objects.select_for_update().get(metric=name)
+            if watermark.last_id != start:
+                break
+            processed += fold(metric, queryset.filter(pk__gt=start, pk__lte=end), field)
+            watermark.last_id = end
+            watermark.save(update_fields=['last_id', 'updated_at'])
+        start = end
+    return processed
+
+
+def rebuild_rollups(metrics=None):
+    """
+    Drop the rollups, sketches and watermarks so the next pass starts from
+    scratch. Archived polls keep theirs: their rows are no longer there to
+    be recounted.
+    """
+    metrics = list(metrics or METRICS)
+    watermarks = [watermark for metric in metrics for watermark, _, _ in metric_sources(metric)]
+    with transaction.atomic():
+        AnalyticsRollup.objects.filter(metric__in=metrics, poll__archived_at__isnull=True).delete()
+        AnalyticsSketch.objects.filter(metric__in=metrics, poll__archived_at__isnull=True).delete()
+        RollupWatermark.objects.filter(metric__in=watermarks).delete()
+
+
+def time_series(poll_ids, metric, granularity, start, end):
+    """Return ``[(bucket_start, count), ...]`` for buckets in ``[start, end)``, summed over polls."""
+    return list(
+        AnalyticsRollup.objects.filter(
+            poll_id__in=poll_ids, metric=metric, granularity=granularity,
+            bucket_start__gte=truncate(start, granularity), bucket_start__lt=end)
+        .values('bucket_start').annotate(total=Sum('count'))
+        .order_by('bucket_start').values_list('bucket_start', 'total')
+    )
+
+
+def distinct_counts(poll_ids, metric, granularity, start, end):
+    """
+    Estimate distinct viewers or voters of the polls in ``[start, end)``.
+
+    Returns ``(total, [(bucket_start, estimate), ...])``: the total counts
+    each identity once across all buckets and polls, so it is usually less
+    than the sum of the per-bucket estimates.
+    """
+    rows = (
+        AnalyticsSketch.objects.filter(
+            poll_id__in=poll_ids, metric=metric, granularity=granularity,
+            bucket_start__gte=truncate(start, granularity), bucket_start__lt=end)
+        .order_by('bucket_start').values_list('bucket_start', 'sketch')
+    )
+    buckets = defaultdict(list)
+    for bucket, data in rows.iterator():
+        buckets[bucket].append(HyperLogLog.from_bytes(data))
+    merged = {bucket: merge_all(sketches) for bucket, sketches in buckets.items()}
+    total = merge_all(merged.values())
+    return (total.count() if total else 0,
+            [(bucket, sketch.count()) for bucket, sketch in merged.items()])
@@ -0,0 +1,44 @@
+"""
+Poll search over questions and option texts.
+
+On Postgres this is full-text search: the question and every option text
+are matched as ``to_tsvector(SEARCH_CONFIG, text)`` against a
+``websearch_to_tsquery``, which the GIN expression indexes created by
+migration ``0010_poll_list_indexes`` answer without touching the tables.
+The expressions here and in that migration must stay identical, or the
+planner falls back to scanning.
+
+Other databases (SQLite for development and benchmarks) get a simple
+fallback: every word must appear, case-insensitively, in the question or
+in one of the options.
+"""
+from django.db import connections, router
+from django.db.models import Q
+
+from polls.models import Option, Poll
+
+SEARCH_CONFIG = 'english'
+
+
+def search_polls(queryset, terms):
+    """Narrow a Poll queryset to the polls matching ``terms``."""
+    terms = terms.strip()
+    if not terms:
+        return queryset
+    if connections[router.db_for_read(Poll)].vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+
+        query = SearchQuery(terms, config=SEARCH_CONFIG, search_type='websearch')
+        # A UNION rather than an OR, so each side is a GIN index scan.
+        questions = Poll.objects.alias(
+            document=SearchVector('question', config=SEARCH_CONFIG)
+        ).filter(document=query).values('pk')
+        options = Option.objects.alias(
+            document=SearchVector('option_text', config=SEARCH_CONFIG)
+        ).filter(document=query).values('poll_id')
+        return queryset.filter(pk__in=questions.union(options))
+
+    for word in terms.split():
+        options = Option.objects.filter(option_text__icontains=word).values('poll_id')
+        queryset = queryset.filter(Q(question__icontains=word) | Q(pk__in=options))
+    return queryset
@@ -0,0 +1,362 @@
+"""
+Columnar snapshots of closed polls.
+
+Once a poll has been closed for ``SETTLE`` seconds its votes and ballots
+stop changing, so the snapshot stage (run by ``manage.py run_expiry``
+after every expiry pass, or by ``manage.py snapshot_polls``) copies them
+and the views so far into one file per poll as plain column arrays:
+option ids, timestamps, a guest bitmap, hashed voter identities and so
+on. Readers memory-map the file, so results, exports and vote analytics
+of a closed poll cost a page-cache read instead of a table scan.
+
+A snapshot file is a little-endian uint64 header length, a JSON header
+giving each column's dtype, offset and length, then the columns, each
+aligned to 64 bytes. Timestamps are UTC microseconds since the epoch.
+
+``Poll.snapshot_at`` marks the polls that have a snapshot and queues the
+ones still waiting for one. Reopening a poll clears it and deletes the
+file; readers that find no file use the database, except for archived
+polls (see polls.archive), whose snapshot is the only copy of their votes:
+``open_snapshot(..., archived=True)`` reads it even while snapshots are
+disabled and raises ``SnapshotMissing`` if it is gone.
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from polls.models import Ballot, Poll, PollView, Vote, make_voter_key
+from polls.rollups import BUCKET_WIDTH, truncate
+from polls.tallying import ballot_arrays, option_columns
+
+DEFAULTS = {
+    'ENABLED': True,
+    'DIR': None,
+    'SETTLE': 60.0,
+    'BATCH_SIZE': 100,
+}
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+_ALIGN = 64
+_MICROSECOND = timedelta(microseconds=1)
+# metric -> (timestamp column, identity column, guest bitmap filter), each
+# read for votes (vote_*) and ballots (ballot_*), which count as votes as in
+# polls.rollups. Closed polls are still viewed, so view metrics always come
+# from the rollups.
+_METRIC_COLUMNS = {
+    'votes': ('time', None, False),
+    'guest_votes': ('time', None, True),
+    'voters': ('time', 'voter', None),
+}
+
+
+class SnapshotMissing(Exception):
+    """An archived poll's snapshot file cannot be found."""
+
+
+# API reply (503) when SnapshotMissing is raised.
+SNAPSHOT_UNAVAILABLE = "This archived poll's votes are temporarily unavailable."
+
+
+def snapshot_settings():
+    options = {**DEFAULTS, **getattr(settings, 'POLL_SNAPSHOTS', {})}
+    options['DIR'] = Path(options['DIR'] or Path(settings.BASE_DIR) / 'snapshots')
+    return options
+
+
+def snapshot_path(poll_id):
+    return snapshot_settings()['DIR'] / f'poll-{poll_id}.snapshot'
+
+
+def to_micros(moment):
+    return (moment - EPOCH) // _MICROSECOND
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+def identity_hash(voter_key):
+    """64-bit hash of a voter key, for exact distinct counts."""
+    return int.from_bytes(hashlib.blake2b(voter_key.encode(), digest_size=8).digest(), 'little')
+
+
+class Snapshot:
+    """A memory-mapped snapshot file; ``snapshot[name]`` is a read-only column."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as handle:
+            size = int.from_bytes(handle.read(8), 'little')
+            self.header = json.loads(handle.read(size))
+        self._start = _aligned(8 + size)
+        self._data = np.memmap(path, dtype=np.uint8, mode='r')
+
+    def __getitem__(self, name):
+        column = self.header['columns'][name]
+        dtype = np.dtype(column['dtype'])
+        start = self._start + column['offset']
+        return self._data[start:start + column['length'] * dtype.itemsize].view(dtype)
+
+    @property
+    def votes(self):
+        return self.header['votes']
+
+    def vote_counts(self, option_ids):
+        """Votes on each of the (ascending) ``option_ids``."""
+        columns = option_columns(self['vote_option'], option_ids)
+        return np.bincount(columns, minlength=len(option_ids) + 1)[:len(option_ids)]
+
+    def ballots(self, option_ids, weighted=False):
+        """The poll's ballots as ``polls.tallying.Ballots``."""
+        return ballot_arrays(self['ballot_choices'], self['ballot_lengths'], option_ids, weighted)
+
+    @property
+    def ballot_voters(self):
+        """Whether the ballots' voters and times were kept (snapshots since they are)."""
+        return 'ballot_time' in self.header['columns']
+
+    def _tables(self):
+        return ('vote', 'ballot') if self.ballot_voters else ('vote',)
+
+    def guests(self, table='vote'):
+        """Boolean array: which votes (or ballots) are guests'."""
+        count = self.votes if table == 'vote' else self.header['ballots']
+        return np.unpackbits(self[f'{table}_guest'], count=count).astype(bool)
+
+    def _voters(self, table, chunk_size):
+        """Yield the export row prefix (see polls.exports) of each vote or ballot, as a tuple."""
+        guests, count = self.guests(table), len(self[f'{table}_id'])
+        names = ('id', 'user', 'session', 'ip', 'time')
+        for start in range(0, count, chunk_size):
+            chunk = [self[f'{table}_{name}'][start:start + chunk_size].tolist() for name in names]
+            for guest, (row_id, user_id, session_id, ip_address, moment) in zip(
+                    guests[start:start + chunk_size].tolist(), zip(*chunk)):
+                yield (row_id, 'guest' if guest else 'user', None if guest else user_id,
+                       session_id.decode() or None, ip_address.decode() or None, from_micros(moment))
+
+    def vote_rows(self, option_text, chunk_size=2000):
+        """Yield export rows (see polls.exports) for the votes on options that still exist."""
+        options = (option_id for start in range(0, self.votes, chunk_size)
+                   for option_id in self['vote_option'][start:start + chunk_size].tolist())
+        for option_id, voter in zip(options, self._voters('vote', chunk_size)):
+            if option_id in option_text:
+                yield (*voter[:5], option_id, option_text[option_id], voter[5], None, None)
+
+    def ballot_rows(self, chunk_size=2000):
+        """
+        Yield ``(voter, choices)`` per ballot: the export row prefix as in
+        ``_voters`` and the choices packed as in ``Ballot.choices``.
+        """
+        if not self.ballot_voters:
+            return
+        choices = self['ballot_choices']
+        offsets = np.concatenate(([0], np.cumsum(self['ballot_lengths'], dtype=np.int64))).tolist()
+        for index, voter in enumerate(self._voters('ballot', chunk_size)):
+            yield voter, choices[offsets[index]:offsets[index + 1]].tobytes()
+
+    def events(self, metric, start, end, granularity):
+        """
+        ``(bucket, identity or None)`` arrays for the metric's events with a
+        bucket in ``[truncate(start), end)``; buckets are in microseconds.
+        """
+        time_column, identity_column, guest = _METRIC_COLUMNS[metric]
+        width = BUCKET_WIDTH[granularity] // _MICROSECOND
+        lower, upper = to_micros(truncate(start, granularity)), to_micros(end)
+        buckets, identities = [], []
+        for table in self._tables():
+            table_buckets = self[f'{table}_{time_column}'] // width * width
+            keep = (table_buckets >= lower) & (table_buckets < upper)
+            if guest is not None:
+                keep &= self.guests(table) == guest
+            buckets.append(table_buckets[keep])
+            if identity_column:
+                identities.append(self[f'{table}_{identity_column}'][keep])
+        return np.concatenate(buckets), np.concatenate(identities) if identity_column else None
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def write_snapshot_file(path, header, columns):
+    """Write ``columns`` (name -> array) and ``header`` to ``path`` atomically."""
+    header = {**header, 'columns': {}}
+    offset = 0
+    for name, array in columns.items():
+        header['columns'][name] = {'dtype': array.dtype.str, 'offset': offset, 'length': len(array)}
+        offset = _aligned(offset + array.nbytes)
+    encoded = json.dumps(header, separators=(',', ':')).encode()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(f'.{path.name}.{os.getpid()}')
+    with open(temporary, 'wb') as handle:
+        handle.write(len(encoded).to_bytes(8, 'little'))
+        handle.write(encoded)
+        start = _aligned(8 + len(encoded))
+        for name, array in columns.items():
+            handle.seek(start + header['columns'][name]['offset'])
+            handle.write(np.ascontiguousarray(array).tobytes())
+        handle.truncate(start + offset)
+    os.replace(temporary, path)
+
+
+def _strings(values):
+    encoded = [(value or '').encode() for value in values]
+    return np.array(encoded, dtype=f'S{max(map(len, encoded), default=0) or 1}')
+
+
+def _voter_columns(prefix, rows):
+    """Columns ``{prefix}_id``, ``_time``, ... of ``(id, created_at, user_id, session_id, ip_address)`` rows."""
+    ids, moments, users, sessions, ips = zip(*rows) if rows else ((),) * 5
+    return {
+        f'{prefix}_id': np.array(ids, dtype=np.int64),
+        f'{prefix}_time': np.array([to_micros(moment) for moment in moments], dtype=np.int64),
+        f'{prefix}_guest': np.packbits(np.array([not user for user in users], dtype=bool)),
+        f'{prefix}_user': np.array([user or 0 for user in users], dtype=np.int64),
+        f'{prefix}_voter': np.array([identity_hash(make_voter_key(*row[2:])) for row in rows], dtype=np.uint64),
+        f'{prefix}_session': _strings(sessions),
+        f'{prefix}_ip': _strings(ips),
+    }
+
+
+def build_columns(poll_id):
+    """Read the poll's votes, views and ballots into snapshot columns."""
+    voter = ('id', 'created_at', 'user_id', 'session_id', 'ip_address')
+    votes = list(
+        Vote.objects.filter(poll_id=poll_id).order_by('created_at', 'id')
+        .values_list('selected_option_id', *voter).iterator(chunk_size=10000))
+    views = list(
+        PollView.objects.filter(poll_id=poll_id).order_by('viewed_at', 'id')
+        .values_list('viewed_at', 'user_id', 'session_id', 'ip_address')
+        .iterator(chunk_size=10000))
+    ballots = list(
+        Ballot.objects.filter(poll_id=poll_id).order_by('created_at', 'id')
+        .values_list('choices', *voter).iterator(chunk_size=10000))
+
+    return {
+        'vote_option': np.array([row[0] for row in votes], dtype='<u4'),
+        **_voter_columns('vote', [row[1:] for row in votes]),
+        'view_time': np.array([to_micros(row[0]) for row in views], dtype=np.int64),
+        'view_viewer': np.array([identity_hash(make_voter_key(*row[1:])) for row in views], dtype=np.uint64),
+        'ballot_lengths': np.array([len(row[0]) // 4 for row in ballots], dtype='<u4'),
+        'ballot_choices': np.frombuffer(b''.join(bytes(row[0]) for row in ballots), dtype='<u4'),
+        **_voter_columns('ballot', [row[1:] for row in ballots]),
+    }
+
+
+def snapshot_poll(poll_id, closed_at):
+    """
+    Write the snapshot of a poll closed (last updated) at ``closed_at`` and
+    mark it taken. Returns the file size, or None if the poll has been
+    reopened, edited or deleted since, or is archived (its snapshot is then
+    the only copy of its votes and is never rewritten).
+    """
+    if Poll.objects.filter(pk=poll_id, archived_at__isnull=False).exists():
+        return None
+    columns = build_columns(poll_id)
+    now = timezone.now()
+    header = {'poll': poll_id, 'taken_at': now.isoformat(), 'votes': len(columns['vote_id']),
+              'views': len(columns['view_time']), 'ballots': len(columns['ballot_lengths'])}
+    path = snapshot_path(poll_id)
+    write_snapshot_file(path, header, columns)
+    # Published first and withdrawn if the poll changed meanwhile, so a
+    # reopen racing with this pass never leaves a stale snapshot behind.
+    if not Poll.objects.filter(pk=poll_id, is_active=False, updated_at=closed_at).update(snapshot_at=now):
+        path.unlink(missing_ok=True)
+        return None
+    return path.stat().st_size
+
+
+def pending_snapshots(now=None):
+    """Closed polls that have settled and still need a snapshot."""
+    settled = (now or timezone.now()) - timedelta(seconds=snapshot_settings()['SETTLE'])
+    return Poll.objects.filter(is_active=False, snapshot_at__isnull=True, updated_at__lte=settled)
+
+
+def take_snapshots(batch_size=None, now=None):
+    """Snapshot up to ``batch_size`` settled closed polls, oldest first. Returns how many."""
+    options = snapshot_settings()
+    if not options['ENABLED']:
+        return 0
+    due = pending_snapshots(now).order_by('updated_at').values_list('pk', 'updated_at')
+    taken = 0
+    for poll_id, closed_at in due[:batch_size or options['BATCH_SIZE']]:
+        if snapshot_poll(poll_id, closed_at) is not None:
+            taken += 1
+    return taken
+
+
+def discard_snapshot(poll_id):
+    """Delete a poll's snapshot file; callers clear ``Poll.snapshot_at``."""
+    snapshot_path(poll_id).unlink(missing_ok=True)
+
+
+def open_snapshot(poll_id, archived=False):
+    """
+    The poll's Snapshot, or None if it has none (or snapshots are
+    disabled). An ``archived`` poll always has one; raises SnapshotMissing
+    if its file is gone rather than let callers read the emptied tables.
+    """
+    if not archived and not snapshot_settings()['ENABLED']:
+        return None
+    path = snapshot_path(poll_id)
+    try:
+        return Snapshot(path)
+    except FileNotFoundError:
+        if archived:
+            raise SnapshotMissing(f"Snapshot {path} of archived poll {poll_id} is missing.") from None
+        return None
+
+
+def _open_all(poll_ids, metric):
+    if metric not in _METRIC_COLUMNS:
+        return None
+    snapshots = []
+    for poll_id in poll_ids:
+        snapshot = open_snapshot(poll_id)
+        if snapshot is None:
+            return None
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def snapshot_time_series(poll_ids, metric, granularity, start, end):
+    """
+    ``polls.rollups.time_series`` of a vote metric computed exactly from
+    the snapshots, or None unless every poll has one.
+    """
+    snapshots = _open_all(poll_ids, metric)
+    if snapshots is None:
+        return None
+    buckets = np.concatenate([snapshot.events(metric, start, end, granularity)[0] for snapshot in snapshots])
+    values, counts = np.unique(buckets, return_counts=True)
+    return [(from_micros(bucket), count) for bucket, count in zip(values.tolist(), counts.tolist())]
+
+
+def snapshot_distinct_counts(poll_ids, metric, granularity, start, end):
+    """
+    ``polls.rollups.distinct_counts`` of voters counted exactly from the
+    snapshots, or None unless every poll has one.
+    """
+    snapshots = _open_all(poll_ids, metric)
+    if snapshots is None:
+        return None
+    events = [snapshot.events(metric, start, end, granularity) for snapshot in snapshots]
+    buckets = np.concatenate([bucket for bucket, _ in events])
+    identities = np.concatenate([identity for _, identity in events])
+    order = np.argsort(buckets, kind='stable')
+    buckets, identities = buckets[order], identities[order]
+    values, starts = np.unique(buckets, return_index=True)
+    counts = [_distinct(part) for part in np.split(identities, starts[1:])] if len(values) else []
+    return _distinct(identities), [(from_micros(bucket), count) for bucket, count in zip(values.tolist(), counts)]
+
+
+def _distinct(identities):
+    # Sorting and counting changes beats np.unique on 64-bit hashes.
+    identities = np.sort(identities)
+    return int(np.count_nonzero(identities[1:] != identities[:-1])) + 1 if len(identities) else 0
@@ -0,0 +1,179 @@
+"""
+Vectorised tallies for approval, ranked and weighted ballots.
+
+Packed ballots (see ``Ballot.choices``) are loaded once into flat numpy
+arrays holding, for every choice on every ballot, the ballot it belongs to,
+the option's column and its position on the ballot (plus its weight on
+weighted polls). Each method is then a few whole-array passes instead of
+a Python loop over ballots: a ``bincount`` for approval, Borda and
+weighted totals, and for instant runoff one ``bincount`` per round, after
+which only the ballots whose current choice was just eliminated move on to
+their next preference.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+# Result methods each kind of poll supports; the first is the default.
+RESULT_METHODS = {
+    'plurality': ('plurality',),
+    'approval': ('approval',),
+    'ranked': ('irv', 'borda', 'plurality'),
+    'weighted': ('weighted',),
+}
+ALL_METHODS = sorted({method for methods in RESULT_METHODS.values() for method in methods})
+
+_UINT32 = np.dtype('<u4')
+# Largest option id range mapped to columns through a lookup table.
+LOOKUP_SPAN = 1 << 16
+
+
+class MethodNotSupported(ValueError):
+    pass
+
+
+# ``count`` ballots over ``options`` columns, then one array entry per choice.
+Ballots = namedtuple('Ballots', 'count options ballot column position weight')
+
+
+def pack_choices(option_ids, weights=None):
+    """Pack option ids, each followed by its weight if given, as little-endian uint32."""
+    if weights is not None:
+        option_ids = [value for pair in zip(option_ids, weights) for value in pair]
+    return np.asarray(option_ids, dtype=_UINT32).tobytes()
+
+
+def unpack_choices(data, weighted=False):
+    """Inverse of ``pack_choices``: ``(option_ids, weights or None)``."""
+    values = np.frombuffer(data, dtype=_UINT32).tolist()
+    if weighted:
+        return values[0::2], values[1::2]
+    return values, None
+
+
+def load_ballots(packed, option_ids, weighted=False):
+    """Load an iterable of packed ballots (see ``ballot_arrays``)."""
+    packed = list(packed)
+    lengths = np.fromiter(map(len, packed), dtype=np.intp, count=len(packed)) // 4
+    return ballot_arrays(np.frombuffer(b''.join(packed), dtype=_UINT32), lengths, option_ids, weighted)
+
+
+def ballot_arrays(values, lengths, option_ids, weighted=False):
+    """
+    Load ballots given as all their packed uint32 values back to back and
+    the number of values in each, against the poll's option ids
+    (ascending). Choices of options that no longer exist are dropped and
+    the remaining ones keep their relative order.
+    """
+    count = len(lengths)
+    lengths = np.asarray(lengths, dtype=np.intp)
+    if weighted:
+        ids, weight, lengths = values[0::2], values[1::2].astype(np.int64), lengths // 2
+    else:
+        ids, weight = values, None
+    ballot = np.repeat(np.arange(count), lengths)
+
+    column = option_columns(ids, option_ids)
+    known = column < len(option_ids)
+    starts = np.zeros(count + 1, dtype=np.intp)
+    if known.all():
+        np.cumsum(lengths, out=starts[1:])
+    else:
+        ballot, column = ballot[known], column[known]
+        weight = weight[known] if weighted else None
+        np.cumsum(np.bincount(ballot, minlength=count), out=starts[1:])
+    position = np.arange(len(ballot)) - starts[ballot]
+    return Ballots(count, len(option_ids), ballot, column, position, weight)
+
+
+def option_columns(ids, option_ids):
+    """
+    Column of each uint32 id in the ascending ``option_ids``, or
+    ``len(option_ids)`` for ids that are not there.
+    """
+    option_ids = np.asarray(option_ids, dtype=np.int64)
+    missing = len(option_ids)
+    if not missing:
+        return np.zeros(len(ids), dtype=np.intp)
+    first, span = option_ids[0], option_ids[-1] - option_ids[0] + 1
+    if span <= LOOKUP_SPAN:
+        # A poll's option ids are usually close together: index a small table.
+        # Ids below the first one wrap around to large offsets.
+        table = np.full(span + 1, missing, dtype=np.intp)
+        table[option_ids - first] = np.arange(missing)
+        return table[np.minimum(ids - np.uint32(first), np.uint32(span))]
+    column = np.searchsorted(option_ids.astype(_UINT32), ids)
+    found = column < missing
+    found[found] = option_ids[column[found]] == ids[found]
+    column[~found] = missing
+    return column
+
+
+def approval_totals(ballots):
+    """Number of ballots approving each option."""
+    return np.bincount(ballots.column, minlength=ballots.options)
+
+
+def weighted_totals(ballots):
+    """Sum of the weights given to each option."""
+    return np.bincount(ballots.column, weights=ballots.weight, minlength=ballots.options).astype(np.int64)
+
+
+def first_preferences(ballots):
+    """Number of ballots ranking each option first."""
+    return np.bincount(ballots.column[ballots.position == 0], minlength=ballots.options)
+
+
+def borda_totals(ballots):
+    """Borda count: n - 1 points for a first preference down to 0; unranked options score 0."""
+    points = ballots.options - 1 - ballots.position
+    return np.bincount(ballots.column, weights=points, minlength=ballots.options).astype(np.int64)
+
+
+def instant_runoff(ballots):
+    """
+    Count ranked ballots by instant runoff. Returns ``(winner, rounds)``
+    with the winning column (None if no ballot counts) and, per round,
+    ``(counts, exhausted, eliminated)``: the first-preference count of
+    every option still standing, the number of ballots with no standing
+    option left, and the column eliminated after the round (None for the
+    last one).
+
+    The option with the fewest votes is eliminated; ties go to the option
+    with fewer first preferences, then to the newer option.
+    """
+    pad = ballots.options
+    if not ballots.count or not pad:
+        return None, []
+    width = int(ballots.position.max()) + 2 if len(ballots.position) else 1
+    # One row per ballot, padded with a column that never stands.
+    ranking = np.full((ballots.count, width), pad, dtype=np.int32)
+    ranking[ballots.ballot, ballots.position] = ballots.column
+    current = ranking[:, 0].copy()
+    pointer = np.zeros(ballots.count, dtype=np.intp)
+    standing = np.ones(pad + 1, dtype=bool)
+    standing[pad] = False
+
+    rounds, first = [], None
+    while True:
+        counts = np.bincount(current, minlength=pad + 1)
+        if first is None:
+            first = counts
+        exhausted = int(counts[pad])
+        columns = np.flatnonzero(standing)
+        tallies = counts[columns]
+        standings = {int(column): int(count) for column, count in zip(columns, tallies)}
+        leader = columns[np.argmax(tallies)]
+        if len(columns) == 1 or 2 * counts[leader] > ballots.count - exhausted:
+            rounds.append((standings, exhausted, None))
+            return (int(leader) if counts[leader] else None), rounds
+
+        tied = columns[tallies == tallies.min()]
+        loser = int(tied[np.lexsort((-tied, first[tied]))[0]])
+        rounds.append((standings, exhausted, loser))
+        standing[loser] = False
+        moved = np.flatnonzero(current == loser)
+        while moved.size:
+            pointer[moved] += 1
+            current[moved] = following = ranking[moved, pointer[moved]]
+            moved = moved[(following != pad) & ~standing[following]]
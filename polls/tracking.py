@@ -0,0 +1,203 @@
+"""
+Batched poll view tracking.
+
+``PollViewSet.retrieve`` records a view by appending a tuple to a bounded
+in-memory buffer, which costs microseconds and no queries. A background
+flusher writes the buffer to ``PollView`` with ``bulk_create`` every
+``FLUSH_INTERVAL`` seconds, or as soon as ``BATCH_SIZE`` events are
+waiting.
+
+When the buffer is full (the database is slower than the view rate) the
+``OVERFLOW`` policy decides what to shed: ``drop_oldest`` keeps the most
+recent events, ``drop_newest`` rejects new ones. Either way the request
+never blocks and the shed events are counted in ``stats()['dropped']``.
+A batch whose write fails goes back to the front of the buffer (shedding
+by the same policy if it no longer fits) for the next flush, and counts
+in ``stats()['failed_flushes']``.
+"""
+import atexit
+import threading
+import time
+from collections import Counter, deque
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.utils import timezone
+
+from polls.buffering import BackgroundFlusher
+from polls.models import Poll, PollView
+
+OVERFLOW_POLICIES = ('drop_oldest', 'drop_newest')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'CAPACITY': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+    'OVERFLOW': 'drop_oldest',
+    'AUTOSTART': True,
+}
+
+
+def tracking_settings():
+    return {**DEFAULTS, **getattr(settings, 'POLL_VIEW_TRACKING', {})}
+
+
+class ViewTracker:
+    def __init__(self, capacity=10000, batch_size=500, flush_interval=1.0,
+                 overflow='drop_oldest'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ImproperlyConfigured(f"Unknown view tracking overflow policy {overflow!r}.")
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.overflow = overflow
+        self.flusher = BackgroundFlusher(self.flush, flush_interval, name='view-tracking')
+        self._events = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stats = Counter()
+        self._last_batch_size = 0
+        self._last_flush_ms = 0.0
+
+    def record(self, poll_id, user_id=None, ip_address=None, session_id=None):
+        """Buffer one view. Returns False if the event was shed."""
+        event = (poll_id, user_id, ip_address, session_id, timezone.now())
+        with self._lock:
+            if len(self._events) >= self.capacity:
+                self._stats['dropped'] += 1
+                if self.overflow == 'drop_newest':
+                    return False
+                self._events.popleft()
+            self._events.append(event)
+            self._stats['recorded'] += 1
+            full = len(self._events) >= self.batch_size
+        if full:
+            self.flusher.wake()
+        return True
+
+    def _take(self):
+        with self._lock:
+            return [self._events.popleft() for _ in range(min(self.batch_size, len(self._events)))]
+
+    def _requeue(self, events):
+        """Put a batch that failed to write back in front of the buffer."""
+        with self._lock:
+            room = max(self.capacity - len(self._events), 0)
+            if len(events) > room:
+                self._stats['dropped'] += len(events) - room
+                # The batch is older than everything still buffered.
+                events = events[len(events) - room:] if self.overflow == 'drop_oldest' else events[:room]
+            self._events.extendleft(reversed(events))
+
+    def flush(self):
+        """Write buffered views in batches. Returns the number of rows inserted."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                events = self._take()
+                if not events:
+                    break
+                started = time.perf_counter()
+                try:
+                    # Views of polls deleted since they were recorded are discarded.
+                    live = set(Poll.objects.filter(
+                        pk__in={event[0] for event in events}).values_list('pk', flat=True))
+                    rows = [
+                        PollView(poll_id=poll_id, user_id=user_id, ip_address=ip_address,
+                                 session_id=session_id, viewed_at=viewed_at)
+                        for poll_id, user_id, ip_address, session_id, viewed_at in events
+                        if poll_id in live
+                    ]
+                    PollView.objects.bulk_create(rows)
+                except Exception:
+                    self._stats['failed_flushes'] += 1
+                    self._requeue(events)
+                    raise
+                self._stats['flushes'] += 1
+                self._stats['flushed'] += len(rows)
+                self._stats['discarded'] += len(events) - len(rows)
+                self._last_batch_size = len(events)
+                self._last_flush_ms = (time.perf_counter() - started) * 1000
+                written += len(rows)
+        return written
+
+    def stats(self):
+        return {
+            'buffered': len(self._events),
+            'capacity': self.capacity,
+            'overflow': self.overflow,
+            'recorded': self._stats['recorded'],
+            'dropped': self._stats['dropped'],
+            'discarded': self._stats['discarded'],
+            'flushed': self._stats['flushed'],
+            'flushes': self._stats['flushes'],
+            'failed_flushes': self._stats['failed_flushes'],
+            'last_batch_size': self._last_batch_size,
+            'last_flush_ms': round(self._last_flush_ms, 3),
+        }
+
+    def start(self):
+        self.flusher.start()
+
+    def stop(self):
+        self.flusher.stop()
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_view_tracker():
+    """Return the process-wide tracker, or None when tracking is disabled."""
+    global _tracker
+    options = tracking_settings()
+    if not options['ENABLED']:
+        return None
+    if _tracker is None:
+        with _tracker_lock:
+            if _tracker is None:
+                _tracker = ViewTracker(
+                    capacity=options['CAPACITY'],
+                    batch_size=options['BATCH_SIZE'],
+                    flush_interval=options['FLUSH_INTERVAL'],
+                    overflow=options['OVERFLOW'],
+                )
+                if options['AUTOSTART']:
+                    _tracker.start()
+    return _tracker
+
+
+def reset_view_tracker(**kwargs):
+    """Stop and drop the process-wide tracker, flushing what it holds."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is not None:
+            _tracker.stop()
+            _tracker = None
+
+
+def track_poll_view(request, poll_id, user=None):
+    """
+    Record a view of the poll. Async views pass the already authenticated
+    ``user`` so that ``request.user`` is never lazily loaded.
+    """
+    tracker = get_view_tracker()
+    if tracker is None:
+        return False
+    user = user or request.user
+    return tracker.record(
+        poll_id,
+        user_id=user.id if user.is_authenticated else None,
+        ip_address=request.META.get('REMOTE_ADDR'),
+        session_id=request.session.session_key or request.COOKIES.get('sessionid'),
+    )
+
+
+def _settings_changed(setting, **kwargs):
+    if setting == 'POLL_VIEW_TRACKING':
+        reset_view_tracker()
+
+
+setting_changed.connect(_settings_changed)
+atexit.register(reset_view_tracker)
@@ -0,0 +1,213 @@
+"""
+Vote casting and results shared by the sync (DRF) and async API views.
+"""
+from collections import Counter
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from polls.ballots import ballot_results
+from polls.counters import apply_vote_deltas, record_vote_change, stored_vote_counts
+from polls.models import Option, Poll, Vote, make_voter_key
+from polls.results_cache import bump_poll_version_on_commit
+from polls.snapshots import open_snapshot
+from polls.tallying import RESULT_METHODS, MethodNotSupported
+
+# Reply to a guest vote that lacks the session and IP address it is keyed by.
+GUEST_IDENTITY_REQUIRED = 'Session ID and IP address are required for guest voting.'
+
+
+def missing_guest_identity(user_id, session_id, ip_address):
+    """Whether a vote has neither a user nor both a session ID and an IP address."""
+    return not user_id and not (session_id and ip_address)
+
+
+def cast_vote(poll_id, option_id, user_id=None, session_id=None, ip_address=None):
+    """
+    Create or move one voter's vote on a poll. Returns True if a new vote
+    was created, False if an existing one was updated.
+
+    The option must already have been checked to belong to the poll.
+    """
+    voter_key = make_voter_key(user_id, session_id, ip_address)
+    with transaction.atomic():
+        vote, created = Vote.objects.select_for_update().get_or_create(
+            poll_id=poll_id, voter_key=voter_key, defaults={
+                'selected_option_id': option_id, 'user_id': user_id,
+                'session_id': session_id, 'ip_address': ip_address}
+        )
+        bump_poll_version_on_commit(poll_id)
+        if created:
+            record_vote_change(new_option_id=option_id)
+        else:
+            previous_option_id = vote.selected_option_id
+            vote.selected_option_id = option_id
+            vote.save(update_fields=['selected_option'])
+            record_vote_change(previous_option_id, option_id)
+    return created
+
+
+def _lock_votes(keys):
+    """Lock the existing votes for ``(poll_id, voter_key)`` keys; returns their options."""
+    rows = Vote.objects.select_for_update().filter(
+        poll_id__in={poll_id for poll_id, _ in keys}, voter_key__in={key for _, key in keys}
+    ).values_list('poll_id', 'voter_key', 'selected_option_id')
+    return {(poll_id, key): option for poll_id, key, option in rows if (poll_id, key) in keys}
+
+
+def _insert_votes(latest):
+    """
+    ``INSERT ... ON CONFLICT (poll, voter_key) DO NOTHING`` the
+    ``{(poll_id, voter_key): entry}`` votes and return the keys that were
+    actually inserted. A vote a concurrent writer inserted first is left
+    alone (once its transaction has finished) for the caller to lock.
+    """
+    connection = connections[router.db_for_write(Vote)]
+    quote = connection.ops.quote_name
+    fields = [Vote._meta.get_field(name) for name in (
+        'poll', 'voter_key', 'selected_option', 'user', 'session_id', 'ip_address', 'created_at')]
+    now = timezone.now()
+    rows = [[field.get_db_prep_save(value, connection) for field, value in zip(fields, (
+        poll_id, key, e['option'], e['user'], e['session_id'], e['ip_address'], now))]
+        for (poll_id, key), e in latest.items()]
+    poll_column, key_column = quote(fields[0].column), quote(fields[1].column)
+    batch_size = connection.ops.bulk_batch_size(fields, rows) or len(rows)
+    inserted = set()
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f"INSERT INTO {quote(Vote._meta.db_table)} "
+                f"({', '.join(quote(field.column) for field in fields)}) "
+                f"VALUES {', '.join(['(%s)' % ', '.join(['%s'] * len(fields))] * len(batch))} "
+                f"ON CONFLICT ({poll_column}, {key_column}) DO NOTHING "
+                f"RETURNING {poll_column}, {key_column}",
+                [value for row in batch for value in row])
+            inserted.update(map(tuple, cursor.fetchall()))
+    return inserted
+
+
+def upsert_votes(entries):
+    """
+    Write a batch of ``{poll, option, user, session_id, ip_address}`` votes.
+
+    Later entries for the same voter win. Existing votes are locked and
+    read once; the new ones are inserted with ``ON CONFLICT DO NOTHING``,
+    and any of those a concurrent writer inserted first are locked and
+    treated as existing, so counter deltas always follow what was actually
+    written. Changed votes then get a single ``INSERT ... ON CONFLICT DO
+    UPDATE`` and the option counters a single UPDATE. Returns
+    ``{(poll_id, voter_key): created}``.
+    """
+    latest = {}
+    for entry in entries:
+        key = make_voter_key(entry['user'], entry['session_id'], entry['ip_address'])
+        latest[entry['poll'], key] = entry
+    poll_ids = {poll_id for poll_id, _ in latest}
+
+    deltas = Counter()
+    with transaction.atomic():
+        previous = _lock_votes(latest.keys())
+        created = _insert_votes({key: e for key, e in latest.items() if key not in previous})
+        raced = latest.keys() - previous.keys() - created
+        if raced:
+            previous.update(_lock_votes(raced))
+
+        for key, entry in latest.items():
+            old_option = None if key in created else previous[key]
+            if old_option != entry['option']:
+                deltas[old_option] -= 1
+                deltas[entry['option']] += 1
+
+        if previous:
+            Vote.objects.bulk_create(
+                [Vote(poll_id=poll_id, voter_key=key, selected_option_id=e['option'], user_id=e['user'],
+                      session_id=e['session_id'], ip_address=e['ip_address'])
+                 for (poll_id, key), e in latest.items() if (poll_id, key) in previous],
+                update_conflicts=True,
+                unique_fields=['poll', 'voter_key'],
+                update_fields=['selected_option', 'session_id', 'ip_address'],
+            )
+        deltas.pop(None, None)
+        apply_vote_deltas(deltas)
+        bump_poll_version_on_commit(*poll_ids)
+    return {key: key in created for key in latest}
+
+
+def cast_ballot(items, user_id=None, session_id=None, ip_address=None):
+    """
+    Vote on several polls at once; ``items`` is a list of ``{poll, option}``.
+
+    All polls and options are checked with one query each and the valid
+    votes are upserted together, so a ballot costs the same handful of
+    queries however many questions it has. Invalid items do not stop the
+    rest. Returns one ``{poll, option, status}`` per item, in order, with
+    ``status`` one of ``created``, ``updated`` or ``error`` (plus a
+    ``detail``).
+    """
+    polls = Poll.objects.only('is_active', 'expires_at', 'allow_multiple_votes', 'voting_method')
+    polls = {poll.id: poll for poll in polls.filter(pk__in={item['poll'] for item in items})}
+    option_polls = dict(Option.objects.filter(
+        pk__in={item['option'] for item in items}).values_list('id', 'poll_id'))
+
+    now = timezone.now()
+    results, entries, seen = [], [], set()
+    for item in items:
+        poll = polls.get(item['poll'])
+        result = {'poll': item['poll'], 'option': item['option']}
+        if poll is None:
+            result.update(status='error', detail='Poll not found.')
+        elif option_polls.get(item['option']) != poll.id:
+            result.update(status='error', detail='Invalid option for this poll.')
+        elif not poll.is_active or (poll.expires_at and poll.expires_at < now):
+            result.update(status='error', detail='Voting is closed for this poll.')
+        elif poll.ballot_method != 'plurality':
+            result.update(status='error', detail='This poll takes a list of options; vote on it on its own.')
+        elif poll.id in seen:
+            result.update(status='error', detail='This poll appears more than once in the ballot.')
+        else:
+            seen.add(poll.id)
+            entries.append({'poll': poll.id, 'option': item['option'], 'user': user_id,
+                            'session_id': session_id, 'ip_address': ip_address})
+        results.append(result)
+
+    if entries:
+        outcome = upsert_votes(entries)
+        voter_key = make_voter_key(user_id, session_id, ip_address)
+        for result in results:
+            if 'status' not in result:
+                result['status'] = 'created' if outcome[result['poll'], voter_key] else 'updated'
+    return results
+
+
+def compute_results(poll, method=None):
+    """
+    Build the results payload, by the poll's default method unless another
+    one it supports is given (see polls.tallying.RESULT_METHODS); raises
+    MethodNotSupported for any other. Plurality tallies are denormalized
+    onto Option and its shards, other methods are tallied from the
+    ballots; closed polls with a snapshot are counted from that instead,
+    and archived polls only from it (raising SnapshotMissing without one).
+    """
+    methods = RESULT_METHODS[poll.ballot_method]
+    if method is None:
+        method = methods[0]
+    elif method not in methods:
+        raise MethodNotSupported(f"This poll's results can be counted by: {', '.join(methods)}.")
+    snapshot = None if poll.is_active else open_snapshot(poll.id, archived=poll.archived_at is not None)
+    if poll.ballot_method != 'plurality':
+        return ballot_results(poll, method, snapshot)
+
+    if snapshot is not None:
+        options = list(poll.options.order_by('id').values_list('id', 'option_text'))
+        counts = snapshot.vote_counts([option_id for option_id, _ in options]).tolist()
+        results = [{'option_text': text, 'votes': votes} for (_, text), votes in zip(options, counts)]
+    else:
+        results = stored_vote_counts(poll.options.order_by('id')).values('option_text', 'votes')
+    return {
+        'question': poll.question,
+        'results': [
+            {'option': result['option_text'], 'votes': result['votes']}
+            for result in results
+        ],
+    }